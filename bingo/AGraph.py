@@ -3,14 +3,23 @@ This module contains most of the code necessary for the representation of an
 acyclic graph (linear stack) in symbolic regression
 """
 import abc
-import random
 import logging
 
 import numpy as np
 
+from .StackSimplification import SimplifiedStack
+from . import IntervalArithmetic
+from .RandomStreams import make_rng
+from .MigrationBuffers import pack_individuals, unpack_individuals
+
 np.seterr(all='ignore')
 LOGGER = logging.getLogger(__name__)
 
+# compiled stacks evaluate in the floating point precision of x (double
+# precision for integer x), including the constants
+FLOAT_TYPE_CODE = ("    ftype = np.result_type(x.dtype, np.float32).type\n"
+                   "    consts = np.asarray(consts, ftype)\n")
+
 
 class AGraphManipulator(object):
     """
@@ -37,8 +46,11 @@ class AGraphManipulator(object):
         self.nloads = nloads
         self.float_lim = float_lim
         self.terminal_prob = terminal_prob
+        # random stream; islands bind their own stream to it (RandomStreams)
+        self.rng = make_rng()
 
         self.node_type_list = []
+        self.node_type_index = {}
         self.terminal_inds = []
         self.operator_inds = []
         self.num_node_types = 0
@@ -51,6 +63,17 @@ class AGraphManipulator(object):
         self.add_node_type(AGNodes.LoadConst)
         self.namespace['np'] = np
 
+    def __getstate__(self):
+        # the numpy module in the namespace can't be pickled
+        state = self.__dict__.copy()
+        state["namespace"] = {key: value for key, value in
+                              self.namespace.items() if key != 'np'}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.namespace['np'] = np
+
     def add_node_type(self, node_type):
         """
         Add a type of node to the set of allowed types
@@ -58,7 +81,8 @@ class AGraphManipulator(object):
         :param node_type: acyclic graph node type which will be added to the
                           allowable set
         """
-        if node_type not in self.node_type_list:
+        if node_type not in self.node_type_index:
+            self.node_type_index[node_type] = len(self.node_type_list)
             self.node_type_list.append(node_type)
             if node_type.terminal:
                 self.terminal_inds.append(self.num_node_types)
@@ -80,13 +104,78 @@ class AGraphManipulator(object):
         """
         indv = AGraph(self.namespace)
         for stack_loc in range(self.ag_size):
-            if np.random.random() < self.terminal_prob \
+            if self.rng.random() < self.terminal_prob \
                     or stack_loc < self.nloads:
                 indv.command_list.append(self.rand_terminal())
             else:
                 indv.command_list.append(self.rand_operator(stack_loc))
         return indv
 
+    def generate_batch(self, n_indv):
+        """
+        Generates many random individuals at once.  The random choices for all
+        of the stack locations (terminal or operator, node types and
+        parameters) are drawn as arrays, with the same probabilities as in
+        generate
+
+        :param n_indv: number of individuals
+        :return: list of new random acyclic graph individuals
+        """
+        n_cmds = n_indv * self.ag_size
+        stack_locs = np.tile(np.arange(self.ag_size), n_indv)
+        terminal = np.logical_or(self.rng.random(n_cmds) < self.terminal_prob,
+                                 stack_locs < self.nloads)
+        type_inds = self.rng.choice(self.terminal_inds, n_cmds)
+        if len(self.operator_inds) > 0:
+            type_inds = np.where(terminal, type_inds,
+                                 self.rng.choice(self.operator_inds, n_cmds))
+        data_params = self.rng.integers(self.nvars, size=n_cmds)
+        oper_params = (self.rng.random((n_cmds, 2)) *
+                       stack_locs[:, None]).astype(int)
+
+        # parameters of the commands (-1 for none)
+        arity = np.array([0 if node.terminal else node.arity
+                          for node in self.node_type_list])[type_inds]
+        loads_data = np.array([node is AGNodes.LoadData
+                               for node in self.node_type_list])[type_inds]
+        param1 = np.where(loads_data, data_params,
+                          np.where(arity > 0, oper_params[:, 0], -1))
+        param2 = np.where(arity > 1, oper_params[:, 1], -1)
+
+        # each distinct command is made once; the command lists of the
+        # individuals are slices of the list of all commands
+        width = max(self.nvars, self.ag_size) + 1
+        codes = (type_inds * width + param1 + 1) * width + param2 + 1
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        unique_commands = [self.decode_command(code, width)
+                           for code in unique_codes.tolist()]
+        commands = list(map(unique_commands.__getitem__, inverse.tolist()))
+
+        individuals = []
+        for start in range(0, n_cmds, self.ag_size):
+            indv = AGraph(self.namespace)
+            indv.command_list = commands[start:start + self.ag_size]
+            individuals.append(indv)
+        return individuals
+
+    def decode_command(self, code, width):
+        """
+        Command of a code made by generate_batch
+
+        :param code: (type index * width + param1 + 1) * width + param2 + 1
+        :param width: base of the code
+        :return: (node, params) command
+        """
+        type_ind, param1 = divmod(code // width, width)
+        node = self.node_type_list[type_ind]
+        if node is AGNodes.LoadData:
+            return node, (param1 - 1,)
+        if node.terminal:
+            return node, (None,)
+        if node.arity == 1:
+            return node, (param1 - 1,)
+        return node, (param1 - 1, code % width - 1)
+
     def crossover(self, parent1, parent2):
         """
         Single point crossover
@@ -95,7 +184,7 @@ class AGraphManipulator(object):
         :param parent2: second parent
         :return: two children (new copies)
         """
-        cx_point = np.random.randint(1, self.ag_size)
+        cx_point = self.rng.integers(1, self.ag_size)
         child1 = parent1.copy()
         child2 = parent2.copy()
         child1.command_list[cx_point:] = parent2.command_list[cx_point:]
@@ -106,6 +195,8 @@ class AGraphManipulator(object):
         child2.fitness = None
         child1.fit_set = False
         child2.fit_set = False
+        child1.fitness_memo = {}
+        child2.fitness_memo = {}
         child_age = max(parent1.genetic_age, parent2.genetic_age)
         child1.genetic_age = child_age
         child2.genetic_age = child_age
@@ -121,19 +212,19 @@ class AGraphManipulator(object):
         indv.compiled = False
         # pick mutation point within currently utilized commands
         util = indv.utilized_commands()
-        loc = np.random.randint(sum(util))
+        loc = self.rng.integers(sum(util))
         mut_point = [n for n, x in enumerate(util) if x][loc]
         orig_node_type, orig_params = indv.command_list[mut_point]
 
 
         # mutate operator (0.4) mutate params (0.4) prune branch (0.2)
-        rand_val = np.random.random()
+        rand_val = self.rng.random()
 
         # mutate operator
         if  rand_val < 0.4 and mut_point > self.nloads:
             new_type_found = False
             while not new_type_found:
-                if np.random.random() < self.terminal_prob:
+                if self.rng.random() < self.terminal_prob:
                     new_node_type, new_params = self.rand_terminal()
                 else:
                     new_node_type, new_params = self.rand_operator(mut_point)
@@ -163,7 +254,7 @@ class AGraphManipulator(object):
         # prune branch
         else:
             if not orig_node_type.terminal:  # operators only
-                pruned_param = random.choice(orig_params)
+                pruned_param = self.rng.choice(orig_params)
                 for i in range(mut_point, len(indv.command_list)):
                     if mut_point in indv.command_list[i][1]:
                         mod_params = ()
@@ -177,6 +268,7 @@ class AGraphManipulator(object):
         indv.compiled = False
         indv.fitness = None
         indv.fit_set = False
+        indv.fitness_memo = {}
         return indv
 
     @staticmethod
@@ -206,10 +298,8 @@ class AGraphManipulator(object):
         :param indv: individual which will be dumped
         :return: the individual in a pickleable format
         """
-        command_list = []
-        for node, params in indv.command_list:
-            ind = self.node_type_list.index(node)
-            command_list.append((ind, params))
+        command_list = [(self.node_type_index[node], params)
+                        for node, params in indv.command_list]
         return command_list, indv.constants, indv.genetic_age
 
     def load(self, indv_list):
@@ -223,16 +313,62 @@ class AGraphManipulator(object):
         indv.constants = indv_list[1]
         indv.genetic_age = indv_list[2]
         for node_num, params in indv_list[0]:
-            if node_num in range(len(self.node_type_list)):  # node
+            if 0 <= node_num < len(self.node_type_list):  # node
                 indv.command_list.append((self.node_type_list[node_num],
                                           params))
             else:
                 raise RuntimeError
         return indv
 
+    def pack(self, indvs):
+        """
+        Packs individuals into numpy arrays for migration (see
+        MigrationBuffers)
+
+        :param indvs: list of individuals
+        :return: list of integer arrays (commands as [node index, param,
+                 param] with -1 for a missing parameter, offsets of the
+                 commands and of the constants of each individual, genetic
+                 ages), list of float arrays (concatenated constants)
+        """
+        commands = []
+        for indv in indvs:
+            for node, params in indv.command_list:
+                param1 = -1 if params[0] is None else params[0]
+                commands.append((self.node_type_index[node], param1,
+                                 params[-1] if len(params) > 1 else param1))
+        command_lengths = [len(indv.command_list) for indv in indvs]
+        return pack_individuals(indvs, np.array(commands, dtype=np.int64),
+                                command_lengths)
+
+    def unpack(self, int_arrays, float_arrays):
+        """
+        Unpacks individuals from the numpy arrays made by pack
 
-    @staticmethod
-    def rand_operator_params(arity, stack_loc):
+        :param int_arrays: list of integer arrays
+        :param float_arrays: list of float arrays
+        :return: list of individuals
+        """
+        indvs = []
+        for commands, constants, genetic_age in unpack_individuals(
+                int_arrays, float_arrays):
+            indv = AGraph(self.namespace)
+            indv.constants = constants
+            indv.genetic_age = genetic_age
+            for node_num, param1, param2 in commands.tolist():
+                node = self.node_type_list[node_num]
+                if node.terminal:
+                    params = (None if param1 == -1 else param1,)
+                elif node.arity == 1:
+                    params = (param1,)
+                else:
+                    params = (param1, param2)
+                indv.command_list.append((node, params))
+            indvs.append(indv)
+        return indvs
+
+
+    def rand_operator_params(self, arity, stack_loc):
         """
         Aroduces random tuple for use as operator parameters
 
@@ -241,7 +377,7 @@ class AGraphManipulator(object):
         :return: tuple of parameters
         """
         if stack_loc > 1:
-            return tuple(np.random.randint(0, stack_loc, arity))
+            return tuple(self.rng.integers(0, stack_loc, arity))
         else:
             return (0,)*arity
 
@@ -251,7 +387,7 @@ class AGraphManipulator(object):
 
         :return: operator (acyclic graph node type)
         """
-        node = self.node_type_list[random.choice(self.operator_inds)]
+        node = self.node_type_list[self.rng.choice(self.operator_inds)]
         return node
 
     def rand_operator(self, stack_loc):
@@ -273,7 +409,7 @@ class AGraphManipulator(object):
         :return: terminal parameter
         """
         if terminal is AGNodes.LoadData:
-            param = np.random.randint(self.nvars)
+            param = self.rng.integers(self.nvars)
         else:
             param = None
         return param,
@@ -286,7 +422,7 @@ class AGraphManipulator(object):
         :return: terminal parameter
         """
         if terminal is AGNodes.LoadData:
-            param = np.random.randint(self.nvars)
+            param = self.rng.integers(self.nvars)
         else:
             param = None
         return param,
@@ -297,7 +433,7 @@ class AGraphManipulator(object):
 
         :return: Load node, data index or constant index
         """
-        node = self.node_type_list[random.choice(self.terminal_inds)]
+        node = self.node_type_list[self.rng.choice(self.terminal_inds)]
         param = self.rand_terminal_param(node)
         return node, param
 
@@ -313,6 +449,7 @@ class AGraph(object):
         self.compiled_deriv = False
         self.fitness = None
         self.fit_set = False
+        self.fitness_memo = {}
         self.genetic_age = 0
         if namespace is not None:
             self.namespace = namespace.copy()
@@ -325,41 +462,140 @@ class AGraph(object):
         dup.compiled = self.compiled
         dup.fitness = self.fitness
         dup.fit_set = self.fit_set
+        dup.fitness_memo = dict(self.fitness_memo)
         dup.constants = list(self.constants)
         dup.command_list = list(self.command_list)
         dup.genetic_age = self.genetic_age
         return dup
 
+    def __getstate__(self):
+        # only the genome, constants, age and fitness are pickled; compiled
+        # functions stay behind and the stack is recompiled when it is next
+        # evaluated.  Commands are packed as [node, param, param] int32
+        # triplets unless the stack has node types which are not in AGNodes
+        if all(node in NODE_TYPE_INDEX for node, _ in self.command_list):
+            commands = []
+            for node, params in self.command_list:
+                param1 = -1 if params[0] is None else params[0]
+                commands.append((NODE_TYPE_INDEX[node], param1,
+                                 params[-1] if len(params) > 1 else param1))
+            commands = np.array(commands, dtype=np.int32).tobytes()
+        else:
+            commands = list(self.command_list)
+        fitness = self.fitness
+        if isinstance(fitness, tuple):
+            # numpy scalars pickle at ~100 bytes each
+            fitness = tuple(fit.item() if isinstance(fit, np.generic) else fit
+                            for fit in fitness)
+        return (commands, self.constants, self.genetic_age, fitness,
+                self.fit_set)
+
+    def __setstate__(self, state):
+        commands, self.constants, self.genetic_age, self.fitness, \
+            self.fit_set = state
+        if isinstance(commands, bytes):
+            self.command_list = []
+            for node_num, param1, param2 in np.frombuffer(
+                    commands, dtype=np.int32).reshape((-1, 3)).tolist():
+                node = NODE_TYPES[node_num]
+                if node.terminal:
+                    params = (None if param1 == -1 else param1,)
+                elif node.arity == 1:
+                    params = (param1,)
+                else:
+                    params = (param1, param2)
+                self.command_list.append((node, params))
+        else:
+            self.command_list = commands
+        self.compiled = False
+        self.compiled_deriv = False
+        self.fitness_memo = {}
+        # the derivatives of some nodes use the functions of others, so the
+        # namespace has the functions of all node types
+        self.namespace = node_namespace(
+            NODE_TYPES + [node for node, _ in self.command_list
+                          if node not in NODE_TYPE_INDEX])
+
     def compile(self):
-        """compile the stack of commands"""
-        util = self.utilized_commands()
+        """
+        compile the (simplified) stack of commands.  Constants are evaluated
+        in the floating point precision of x
+        """
+        simple = self.simplified_stack()
         code_str = ("def evaluate(x, consts):\n"
-                    "    stack = [None]*%d\n" % len(self.command_list))
+                    "    stack = [None]*%d\n" % len(self.command_list) +
+                    FLOAT_TYPE_CODE)
         for i, (node, params) in enumerate(self.command_list):
-            if util[i]:
+            if simple.util[i]:
                 code_str += ("    stack[%d] = " % i +
-                             node.funcstring(params) + "\n")
-        code_str += "    return stack[-1].reshape([-1,1])\n"
+                             node.funcstring(
+                                 self.simplified_params(i, simple)) + "\n")
+        code_str += ("    return stack[%d].reshape([-1,1])\n" %
+                     simple.alias[-1])
         exec(compile(code_str, '<string>', 'exec'), self.namespace)
         self.compiled = True
 
     def compile_deriv(self):
-        """compile the stack of commands and derivatives"""
-        util = self.utilized_commands()
+        """
+        compile the (simplified) stack of commands and derivatives.  Only the
+        columns of x which are referenced by the stack are propagated through
+        the derivatives; they are scattered into the full df_dx at the end
+        """
+        simple = self.simplified_stack()
+        columns = self.referenced_columns(simple)
+        column_index = {col: j for j, col in enumerate(columns)}
         code_str = "def evaluate_deriv(x, consts):\n"
         code_str += "    stack = [None]*%d\n" % len(self.command_list)
         code_str += "    deriv = [None]*%d\n" % len(self.command_list)
+        code_str += "    dshape = (x.shape[0], %d)\n" % len(columns)
+        code_str += FLOAT_TYPE_CODE
         for i, (node, params) in enumerate(self.command_list):
-            if util[i]:
+            if simple.util[i]:
+                params = self.simplified_params(i, simple)
                 code_str += ("    stack[%d] = " % i +
                              node.funcstring(params) + "\n")
+                if node is AGNodes.LoadData:
+                    params = (column_index[params[0]],)
                 code_str += ("    deriv[%d] = " % i +
                              node.derivstring(params) + "\n")
-        code_str += "    return stack[-1].reshape([-1,1]), deriv[-1]\n"
+        code_str += "    df_dx = np.zeros(x.shape, ftype)\n"
+        code_str += "    df_dx[:, %r] = deriv[%d]\n" % (columns,
+                                                       simple.alias[-1])
+        code_str += ("    return stack[%d].reshape([-1,1]), df_dx\n" %
+                     simple.alias[-1])
 
         exec(compile(code_str, '<string>', 'exec'), self.namespace)
         self.compiled_deriv = True
 
+    def simplified_stack(self):
+        """
+        simplification of the stack (see StackSimplification)
+
+        :return: SimplifiedStack of the command list
+        """
+        commands = []
+        for node, params in self.command_list:
+            commands.append((SIMPLIFICATION_NAMES.get(node, node),
+                             params[0], params[-1]))
+        return SimplifiedStack(commands)
+
+    def referenced_columns(self, simple):
+        """
+        sorted list of the columns of x referenced by the simplified stack
+        """
+        columns = set()
+        for i, (node, params) in enumerate(self.command_list):
+            if simple.util[i] and node is AGNodes.LoadData:
+                columns.add(params[0])
+        return sorted(columns)
+
+    def simplified_params(self, index, simple):
+        """parameters of a command, referring to the simplified stack"""
+        node, params = self.command_list[index]
+        if node.terminal:
+            return params
+        return tuple(simple.alias[p] for p in params)
+
     def needs_optimization(self):
         """find out whether constants need optimization"""
         util = self.utilized_commands()
@@ -373,7 +609,20 @@ class AGraph(object):
         return False
 
     def count_constants(self):
-        """count constants and set up for optimization"""
+        """
+        count constants and set up for optimization.  The stack is simplified
+        first: common subexpressions are referenced directly and each
+        constant-only sub-stack is replaced by a single constant
+        """
+        simple = self.simplified_stack()
+        for i in simple.constant_roots:
+            self.command_list[i] = (AGNodes.LoadConst, (None,))
+        for i, (node, params) in enumerate(self.command_list):
+            if simple.util[i] and not node.terminal:
+                self.command_list[i] = (node,
+                                        self.simplified_params(i, simple))
+        self.compiled = False
+        self.compiled_deriv = False
 
         # compile fitness function for optimization
         util = self.utilized_commands()
@@ -385,6 +634,36 @@ class AGraph(object):
                     const_num += 1
         return const_num
 
+    def guaranteed_invalid(self, bounds):
+        """
+        find out (using interval arithmetic) whether the (simplified) stack
+        evaluates to nan or infinity for all inputs within the bounds.  The
+        simplified stack is screened since that is the stack which is
+        evaluated
+
+        :param bounds: list of (min, max) for each column of x
+        :return: True if the individual is guaranteed to be invalid
+        """
+        simple = self.simplified_stack()
+        int_list = [None]*len(self.command_list)
+        for i, (node, params) in enumerate(self.command_list):
+            if simple.util[i]:
+                if node is AGNodes.LoadData:
+                    int_list[i] = IntervalArithmetic.make_interval(
+                        *bounds[params[0]])
+                elif node is AGNodes.LoadConst:
+                    if params[0] is not None and \
+                            params[0] < len(self.constants):
+                        const = self.constants[params[0]]
+                        int_list[i] = IntervalArithmetic.make_interval(
+                            const, const)
+                    else:
+                        int_list[i] = IntervalArithmetic.FINITE
+                else:
+                    int_list[i] = node.interval(
+                        self.simplified_params(i, simple), int_list)
+        return IntervalArithmetic.is_non_finite(int_list[simple.alias[-1]])
+
     def set_constants(self, consts):
         """set individual's constants"""
         self.constants = consts
@@ -495,15 +774,26 @@ class AGNodes(object):
             """creates a string for outputting latex"""
             pass
 
+        @staticmethod
+        def interval(params, int_list):
+            """
+            bounds of the values of the node given the intervals of the
+            stack (see IntervalArithmetic); unbounded unless overridden
+            """
+            return IntervalArithmetic.UNBOUNDED
+
     class LoadData(Node):
         """load"""
         terminal = True
         shorthand_deriv = "deriv_x"
 
         @staticmethod
-        def call_deriv(index, xshape):
-            """gets derivative array of loaded value"""
-            tmp = np.zeros(xshape)
+        def call_deriv(index, dshape, ftype=np.float64):
+            """
+            gets derivative array of loaded value (index is the position of
+            the column among the referenced columns, see compile_deriv)
+            """
+            tmp = np.zeros(dshape, ftype)
             tmp[:, index] = 1
             return tmp
 
@@ -513,7 +803,7 @@ class AGNodes(object):
 
         @staticmethod
         def derivstring(params):
-            return "deriv_x(%d, x.shape)" % params
+            return "deriv_x(%d, dshape, ftype)" % params
 
         @staticmethod
         def printstring(params):
@@ -529,9 +819,9 @@ class AGNodes(object):
         shorthand_deriv = "deriv_c"
 
         @staticmethod
-        def call_deriv(xshape):
+        def call_deriv(dshape, ftype=np.float64):
             """gets derivative array of loaded value"""
-            return np.zeros(xshape)
+            return np.zeros(dshape, ftype)
 
         @staticmethod
         def funcstring(params):
@@ -539,7 +829,7 @@ class AGNodes(object):
 
         @staticmethod
         def derivstring(params):
-            return "deriv_c(x.shape)"
+            return "deriv_c(dshape, ftype)"
 
         @staticmethod
         def printstring(params):
@@ -576,6 +866,11 @@ class AGNodes(object):
         def derivstring(params):
             return "add(deriv[%d], deriv[%d])" % params
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.add(int_list[params[0]],
+                                          int_list[params[1]])
+
     class Subtract(Node):
         """
         subtraction
@@ -600,6 +895,11 @@ class AGNodes(object):
         def latexstring(params, str_list):
             return "%s - (%s)" % (str_list[params[0]], str_list[params[1]])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.subtract(int_list[params[0]],
+                                               int_list[params[1]])
+
     class Multiply(Node):
         """
         multiplication
@@ -628,6 +928,11 @@ class AGNodes(object):
                    "multiply(deriv[%d].transpose(), stack[%d]).transpose())" %\
                    (params[1], params[0], params[0], params[1])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.multiply(int_list[params[0]],
+                                               int_list[params[1]])
+
     class Divide(Node):
         """
         division
@@ -658,6 +963,11 @@ class AGNodes(object):
                    (params[0], params[1], params[1], params[0],
                     params[1], params[1])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.divide(int_list[params[0]],
+                                             int_list[params[1]])
+
     class Sin(Node):
         """
         sine
@@ -686,6 +996,10 @@ class AGNodes(object):
             return "multiply(deriv[%d].transpose(), "\
                    "sin_deriv(stack[%d])).transpose()" % (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.sin(int_list[params[0]])
+
     class Cos(Node):
         """
         cosine
@@ -715,6 +1029,10 @@ class AGNodes(object):
                    "cos_deriv(stack[%d])).transpose()" %\
                    (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.cos(int_list[params[0]])
+
     class Exp(Node):
         """
         e^x
@@ -742,6 +1060,10 @@ class AGNodes(object):
                    "exp(stack[%d])).transpose()" %\
                    (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.exp(int_list[params[0]])
+
     class Log(Node):
         """
         log(abs(x))
@@ -768,6 +1090,10 @@ class AGNodes(object):
             return "divide(deriv[%d].transpose(), stack[%d]).transpose()" % \
                    (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.log(int_list[params[0]])
+
     class Abs(Node):
         """
         abs(x)
@@ -797,6 +1123,10 @@ class AGNodes(object):
                    "sign(stack[%d])).transpose()" %\
                    (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.absolute(int_list[params[0]])
+
     class Sqrt(Node):
         """
         (x)^0.5
@@ -824,6 +1154,10 @@ class AGNodes(object):
                    "divide(0.5, sqroot(stack[%d]))).transpose()" %\
                    (params[0], params[0])
 
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.sqrt(int_list[params[0]])
+
     class Pow(Node):
         """
         (x)^y
@@ -853,3 +1187,44 @@ class AGNodes(object):
                    "power(stack[%d], stack[%d])).transpose()" %\
                     (params[0], params[1], params[0], params[0], params[0],
                      params[0], params[1])
+
+        @staticmethod
+        def interval(params, int_list):
+            return IntervalArithmetic.power(int_list[params[0]],
+                                            int_list[params[1]])
+
+
+SIMPLIFICATION_NAMES = {AGNodes.LoadData: "X",
+                        AGNodes.LoadConst: "C",
+                        AGNodes.Add: "+",
+                        AGNodes.Subtract: "-",
+                        AGNodes.Multiply: "*",
+                        AGNodes.Divide: "/",
+                        AGNodes.Sin: "sin",
+                        AGNodes.Cos: "cos",
+                        AGNodes.Exp: "exp",
+                        AGNodes.Log: "log",
+                        AGNodes.Pow: "pow",
+                        AGNodes.Abs: "abs",
+                        AGNodes.Sqrt: "sqrt"}
+
+# node types of AGNodes in a fixed order; commands are pickled as indices into
+# this list (see AGraph.__getstate__)
+NODE_TYPES = list(SIMPLIFICATION_NAMES)
+NODE_TYPE_INDEX = {node: i for i, node in enumerate(NODE_TYPES)}
+
+
+def node_namespace(node_types):
+    """
+    namespace of the compiled stacks of individuals with the given node types
+
+    :param node_types: list of node types
+    :return: dictionary of numpy and the functions of the node types
+    """
+    namespace = {'np': np}
+    for node_type in node_types:
+        if node_type.shorthand is not None:
+            namespace[node_type.shorthand] = node_type.call
+        if node_type.shorthand_deriv is not None:
+            namespace[node_type.shorthand_deriv] = node_type.call_deriv
+    return namespace
@@ -2,7 +2,8 @@
 This module contains most of the code necessary for the representation of an
 acyclic graph (linear stack) in symbolic regression.  This version of the
 Acyclic graph utilizes the bingocpp C++ library to do the function and
-derivative evaluations
+derivative evaluations (or the equivalent NumPy functions in AGraphCppNumpy if
+the library is not built)
 
 The current implementation has many hard coded sections. At the moment an
 integer to operator mapping is how the command stack is parsed.
@@ -21,15 +22,25 @@ the current map is:
 11: abs
 12: sqrt
 """
-import random
 import logging
-from bingocpp.build import bingocpp
 
 import numpy as np
 
+from .StackSimplification import SimplifiedStack
+from . import IntervalArithmetic
+from .RandomStreams import make_rng
+from .MigrationBuffers import pack_individuals, unpack_individuals
+
 np.seterr(all='ignore')
 LOGGER = logging.getLogger(__name__)
 
+try:
+    from bingocpp.build import bingocpp
+except ImportError:
+    LOGGER.debug("bingocpp not available, using NumPy command array "
+                 "evaluation")
+    from . import AGraphCppNumpy as bingocpp
+
 
 COMMAND_PRINT_MAP = {0: "X",
                      1: "C",
@@ -46,6 +57,20 @@ COMMAND_PRINT_MAP = {0: "X",
                      12: "sqrt"}
 
 
+INTERVAL_MAP = {2: IntervalArithmetic.add,
+                3: IntervalArithmetic.subtract,
+                4: IntervalArithmetic.multiply,
+                5: IntervalArithmetic.divide,
+                6: IntervalArithmetic.sin,
+                7: IntervalArithmetic.cos,
+                8: IntervalArithmetic.exp,
+                9: IntervalArithmetic.log_abs,
+                10: IntervalArithmetic.power,
+                11: IntervalArithmetic.absolute,
+                12: IntervalArithmetic.sqrt_abs}
+UNARY_COMMANDS = (6, 7, 8, 9, 11, 12)
+
+
 class AGraphCppManipulator(object):
     """
     Manipulates AGraph objects for generation, crossover, mutation,
@@ -69,6 +94,8 @@ class AGraphCppManipulator(object):
         self.nloads = nloads
         self.float_lim = float_lim
         self.terminal_prob = terminal_prob
+        # random stream; islands bind their own stream to it (RandomStreams)
+        self.rng = make_rng()
 
         self.node_type_list = []
         self.terminal_inds = []
@@ -105,7 +132,7 @@ class AGraphCppManipulator(object):
         indv = AGraphCpp()
         command_list = []
         for stack_loc in range(self.ag_size):
-            if np.random.random() < self.terminal_prob \
+            if self.rng.random() < self.terminal_prob \
                     or stack_loc < self.nloads:
                 command_list.append(self.rand_terminal())
             else:
@@ -113,6 +140,25 @@ class AGraphCppManipulator(object):
         indv.command_array = np.array(command_list, dtype=int)
         return indv
 
+    def generate_batch(self, n_indv):
+        """
+        Generates many random individuals at once.  The random commands for
+        all of the stack locations are drawn as arrays, with the same
+        probabilities as in generate
+
+        :param n_indv: number of individuals
+        :return: list of new random acyclic graph individuals
+        """
+        stack_locs = np.tile(np.arange(self.ag_size), n_indv)
+        commands = self.rand_commands_batch(stack_locs,
+                                            stack_locs < self.nloads)
+        individuals = []
+        for command_array in commands.reshape((n_indv, self.ag_size, 3)):
+            indv = AGraphCpp()
+            indv.command_array = command_array
+            individuals.append(indv)
+        return individuals
+
     def crossover(self, parent1, parent2):
         """
         Single point crossover
@@ -121,7 +167,7 @@ class AGraphCppManipulator(object):
         :param parent2: second parent
         :return: two children (new copies)
         """
-        cx_point = np.random.randint(1, self.ag_size)
+        cx_point = self.rng.integers(1, self.ag_size)
         child1 = parent1.copy()
         child2 = parent2.copy()
         child1.command_array[cx_point:, :] = parent2.command_array[cx_point:, :]
@@ -130,6 +176,8 @@ class AGraphCppManipulator(object):
         child2.fitness = None
         child1.fit_set = False
         child2.fit_set = False
+        child1.fitness_memo = {}
+        child2.fitness_memo = {}
         child_age = max(parent1.genetic_age, parent2.genetic_age)
         child1.genetic_age = child_age
         child2.genetic_age = child_age
@@ -144,17 +192,17 @@ class AGraphCppManipulator(object):
         """
         # pick mutation point within currently utilized commands
         util = indv.utilized_commands()
-        loc = np.random.randint(sum(util))
+        loc = self.rng.integers(sum(util))
         mut_point = [n for n, x in enumerate(util) if x][loc]
         orig_node_type, new_param1, new_param2 = indv.command_array[mut_point]
 
         # mutate operator (0.4) mutate params (0.4) prune branch (0.2)
-        rand_val = np.random.random()
+        rand_val = self.rng.random()
         # mutate operator
         if rand_val < 0.4 and mut_point > self.nloads:
             new_type_found = False
             while not new_type_found:
-                if np.random.random() < self.terminal_prob:
+                if self.rng.random() < self.terminal_prob:
                     new_node_type, new_param1, new_param2 = self.rand_terminal()
                 else:
                     new_node_type, new_param1, new_param2 = \
@@ -181,7 +229,7 @@ class AGraphCppManipulator(object):
         # prune branch
         else:
             if orig_node_type > 1:  # operators only           # TODO hardcoded
-                pruned_param = random.choice((new_param1, new_param2))
+                pruned_param = self.rng.choice((new_param1, new_param2))
                 for i in range(mut_point, len(indv.command_array)):
                     if indv.command_array[i, 0] > 1 and \
                                     mut_point in indv.command_array[i, 1:]:
@@ -196,6 +244,7 @@ class AGraphCppManipulator(object):
 
         indv.fitness = None
         indv.fit_set = False
+        indv.fitness_memo = {}
         return indv
 
     @staticmethod
@@ -211,6 +260,137 @@ class AGraphCppManipulator(object):
 
         return dist
 
+    def crossover_batch(self, parents1, parents2):
+        """
+        Single point crossover of many pairs of parents at once
+
+        :param parents1: list of first parents
+        :param parents2: list of second parents
+        :return: two lists of children (new individuals)
+        """
+        commands1 = np.stack([p.command_array for p in parents1])
+        commands2 = np.stack([p.command_array for p in parents2])
+        cx_points = self.rng.integers(1, self.ag_size, len(parents1))
+        swap = (np.arange(self.ag_size) >= cx_points[:, None])[:, :, None]
+        children1 = self.children_from_arrays(
+            np.where(swap, commands2, commands1), parents1, parents2)
+        children2 = self.children_from_arrays(
+            np.where(swap, commands1, commands2), parents2, parents1)
+        return children1, children2
+
+    @staticmethod
+    def children_from_arrays(command_arrays, parents1, parents2):
+        """
+        Makes new (unevaluated) individuals from the rows of a population
+        command array
+
+        :param command_arrays: (n, ag_size, 3) array of commands
+        :param parents1: list of parents whose constants are kept
+        :param parents2: list of the other parents
+        :return: list of new individuals
+        """
+        children = []
+        for commands, parent1, parent2 in zip(command_arrays, parents1,
+                                              parents2):
+            child = AGraphCpp()
+            child.command_array = commands
+            child.constants = list(parent1.constants)
+            child.genetic_age = max(parent1.genetic_age, parent2.genetic_age)
+            children.append(child)
+        return children
+
+    def mutation_batch(self, indvs):
+        """
+        Performs 1pt mutation on many individuals at once (same probabilities
+        as mutation); does not create copies
+
+        :param indvs: list of individuals which are mutated
+        :return: list of mutated individuals (not new copies)
+        """
+        commands = np.stack([indv.command_array for indv in indvs])
+        n_indv = len(indvs)
+        rows = np.arange(n_indv)
+
+        # pick mutation points within currently utilized commands
+        util = utilized_commands_batch(commands)
+        util_count = np.cumsum(util, axis=1)
+        loc = (self.rng.random(n_indv) * util_count[:, -1]).astype(int)
+        mut_points = np.argmax(util_count > loc[:, None], axis=1)
+        orig_types = commands[rows, mut_points, 0]
+
+        # mutate operator (0.4) mutate params (0.4) prune branch (0.2)
+        rand_vals = self.rng.random(n_indv)
+        op_mut = (rand_vals < 0.4) & (mut_points > self.nloads)
+        param_mut = ~op_mut & (rand_vals < 0.8)
+        prune = ~op_mut & ~param_mut & (orig_types > 1)    # TODO hardcoded
+
+        # mutate operator: redraw until the type changes (unless terminal)
+        new_commands = commands[rows, mut_points]
+        redraw = op_mut
+        while np.any(redraw):
+            new_commands[redraw] = self.rand_commands_batch(
+                mut_points[redraw])
+            redraw = op_mut & (new_commands[:, 0] == orig_types) & \
+                     (orig_types > 1)
+        commands[rows[op_mut], mut_points[op_mut]] = new_commands[op_mut]
+
+        # mutate parameters
+        term_mut = param_mut & (orig_types <= 1)            # TODO hardcoded
+        term_params = np.where(orig_types == 0,
+                               self.rng.integers(self.nvars, size=n_indv), -1)
+        commands[rows[term_mut], mut_points[term_mut], 1] = \
+            term_params[term_mut]
+        commands[rows[term_mut], mut_points[term_mut], 2] = \
+            term_params[term_mut]
+        oper_mut = param_mut & (orig_types > 1)
+        oper_params = self.rand_operator_params_batch(mut_points)
+        commands[rows[oper_mut], mut_points[oper_mut], 1:] = \
+            oper_params[oper_mut]
+
+        # prune branch: later references to the mutation point are replaced
+        # by one of its parameters
+        pruned_params = commands[rows, mut_points,
+                                 self.rng.integers(1, 3, n_indv)]
+        later_ops = (np.arange(self.ag_size) >= mut_points[:, None]) & \
+                    (commands[:, :, 0] > 1) & prune[:, None]
+        for col in (1, 2):
+            refs = later_ops & (commands[:, :, col] == mut_points[:, None])
+            commands[:, :, col] = np.where(refs, pruned_params[:, None],
+                                           commands[:, :, col])
+
+        for indv, indv_commands in zip(indvs, commands):
+            indv.command_array = indv_commands
+            indv.fitness = None
+            indv.fit_set = False
+            indv.fitness_memo = {}
+        return indvs
+
+    @staticmethod
+    def distance_batch(indvs1, indvs2):
+        """
+        Computes the distances between pairs of individuals
+
+        :param indvs1: list of first individuals
+        :param indvs2: list of second individuals
+        :return: numpy array of distances
+        """
+        commands1 = np.stack([indv.command_array for indv in indvs1])
+        commands2 = np.stack([indv.command_array for indv in indvs2])
+        return np.sum(commands1 != commands2, axis=(1, 2))
+
+    @staticmethod
+    def distance_matrix(indvs1, indvs2):
+        """
+        Computes the distances between all pairs of individuals from two lists
+
+        :param indvs1: list of individuals (rows)
+        :param indvs2: list of individuals (columns)
+        :return: 2d numpy array of distances
+        """
+        commands1 = np.stack([indv.command_array for indv in indvs1])
+        commands2 = np.stack([indv.command_array for indv in indvs2])
+        return np.sum(commands1[:, None] != commands2[None, :], axis=(2, 3))
+
     @staticmethod
     def dump(indv):
         """
@@ -242,7 +422,44 @@ class AGraphCppManipulator(object):
         return indv
 
     @staticmethod
-    def rand_operator_params(arity, stack_loc):
+    def pack(indvs):
+        """
+        Packs individuals into numpy arrays for migration (see
+        MigrationBuffers)
+
+        :param indvs: list of individuals
+        :return: list of integer arrays (concatenated command arrays, offsets
+                 of the commands and of the constants of each individual,
+                 genetic ages), list of float arrays (concatenated constants)
+        """
+        if len(indvs) > 0:
+            commands = np.concatenate([indv.command_array for indv in indvs])
+        else:
+            commands = np.empty((0, 3), dtype=np.int64)
+        command_lengths = [len(indv.command_array) for indv in indvs]
+        return pack_individuals(indvs, commands, command_lengths)
+
+    def unpack(self, int_arrays, float_arrays):
+        """
+        Unpacks individuals from the numpy arrays made by pack
+
+        :param int_arrays: list of integer arrays
+        :param float_arrays: list of float arrays
+        :return: list of individuals
+        """
+        indvs = []
+        for commands, constants, genetic_age in unpack_individuals(
+                int_arrays, float_arrays):
+            if not np.all(np.isin(commands[:, 0], self.node_type_list)):
+                raise RuntimeError
+            indv = AGraphCpp()
+            indv.command_array = commands.astype(int)
+            indv.constants = constants
+            indv.genetic_age = genetic_age
+            indvs.append(indv)
+        return indvs
+
+    def rand_operator_params(self, arity, stack_loc):
         """
         Produces random tuple for use as operator parameters
 
@@ -251,17 +468,59 @@ class AGraphCppManipulator(object):
         :return: tuple of parameters
         """
         if stack_loc > 1:
-            return tuple(np.random.randint(0, stack_loc, arity))
+            return tuple(self.rng.integers(0, stack_loc, arity))
         else:
             return (0,)*arity
 
+    def rand_operator_params_batch(self, stack_locs):
+        """
+        Produces random operator parameters for many commands at once
+
+        :param stack_locs: numpy array of locations of commands in stack
+        :return: (n, 2) array of parameters
+        """
+        params = (self.rng.random((len(stack_locs), 2)) *
+                  stack_locs[:, None]).astype(int)
+        params[stack_locs <= 1] = 0
+        return params
+
+    def rand_commands_batch(self, stack_locs, force_terminal=None):
+        """
+        Produces random commands (terminals with probability terminal_prob,
+        otherwise operators) for many stack locations at once
+
+        :param stack_locs: numpy array of locations of commands in stack
+        :param force_terminal: optional boolean array of the locations which
+                               must be terminals
+        :return: (n, 3) array of commands
+        """
+        n_cmds = len(stack_locs)
+        node_types = np.array(self.node_type_list)
+        terminal = self.rng.random(n_cmds) < self.terminal_prob
+        if force_terminal is not None:
+            terminal = np.logical_or(terminal, force_terminal)
+        new_commands = np.empty((n_cmds, 3), dtype=int)
+
+        term_types = node_types[self.rng.choice(self.terminal_inds, n_cmds)]
+        term_params = np.where(term_types == 0,
+                               self.rng.integers(self.nvars, size=n_cmds), -1)
+        oper_types = node_types[self.rng.choice(self.operator_inds, n_cmds)]
+        oper_params = self.rand_operator_params_batch(stack_locs)
+
+        new_commands[:, 0] = np.where(terminal, term_types, oper_types)
+        new_commands[:, 1] = np.where(terminal, term_params,
+                                      oper_params[:, 0])
+        new_commands[:, 2] = np.where(terminal, term_params,
+                                      oper_params[:, 1])
+        return new_commands
+
     def rand_operator_type(self):
         """
         Picks a random operator from the operator list
 
         :return: operator (acyclic graph node type)
         """
-        node = self.node_type_list[random.choice(self.operator_inds)]
+        node = self.node_type_list[self.rng.choice(self.operator_inds)]
         return node
 
     def rand_operator(self, stack_loc):
@@ -283,7 +542,7 @@ class AGraphCppManipulator(object):
         :return: terminal parameter
         """
         if terminal == 0:                                      # TODO hardcoded
-            param = np.random.randint(self.nvars)
+            param = self.rng.integers(self.nvars)
         else:
             param = -1                                         # TODO hardcoded
         return param,
@@ -296,7 +555,7 @@ class AGraphCppManipulator(object):
         :return: terminal parameter
         """
         if terminal == 0:                                      # TODO hardcoded
-            param = np.random.randint(self.nvars)
+            param = self.rng.integers(self.nvars)
         else:
             param = -1                                         # TODO hardcoded
         return param,
@@ -307,7 +566,7 @@ class AGraphCppManipulator(object):
 
         :return: Load node, data index or constant index
         """
-        node = self.node_type_list[random.choice(self.terminal_inds)]
+        node = self.node_type_list[self.rng.choice(self.terminal_inds)]
         param = self.rand_terminal_param(node)
         return node, param[0], param[0]
 
@@ -322,12 +581,14 @@ class AGraphCpp(object):
         self.genetic_age = 0
         self.fitness = None
         self.fit_set = False
+        self.fitness_memo = {}
 
     def copy(self):
         """return a deep copy"""
         dup = AGraphCpp()
         dup.fitness = self.fitness
         dup.fit_set = self.fit_set
+        dup.fitness_memo = dict(self.fitness_memo)
         dup.constants = list(self.constants)
         dup.command_array = np.array(self.command_array)
         dup.genetic_age = self.genetic_age
@@ -345,7 +606,19 @@ class AGraphCpp(object):
         return False
 
     def count_constants(self):
-        """count constants and set up for  optimization"""
+        """
+        count constants and set up for  optimization.  The stack is simplified
+        first: common subexpressions are referenced directly and each
+        constant-only sub-stack is replaced by a single constant
+        """
+        simple = self.simplified_stack()
+        for i in simple.constant_roots:
+            self.command_array[i] = (1, -1, -1)                # TODO hard coded
+        for i, (node, param1, param2) in \
+                enumerate(self.command_array.tolist()):
+            if simple.util[i] and node > 1:
+                self.command_array[i] = (node, simple.alias[param1],
+                                         simple.alias[param2])
 
         # compile fitness function for optimization
         util = self.utilized_commands()
@@ -357,6 +630,50 @@ class AGraphCpp(object):
                     const_num += 1
         return const_num
 
+    def guaranteed_invalid(self, bounds):
+        """
+        find out (using interval arithmetic) whether the (simplified) stack
+        evaluates to nan or infinity for all inputs within the bounds.  The
+        simplified stack is screened since that is the stack which is
+        evaluated
+
+        :param bounds: list of (min, max) for each column of x
+        :return: True if the individual is guaranteed to be invalid
+        """
+        simple = self.simplified_stack()
+        commands = self.command_array.tolist()
+        int_list = [None]*len(commands)
+        for i, (node, param1, param2) in enumerate(commands):
+            if simple.util[i]:
+                if node == 0:                               # TODO hard coded
+                    int_list[i] = IntervalArithmetic.make_interval(
+                        *bounds[param1])
+                elif node == 1:                               # TODO hard coded
+                    if 0 <= param1 < len(self.constants):
+                        const = self.constants[param1]
+                        int_list[i] = IntervalArithmetic.make_interval(
+                            const, const)
+                    else:
+                        int_list[i] = IntervalArithmetic.FINITE
+                elif node in UNARY_COMMANDS:
+                    int_list[i] = INTERVAL_MAP[node](
+                        int_list[simple.alias[param1]])
+                else:
+                    int_list[i] = INTERVAL_MAP[node](
+                        int_list[simple.alias[param1]],
+                        int_list[simple.alias[param2]])
+        return IntervalArithmetic.is_non_finite(int_list[simple.alias[-1]])
+
+    def simplified_stack(self):
+        """
+        simplification of the stack (see StackSimplification)
+
+        :return: SimplifiedStack of the command array
+        """
+        return SimplifiedStack([(COMMAND_PRINT_MAP[node], param1, param2)
+                                for node, param1, param2 in
+                                self.command_array.tolist()])
+
     def set_constants(self, consts):
         """manually set constants"""
         self.constants = consts
@@ -484,14 +801,34 @@ class AGraphCpp(object):
 
     def utilized_commands(self):
         """find which commands are utilized"""
-        util = [False]*self.command_array.shape[0]
+        commands = self.command_array.tolist()
+        util = [False]*len(commands)
         util[-1] = True
-        for i in range(1, self.command_array.shape[0]):
-            if util[-i] and self.command_array[-i][0] > 1:
-                util[self.command_array[-i][1]] = True
-                util[self.command_array[-i][2]] = True
+        for i in range(len(commands) - 1, 0, -1):
+            node, param1, param2 = commands[i]
+            if util[i] and node > 1:
+                util[param1] = True
+                util[param2] = True
         return util
 
     def complexity(self):
         """find number of commands that are utilized"""
         return sum(self.utilized_commands())
+
+
+def utilized_commands_batch(command_arrays):
+    """
+    Finds which commands are utilized for a whole population in a single
+    backward pass over the stack
+
+    :param command_arrays: (n, ag_size, 3) array of commands
+    :return: (n, ag_size) boolean array of utilized commands
+    """
+    n_indv, ag_size, _ = command_arrays.shape
+    util = np.zeros((n_indv, ag_size), dtype=bool)
+    util[:, -1] = True
+    for i in range(ag_size - 1, 0, -1):
+        active = np.flatnonzero(util[:, i] & (command_arrays[:, i, 0] > 1))
+        util[active, command_arrays[active, i, 1]] = True
+        util[active, command_arrays[active, i, 2]] = True
+    return util
@@ -0,0 +1,189 @@
+"""
+This module contains a pure NumPy implementation of the bingocpp functions
+which evaluate AGraphCpp command arrays (and their derivatives).  AGraphCpp
+falls back to it when the bingocpp C++ library is not built.
+
+The stack is simplified before evaluation (see StackSimplification): only the
+utilized commands of the simplified stack are evaluated, common subexpressions
+are evaluated once and constants are kept as scalars.  The operators use the same integer map as AGraphCpp (see
+COMMAND_PRINT_MAP); log and sqrt act on the absolute value of their argument.
+Evaluation is done in the floating point precision of x.
+"""
+import numpy as np
+
+from .StackSimplification import SimplifiedStack
+
+COMMAND_NAMES = ["X", "C", "+", "-", "*", "/", "sin", "cos", "exp", "log",
+                 "pow", "abs", "sqrt"]
+
+
+def simplify(commands):
+    """
+    Simplifies a stack of commands
+
+    :param commands: list of [node, param1, param2] commands
+    :return: SimplifiedStack
+    """
+    return SimplifiedStack([(COMMAND_NAMES[node], param1, param2)
+                            for node, param1, param2 in commands])
+
+
+def float_type(x):
+    """floating point type of the evaluation (double precision for int x)"""
+    return np.result_type(x.dtype, np.float32).type
+
+
+def forward_eval(command_array, x, constants):
+    """
+    Evaluates the utilized commands of the simplified stack
+
+    :param command_array: (n, 3) integer array of commands
+    :param x: 2d numpy array of input data
+    :param constants: list of constants
+    :return: list of the values of the commands (None if unused),
+             SimplifiedStack of the command array
+    """
+    commands = command_array.tolist()
+    simple = simplify(commands)
+    alias = simple.alias
+    ftype = float_type(x)
+    stack = [None]*len(commands)
+    for i, (node, param1, param2) in enumerate(commands):
+        if not simple.util[i]:
+            continue
+        if node > 1:
+            arg1 = stack[alias[param1]]
+            arg2 = stack[alias[param2]]
+        if node == 0:
+            stack[i] = x[:, param1]
+        elif node == 1:
+            stack[i] = ftype(constants[param1] if param1 != -1 else 0.0)
+        elif node == 2:
+            stack[i] = arg1 + arg2
+        elif node == 3:
+            stack[i] = arg1 - arg2
+        elif node == 4:
+            stack[i] = arg1 * arg2
+        elif node == 5:
+            stack[i] = arg1 / arg2
+        elif node == 6:
+            stack[i] = np.sin(arg1)
+        elif node == 7:
+            stack[i] = np.cos(arg1)
+        elif node == 8:
+            stack[i] = np.exp(arg1)
+        elif node == 9:
+            stack[i] = np.log(np.abs(arg1))
+        elif node == 10:
+            stack[i] = np.power(arg1, arg2)
+        elif node == 11:
+            stack[i] = np.abs(arg1)
+        elif node == 12:
+            stack[i] = np.sqrt(np.abs(arg1))
+        else:
+            raise ValueError("Unknown command %d in command array" % node)
+    return stack, simple
+
+
+def output_column(value, x):
+    """the value of the stack as a (len(x), 1) array"""
+    return np.broadcast_to(value, (x.shape[0],)).reshape([-1, 1]).astype(
+        float_type(x))
+
+
+def simplify_and_evaluate(command_array, x, constants):
+    """
+    Evaluates the stack
+
+    :param command_array: (n, 3) integer array of commands
+    :param x: 2d numpy array of input data
+    :param constants: list of constants
+    :return: (len(x), 1) array of the value of the stack
+    """
+    stack, simple = forward_eval(command_array, x, constants)
+    return output_column(stack[simple.alias[-1]], x)
+
+
+def simplify_and_evaluate_with_derivative(command_array, x, constants,
+                                          wrt_param_x_or_c):
+    """
+    Evaluates the stack and its derivative (by reverse accumulation through
+    the utilized commands) with respect to either the input data or the
+    constants
+
+    :param command_array: (n, 3) integer array of commands
+    :param x: 2d numpy array of input data
+    :param constants: list of constants
+    :param wrt_param_x_or_c: True for derivative with respect to x, False for
+                             derivative with respect to the constants
+    :return: (len(x), 1) array of the value of the stack, derivative array
+             with a column for each column of x (or each constant)
+    """
+    stack, simple = forward_eval(command_array, x, constants)
+    alias = simple.alias
+    commands = command_array.tolist()
+    ftype = float_type(x)
+    if wrt_param_x_or_c:
+        deriv = np.zeros((x.shape[0], x.shape[1]), ftype)
+        deriv_node = 0
+    else:
+        deriv = np.zeros((x.shape[0], len(constants)), ftype)
+        deriv_node = 1
+
+    adjoint = [None]*len(commands)
+    adjoint[alias[-1]] = np.ones(x.shape[0], ftype)
+    for i in range(len(commands) - 1, -1, -1):
+        if not simple.util[i] or adjoint[i] is None:
+            continue
+        node, param1, param2 = commands[i]
+        if node <= 1:
+            if node == deriv_node and param1 != -1:
+                deriv[:, param1] += adjoint[i]
+            continue
+
+        param1 = alias[param1]
+        param2 = alias[param2]
+        arg1 = stack[param1]
+        arg2 = stack[param2]
+        partial2 = None
+        if node == 2:
+            partial1 = 1.0
+            partial2 = 1.0
+        elif node == 3:
+            partial1 = 1.0
+            partial2 = -1.0
+        elif node == 4:
+            partial1 = arg2
+            partial2 = arg1
+        elif node == 5:
+            partial1 = 1.0 / arg2
+            partial2 = -stack[i] / arg2
+        elif node == 6:
+            partial1 = np.cos(arg1)
+        elif node == 7:
+            partial1 = -np.sin(arg1)
+        elif node == 8:
+            partial1 = stack[i]
+        elif node == 9:
+            partial1 = 1.0 / arg1
+        elif node == 10:
+            partial1 = stack[i] * arg2 / arg1
+            partial2 = stack[i] * np.log(arg1)
+        elif node == 11:
+            partial1 = np.sign(arg1)
+        else:
+            partial1 = 0.5 * np.sign(arg1) / stack[i]
+
+        accumulate_adjoint(adjoint, param1, adjoint[i] * partial1)
+        if partial2 is not None:
+            accumulate_adjoint(adjoint, param2, adjoint[i] * partial2)
+
+    return output_column(stack[alias[-1]], x), deriv
+
+
+def accumulate_adjoint(adjoint, index, value):
+    """adds a contribution to the adjoint of a command"""
+    if adjoint[index] is None:
+        adjoint[index] = value
+    else:
+        adjoint[index] = adjoint[index] + value
@@ -0,0 +1,206 @@
+"""
+This module contains the asynchronous migration used by the
+ParallelIslandManager when a migration topology is given.  Each rank sends
+copies of a random subset of its populations (emigrants) to its neighbors in
+the topology with non-blocking sends, and immigrants are merged into the
+populations whenever they arrive.  There is no global synchronization: ranks
+poll for immigrants between generations, so that a slow rank does not hold up
+the others.
+
+A migration message from one rank to another is a header with the sizes of
+the two buffers (see MigrationBuffers) followed by the integer and the float
+buffer, all with the same mpi tag.  Since messages between a pair of ranks
+with the same tag do not overtake each other, the receive buffers can be
+posted as soon as the header has arrived.
+"""
+import logging
+
+from mpi4py import MPI
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+# number of emigrations which can be in flight at once
+SEND_SLOTS = 2
+
+
+def ring(size, rng=None):
+    """
+    Ring topology: each rank is connected to the previous and the next rank
+
+    :param size: number of ranks
+    :param rng: unused
+    :return: list of the neighbors (destinations) of each rank
+    """
+    return [unique_neighbors(rank, [rank - 1, rank + 1], size)
+            for rank in range(size)]
+
+
+def torus(size, rng=None):
+    """
+    2d torus topology: the ranks are placed on a periodic grid (see
+    MPI.Compute_dims) and each rank is connected to its 4 nearest neighbors
+
+    :param size: number of ranks
+    :param rng: unused
+    :return: list of the neighbors (destinations) of each rank
+    """
+    n_rows, n_cols = MPI.Compute_dims(size, 2)
+    graph = []
+    for rank in range(size):
+        row, col = divmod(rank, n_cols)
+        neighbors = [((row - 1) % n_rows) * n_cols + col,
+                     ((row + 1) % n_rows) * n_cols + col,
+                     row * n_cols + (col - 1) % n_cols,
+                     row * n_cols + (col + 1) % n_cols]
+        graph.append(unique_neighbors(rank, neighbors, size))
+    return graph
+
+
+def random_regular(size, rng=None, degree=2):
+    """
+    Random regular topology: the ranks are put in a random cyclic order and
+    each rank sends to the next degree ranks in that order, so that each rank
+    sends to and receives from degree (distinct) ranks
+
+    :param size: number of ranks
+    :param rng: random stream (None uses the global numpy random state)
+    :param degree: number of destinations of each rank
+    :return: list of the neighbors (destinations) of each rank
+    """
+    if rng is None:
+        rng = np.random
+    order = list(range(size))
+    rng.shuffle(order)
+    graph = [None]*size
+    for i, rank in enumerate(order):
+        graph[rank] = unique_neighbors(
+            rank, [order[(i + j) % size] for j in range(1, degree + 1)], size)
+    return graph
+
+
+def unique_neighbors(rank, neighbors, size):
+    """distinct neighbors (mod size) of a rank, not including itself"""
+    unique = []
+    for neighbor in neighbors:
+        neighbor %= size
+        if neighbor != rank and neighbor not in unique:
+            unique.append(neighbor)
+    return unique
+
+
+TOPOLOGIES = {"ring": ring,
+              "torus": torus,
+              "random_regular": random_regular}
+
+
+class AsyncMigrator(object):
+    """
+    Non-blocking migration of a coevolution island to its neighbors
+
+    :param comm: mpi communicator
+    :param destinations: list of the ranks to which emigrants are sent
+    :param migration_rate: fraction of each population which is sent to each
+                           destination at an emigration
+    :param tag: mpi tag of the migration messages
+    """
+    def __init__(self, comm, destinations, migration_rate=0.1, tag=5):
+        self.comm = comm
+        self.destinations = destinations
+        self.migration_rate = migration_rate
+        self.tag = tag
+        # (requests, buffers) of each emigration still in flight; the buffers
+        # are kept so that they are not freed before the sends complete
+        self.pending_sends = []
+        # (requests, buffers) of immigrants which are being received
+        self.pending_recvs = []
+
+    def emigrate(self, isle, rng):
+        """
+        Posts copies of random subsets of the populations to all destinations
+
+        :param isle: coevolution island
+        :param rng: random stream for choosing the emigrants
+        :return: whether emigrants were sent (False if all of the send slots
+                 are still in flight)
+        """
+        self.pending_sends = [(requests, buffers) for requests, buffers in
+                              self.pending_sends
+                              if not MPI.Request.Testall(requests)]
+        if len(self.pending_sends) >= SEND_SLOTS:
+            LOGGER.debug("%2d > emigration skipped, %d sends in flight",
+                         self.comm.Get_rank(), len(self.pending_sends))
+            return False
+        requests = []
+        buffers = []
+        for dest in self.destinations:
+            subsets = [self.random_subset(len(pop), rng) for pop in
+                       (isle.solution_island.pop, isle.predictor_island.pop,
+                        isle.trainers)]
+            int_buffer, float_buffer = isle.pack_populations(*subsets)
+            header = np.array([len(int_buffer), len(float_buffer)],
+                              dtype=np.int64)
+            for buffer in (header, int_buffer, float_buffer):
+                requests.append(self.comm.Issend(buffer, dest=dest,
+                                                 tag=self.tag))
+                buffers.append(buffer)
+        self.pending_sends.append((requests, buffers))
+        return True
+
+    def random_subset(self, pop_size, rng):
+        """random indices of migration_rate of a population"""
+        n_migrants = min(pop_size,
+                         int(round(self.migration_rate * pop_size)))
+        return rng.sample(range(pop_size), n_migrants)
+
+    def poll(self, isle):
+        """
+        Merges the immigrants which have arrived and posts the receives of
+        the immigrants whose header has arrived
+
+        :param isle: coevolution island
+        :return: number of immigrations merged
+        """
+        n_merged = 0
+        still_pending = []
+        for requests, buffers in self.pending_recvs:
+            if MPI.Request.Testall(requests):
+                isle.merge_immigrants(*buffers)
+                n_merged += 1
+            else:
+                still_pending.append((requests, buffers))
+        self.pending_recvs = still_pending
+
+        status = MPI.Status()
+        while self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=self.tag,
+                               status=status):
+            source = status.Get_source()
+            header = np.empty(2, dtype=np.int64)
+            self.comm.Recv(header, source=source, tag=self.tag)
+            buffers = [np.empty(header[0], dtype=np.int64),
+                       np.empty(header[1], dtype=np.float64)]
+            requests = [self.comm.Irecv(buffer, source=source, tag=self.tag)
+                        for buffer in buffers]
+            self.pending_recvs.append((requests, buffers))
+        return n_merged
+
+    def finish(self, isle):
+        """
+        Completes all migration: waits for the emigrants to be received
+        (while receiving immigrants) and then for all ranks to do the same,
+        so that no migration messages are left unreceived
+
+        :param isle: coevolution island
+        """
+        for requests, _ in self.pending_sends:
+            while not MPI.Request.Testall(requests):
+                self.poll(isle)
+        self.pending_sends = []
+        barrier = self.comm.Ibarrier()
+        while not barrier.Test():
+            self.poll(isle)
+        self.poll(isle)
+        for requests, buffers in self.pending_recvs:
+            MPI.Request.Waitall(requests)
+            isle.merge_immigrants(*buffers)
+        self.pending_recvs = []
@@ -0,0 +1,321 @@
+"""
+This module contains the checkpoints of the island managers.
+
+Compact format: a checkpoint is an (uncompressed) npz file of numpy arrays in
+named sections.  The populations, predictors and trainers of each island are
+stored as the packed buffers used for migration (see MigrationBuffers and
+CoevolutionIsland.pack_populations); the pareto front of the solutions of
+each island and the joint pareto front are packed by the gene manipulator.
+The training data is not stored with the islands: it is written to a
+separate data file named by its content hash, which is written only once and
+shared by all islands, ranks and checkpoints that use the same data.  Since
+gene manipulators, fitness metrics and the settings of the islands are not
+stored, islands are restored by making them from the arguments of the island
+manager and loading the sections into them.
+
+npz files are read lazily: a section is only read from the file when it is
+accessed (see CompactCheckpoint), and the training data is only read if it
+differs from the data of the island being restored.
+
+Sharded checkpoints (ParallelIslandManager): each rank writes its own island
+to a shard file in a background thread, from a copy of its buffers taken in
+the main thread.  Once the shards of all ranks are written (a non-blocking
+barrier), rank 0 writes a small manifest (under the checkpoint file name)
+which holds the number of shards, the age and the joint pareto front, so a
+manifest is only present when its shards are complete.  The training data is
+written by rank 0 only.  Files are written to a temporary name and renamed,
+so that a checkpoint file is either complete or absent.
+
+On restart every rank reads the manifest and its own shards in parallel.  The
+number of ranks may differ from the number of shards: with more shards than
+ranks, the islands of the shards assigned to a rank are combined (and cut
+back to the configured population sizes); with fewer, some ranks start from
+copies of the islands of other ranks, mixed with new random solutions.
+"""
+import hashlib
+import io
+import os
+import threading
+import zipfile
+
+import numpy as np
+
+from . import TrainingData
+from .MigrationBuffers import pack_buffers, unpack_buffers
+
+COMPACT_FORMAT = "bingo compact checkpoint"
+
+# attributes of training data which are caches rather than data
+DATA_CACHES = ("bounds",)
+
+
+def shard_name(filename, shard):
+    """file name of a shard of a checkpoint"""
+    return "%s.shard%d" % (filename, shard)
+
+
+def data_name(filename, data_hash):
+    """file name of the training data (with a content hash) of a checkpoint"""
+    return os.path.join(os.path.dirname(filename),
+                        "training_data_%s.npz" % data_hash)
+
+
+def write_atomic(filename, data):
+    """
+    Writes bytes to a file through a temporary file, which is renamed once
+    the write is complete
+
+    :param filename: name of the file
+    :param data: bytes which are written
+    """
+    temp_name = "%s.tmp%d" % (filename, os.getpid())
+    with open(temp_name, "wb") as out_file:
+        out_file.write(data)
+        out_file.flush()
+        os.fsync(out_file.fileno())
+    os.replace(temp_name, filename)
+
+
+def npz_bytes(sections):
+    """
+    Serializes sections of a compact checkpoint
+
+    :param sections: dictionary of numpy arrays (or scalars) by name
+    :return: bytes of an npz file
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, format=np.array(COMPACT_FORMAT), **sections)
+    return buffer.getvalue()
+
+
+def is_compact(filename):
+    """whether a checkpoint file is in the compact (npz) format"""
+    return zipfile.is_zipfile(filename)
+
+
+def data_arrays(training_data):
+    """
+    Arrays of training data (caches and None attributes are left out)
+
+    :param training_data: training data
+    :return: dictionary of numpy arrays by attribute name
+    """
+    return {name: np.asarray(value) for name, value in
+            sorted(vars(training_data).items())
+            if name not in DATA_CACHES and value is not None}
+
+
+def data_hash(training_data):
+    """content hash of training data (its type and its arrays)"""
+    digest = hashlib.sha256(type(training_data).__name__.encode())
+    for name, array in data_arrays(training_data).items():
+        array = np.ascontiguousarray(array)
+        digest.update(("%s %s %s" % (name, array.dtype,
+                                     array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def write_training_data(filename, training_data):
+    """
+    Writes training data to the data file of a checkpoint, unless a data file
+    with the same content hash already exists
+
+    :param filename: name of the checkpoint file
+    :param training_data: training data
+    :return: content hash of the training data
+    """
+    content_hash = data_hash(training_data)
+    name = data_name(filename, content_hash)
+    if not os.path.exists(name):
+        arrays = {"attr/" + attr: array for attr, array in
+                  data_arrays(training_data).items()}
+        arrays["class"] = np.array(type(training_data).__name__)
+        write_atomic(name, npz_bytes(arrays))
+    return content_hash
+
+
+def read_training_data(name):
+    """
+    Reads training data written by write_training_data
+
+    :param name: name of the data file
+    :return: training data
+    """
+    with np.load(name) as arrays:
+        data_class = getattr(TrainingData, str(arrays["class"]))
+        training_data = data_class.__new__(data_class)
+        for attr in DATA_CACHES:
+            setattr(training_data, attr, None)
+        for key in arrays.files:
+            if key.startswith("attr/"):
+                setattr(training_data, key[len("attr/"):], arrays[key])
+    return training_data
+
+
+def island_sections(isle, index, content_hash):
+    """
+    Sections of a coevolution island in a compact checkpoint
+
+    :param isle: coevolution island
+    :param index: index of the island in the checkpoint
+    :param content_hash: content hash of the training data of the island
+    :return: dictionary of numpy arrays by name
+    """
+    prefix = "isle%d/" % index
+    int_buffer, float_buffer = isle.pack_populations()
+    front_ints, front_floats = pack_buffers(
+        *isle.solution_island.gene_manipulator.pack(
+            isle.solution_island.pareto_front))
+    return {prefix + "ints": int_buffer,
+            prefix + "floats": float_buffer,
+            prefix + "front_ints": front_ints,
+            prefix + "front_floats": front_floats,
+            prefix + "ages": np.array([isle.solution_island.age,
+                                       isle.predictor_island.age,
+                                       isle.solution_island.fitness_evals,
+                                       isle.predictor_island.fitness_evals]),
+            prefix + "data": np.array(content_hash)}
+
+
+def front_sections(manipulator, indvs):
+    """
+    Sections of the joint pareto front in a compact checkpoint
+
+    :param manipulator: gene manipulator of the individuals
+    :param indvs: list of the individuals of the front
+    :return: dictionary of numpy arrays by name
+    """
+    int_buffer, float_buffer = pack_buffers(*manipulator.pack(indvs))
+    return {"pareto/ints": int_buffer, "pareto/floats": float_buffer}
+
+
+class CompactCheckpoint(object):
+    """
+    Reader of a compact checkpoint file.  Sections are read from the file
+    only when they are accessed.
+
+    :param filename: name of the checkpoint file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.arrays = np.load(filename)
+        if str(self.arrays["format"]) != COMPACT_FORMAT:
+            self.arrays.close()
+            raise ValueError("%s is not a compact checkpoint" % filename)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def n_islands(self):
+        """number of islands in the checkpoint"""
+        return sum(1 for name in self.arrays.files
+                   if name.startswith("isle") and name.endswith("/ints"))
+
+    def training_data(self, content_hash):
+        """training data with a content hash (read from its data file)"""
+        return read_training_data(data_name(self.filename, content_hash))
+
+    def restore_island(self, isle, index, replace=True):
+        """
+        Loads an island of the checkpoint into a coevolution island
+
+        :param isle: coevolution island (made with the same gene manipulators
+                     as the island in the checkpoint)
+        :param index: index of the island in the checkpoint
+        :param replace: default (True) value results in the populations, the
+                        pareto front of the solutions, the ages and the
+                        training data being replaced.  False value means
+                        that the populations and the front are appended to
+                        the current ones
+        """
+        prefix = "isle%d/" % index
+        if replace:
+            content_hash = str(self[prefix + "data"])
+            if data_hash(isle.solution_training_data) != content_hash:
+                isle.set_training_data(self.training_data(content_hash))
+        isle.unpack_populations(self[prefix + "ints"],
+                                self[prefix + "floats"], replace)
+        # the fitness of the front is evaluated when the front is next
+        # updated (which also drops dominated members of appended fronts)
+        front = isle.solution_island.gene_manipulator.unpack(
+            *unpack_buffers(self[prefix + "front_ints"],
+                            self[prefix + "front_floats"]))
+        if not replace:
+            front = list(isle.solution_island.pareto_front) + front
+        isle.solution_island.pareto_front = front
+        if replace:
+            (isle.solution_island.age, isle.predictor_island.age,
+             isle.solution_island.fitness_evals,
+             isle.predictor_island.fitness_evals) = \
+                self[prefix + "ages"].tolist()
+
+    def pareto_front(self, manipulator):
+        """
+        Individuals of the joint pareto front
+
+        :param manipulator: gene manipulator of the individuals
+        :return: list of individuals
+        """
+        return manipulator.unpack(*unpack_buffers(self["pareto/ints"],
+                                                  self["pareto/floats"]))
+
+    def close(self):
+        """closes the checkpoint file"""
+        self.arrays.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def assigned_shards(n_shards, rank, size):
+    """
+    Shards which are loaded by a rank
+
+    :param n_shards: number of shards of the checkpoint
+    :param rank: rank
+    :param size: number of ranks
+    :return: list of shard indices (shards are dealt round robin; if there
+             are fewer shards than ranks, a rank gets a copy of shard
+             rank % n_shards), and whether the shard is a copy
+    """
+    if rank < n_shards:
+        return list(range(rank, n_shards, size)), False
+    return [rank % n_shards], True
+
+
+class BackgroundWriter(object):
+    """
+    Writes files in a background thread, one write at a time
+    """
+    def __init__(self):
+        self.thread = None
+
+    def write(self, filename, data):
+        """
+        Starts writing bytes to a file (after the previous write is complete)
+
+        :param filename: name of the file
+        :param data: bytes which are written
+        """
+        self.wait()
+        self.thread = threading.Thread(target=write_atomic,
+                                       args=(filename, data))
+        self.thread.start()
+
+    def busy(self):
+        """whether a write is in progress"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self):
+        """waits for the current write to complete"""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __getstate__(self):
+        return {"thread": None}
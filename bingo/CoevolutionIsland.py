@@ -6,12 +6,19 @@ predictors is judged.
 This is loosely based on the work of Schmidt and Lipson 2008?
 """
 import logging
+import multiprocessing
+import time
 import numpy as np
 
-from .Island import Island
+from .Island import Island, subset_mask
+from .RandomStreams import make_rng, spawn_seeds
+from .MigrationBuffers import pack_buffers, unpack_buffers
 
 LOGGER = logging.getLogger(__name__)
 
+# number of predictor-keyed fitness values remembered by each solution
+FITNESS_MEMO_SIZE = 4
+
 class CoevolutionIsland(object):
     """
     Coevolution island with 3 populations
@@ -38,15 +45,46 @@ class CoevolutionIsland(object):
     :param predictor_ratio: approximate ratio of time spent on fitness
                             predictor calculations and the total
                             computation time
+    :param time_balance: True to steer toward predictor_ratio using the
+                         measured wall-clock time spent on each island.  The
+                         default (False) uses the number of fitness
+                         evaluations as a proxy for cost
     :param predictor_update_freq: number of generations of the solution
                                   population after which the fitness
                                   predictor is updated
+    :param predictor_dtype: floating point type (e.g. np.float32) of the
+                            training data used for fitness estimates on the
+                            predictor subsets.  The default (None) uses the
+                            training data as given.  True fitness always uses
+                            the training data as given, and constants are
+                            always optimized in double precision
     :param trainer_pop_size: size of the trainer population
     :param trainer_update_freq: number of generations of the solution
                                 population after which a new trainer is
                                 added to the trainer population
     :param required_params: number of unique parameters that are required
                             in implicit (constant) symbolic regression
+    :param residual_cache: True to cache the full-data fitness vector of each
+                           trainer (and candidate trainer) whose constants
+                           are already fixed.  Predictor estimates are then
+                           gathered from the cached vectors rather than
+                           re-evaluating the individual on each subset.
+                           Requires a fitness metric whose fitness vector is
+                           computed row by row (e.g., StandardRegression)
+    :param predictor_worker: True to evolve the fitness predictor island (and
+                             maintain the trainers) in a separate local
+                             process.  The worker is sent snapshots of the
+                             solution population and publishes its best
+                             predictor, which is adopted at the next
+                             predictor_update_freq boundary.  The worker is
+                             paced so that its share of the (wall-clock)
+                             computation time is predictor_ratio.  Requires
+                             the 'fork' multiprocessing start method; the
+                             island managers stop the worker at the end of
+                             run_islands
+    :param seed: seed of the random streams of the island (None, int or
+                 SeedSequence, see RandomStreams).  A seeded serial run is
+                 bit-reproducible
     :param verbose: True for extra output printed to screen
     """
 
@@ -56,19 +94,23 @@ class CoevolutionIsland(object):
                  solution_age_fitness=False,
                  predictor_pop_size=16, predictor_cx=0.5, predictor_mut=0.1,
                  predictor_ratio=0.1, predictor_update_freq=50,
+                 time_balance=False, predictor_dtype=None,
                  trainer_pop_size=16, trainer_update_freq=50,
-                 verbose=False):
+                 residual_cache=False, predictor_worker=False,
+                 seed=None, verbose=False):
         """
         Initializes coevolution island
         """
         self.verbose = verbose
         self.fitness_metric = fitness_metric
-        self.solution_training_data = solution_training_data
 
-        # check if fitness predictors are valid range
-        if self.solution_training_data.size() < predictor_manipulator.max_index:
-            predictor_manipulator.max_index = \
-                self.solution_training_data.size()
+        # independent random streams for the island, its solution island and
+        # its predictor island
+        island_seed, solution_seed, predictor_seed = spawn_seeds(seed, 3)
+        self.rng = make_rng(island_seed)
+        self.bind_rng()
+        self.predictor_dtype = predictor_dtype
+        self.set_training_data(solution_training_data, predictor_manipulator)
 
         # initialize solution island
         self.solution_island = Island(solution_manipulator,
@@ -76,13 +118,15 @@ class CoevolutionIsland(object):
                                       target_pop_size=solution_pop_size,
                                       cx_prob=solution_cx,
                                       mut_prob=solution_mut,
-                                      age_fitness=solution_age_fitness)
+                                      age_fitness=solution_age_fitness,
+                                      rng=solution_seed)
         # initialize fitness predictor island
         self.predictor_island = Island(predictor_manipulator,
                                        self.predictor_fitness,
                                        target_pop_size=predictor_pop_size,
                                        cx_prob=predictor_cx,
-                                       mut_prob=predictor_mut)
+                                       mut_prob=predictor_mut,
+                                       rng=predictor_seed)
         self.predictor_update_freq = predictor_update_freq
 
         # initialize trainers
@@ -91,25 +135,44 @@ class CoevolutionIsland(object):
         for _ in range(trainer_pop_size):
             legal_trainer_found = False
             while not legal_trainer_found:
-                ind = np.random.randint(0, solution_pop_size)
+                ind = self.rng.integers(0, solution_pop_size)
                 sol = self.solution_island.pop[ind]
                 true_fitness = self.solution_fitness_true(sol)
                 legal_trainer_found = not np.isnan(true_fitness)
                 for pred in self.predictor_island.pop:
                     if np.isnan(pred.fit_func(sol, self.fitness_metric,
-                                              self.solution_training_data)):
+                                              self.predictor_training_data)):
                         legal_trainer_found = False
             self.trainers.append(self.solution_island.pop[ind].copy())
             self.trainers_true_fitness.append(true_fitness)
         self.trainer_update_freq = trainer_update_freq
 
+        # cached full-data fitness vectors of trainers
+        self.residual_cache = residual_cache
+        self.trainer_residuals = None
+        self.cached_trainers = None
+        self.trainer_residual_matrix = None
+
         # computational balance
         self.predictor_ratio = predictor_ratio
         self.predictor_to_solution_eval_cost = len(self.trainers)
+        self.time_balance = time_balance
+        self.predictor_time = 0.0
+        self.solution_time = 0.0
 
         # find best predictor for use as starting fitness
         # function in solution island
         self.best_predictor = self.predictor_island.best_indv().copy()
+        self.best_predictor_hash = self.best_predictor.content_hash()
+
+        # side process for predictor evolution
+        self.predictor_worker = predictor_worker
+        self.worker = None
+        self.worker_conn = None
+        self.worker_pending = False
+        # the worker is started at the first generational step rather than
+        # here, so that it is not forked during the set up of mpi
+        self.worker_sync_populations = False
 
         # initial output
         if self.verbose:
@@ -123,6 +186,51 @@ class CoevolutionIsland(object):
                          + " " + str(best_sol.fitness)\
                          + " " + str(best_sol.latexstring()))
 
+    def bind_rng(self):
+        """
+        Binds the random stream of the island to the fitness metric, which
+        may be shared with other islands
+        """
+        self.fitness_metric.rng = self.rng
+
+    def set_training_data(self, training_data, predictor_manipulator=None):
+        """
+        Sets the training data of the island (e.g., when it is restored from
+        a checkpoint)
+
+        :param training_data: training data of the solutions
+        :param predictor_manipulator: gene manipulator of the predictors
+                                      (default is that of the predictor
+                                      island)
+        """
+        if predictor_manipulator is None:
+            predictor_manipulator = self.predictor_island.gene_manipulator
+        self.solution_training_data = training_data
+        if self.predictor_dtype is None:
+            self.predictor_training_data = training_data
+        else:
+            self.predictor_training_data = \
+                training_data.astype(self.predictor_dtype)
+        self.trainer_residuals = None
+
+        # check if fitness predictors are valid range
+        if training_data.size() < predictor_manipulator.max_index:
+            predictor_manipulator.max_index = training_data.size()
+
+    def reseed(self, seed):
+        """
+        Replaces the random streams of the island and of its solution and
+        predictor islands (e.g., for a copy of an island which must evolve
+        independently of the original)
+
+        :param seed: see RandomStreams.seed_sequence
+        """
+        island_seed, solution_seed, predictor_seed = spawn_seeds(seed, 3)
+        self.rng = make_rng(island_seed)
+        self.solution_island.rng = make_rng(solution_seed)
+        self.predictor_island.rng = make_rng(predictor_seed)
+        self.bind_rng()
+
     def solution_fitness_est(self, solution):
         """
         Estimated fitness for solution pop based on the best predictor
@@ -132,23 +240,174 @@ class CoevolutionIsland(object):
         :return: fitness, complexity
         """
         fit = self.best_predictor.fit_func(solution, self.fitness_metric,
-                                           self.solution_training_data)
-        return fit, solution.complexity()
+                                           self.predictor_training_data)
+        return self.record_solution_fitness(solution, fit)
+
+    def record_solution_fitness(self, solution, fit):
+        """
+        Fitness of a solution from its estimated fitness (which may have been
+        evaluated elsewhere with the best predictor, see WorkStealing)
+
+        :param solution: individual of the solution population
+        :param fit: fitness estimated with the best predictor
+        :return: fitness, complexity
+        """
+        fitness = (fit, solution.complexity())
+
+        # remember which predictor produced the fitness
+        solution.fitness_memo[self.best_predictor_hash] = fitness
+        while len(solution.fitness_memo) > FITNESS_MEMO_SIZE:
+            del solution.fitness_memo[next(iter(solution.fitness_memo))]
+        return fitness
+
+    def set_best_predictor(self, predictor):
+        """
+        Sets the predictor used for the fitness of the solution population.
+        Nothing is re-evaluated if the predictor is unchanged.  Otherwise,
+        solutions restore their fitness from the predictor-keyed memo if they
+        have been evaluated with this predictor before; the rest are flagged
+        for re-evaluation, which happens lazily when they are next compared
+
+        :param predictor: the new best predictor
+        """
+        predictor_hash = predictor.content_hash()
+        if predictor_hash == self.best_predictor_hash:
+            return
+        self.best_predictor = predictor.copy()
+        self.best_predictor_hash = predictor_hash
+        for indv in self.solution_island.pop:
+            if predictor_hash in indv.fitness_memo:
+                indv.fitness = indv.fitness_memo[predictor_hash]
+                indv.fit_set = True
+            else:
+                indv.fit_set = False
 
     def predictor_fitness(self, predictor):
         """
         Fitness function for predictor population, based on the ability to
-        accurately describe the true fitness of the trainer population
+        accurately describe the true fitness of the trainer population.  The
+        error on each trainer is stored in the predictor so that the fitness
+        can be updated incrementally when a trainer is replaced
 
         :param predictor: predictor for which the fitness is assessed
         :return: fitness
         """
-        err = 0.0
-        for train, true_fit in zip(self.trainers, self.trainers_true_fitness):
-            predicted_fit = predictor.fit_func(train, self.fitness_metric,
-                                               self.solution_training_data)
-            err += abs(true_fit - predicted_fit)
-        return err/len(self.trainers)
+        predictor.trainer_errors = self.trainer_errors(predictor)
+        return np.sum(predictor.trainer_errors)/len(self.trainers)
+
+    def trainer_errors(self, predictor, locations=None):
+        """
+        Absolute errors between the true fitness of trainers and the fitness
+        estimated by a predictor
+
+        :param predictor: predictor for which the errors are calculated
+        :param locations: list of indices of the trainers for which the error
+                          is calculated. A None value results in all of the
+                          trainers being used.
+        :return: array of errors
+        """
+        if locations is None:
+            locations = list(range(len(self.trainers)))
+        predicted_fits = {}
+        if self.residual_cache:
+            if self.trainer_residuals is None or \
+                    len(self.trainer_residuals) != len(self.trainers):
+                self.update_trainer_residuals()
+            if self.trainer_residual_matrix is not None:
+                rows = [row for row, i in enumerate(self.cached_trainers)
+                        if i in locations]
+                if len(rows) > 0:
+                    cached_fits = self.fitness_metric.fitness_from_vector(
+                        self.trainer_residual_matrix[
+                            np.ix_(rows, predictor.indices)])
+                    for row, fit in zip(rows, cached_fits):
+                        predicted_fits[self.cached_trainers[row]] = fit
+
+        errors = np.empty(len(locations))
+        for j, i in enumerate(locations):
+            if i in predicted_fits:
+                predicted_fit = predicted_fits[i]
+            else:
+                predicted_fit = predictor.fit_func(
+                    self.trainers[i], self.fitness_metric,
+                    self.predictor_training_data)
+            errors[j] = abs(self.trainers_true_fitness[i] - predicted_fit)
+        return errors
+
+    def update_predictor_fitness(self, location):
+        """
+        Updates the fitness of the predictor population after the trainer at
+        location has been replaced.  Only the error on the replaced trainer is
+        recalculated for predictors which have stored their trainer errors;
+        the rest are flagged for full evaluation
+
+        :param location: index of the replaced trainer
+        """
+        for pred in self.predictor_island.pop:
+            if pred.fit_set and pred.trainer_errors is not None and \
+                    len(pred.trainer_errors) == len(self.trainers):
+                pred.trainer_errors[location] = \
+                    self.trainer_errors(pred, [location])[0]
+                pred.fitness = np.sum(pred.trainer_errors)/len(self.trainers)
+                self.predictor_island.fitness_evals += 1.0/len(self.trainers)
+            else:
+                pred.fit_set = False
+
+    def solution_residual(self, solution):
+        """
+        Full-data fitness vector of a solution, for use as a residual cache.
+        Only solutions whose constants are already fixed can be cached since
+        otherwise the constants would be optimized on each predictor subset
+
+        :param solution: individual of the solution population
+        :return: fitness vector, or None if it can't be cached
+        """
+        if solution.needs_optimization():
+            return None
+        try:
+            residual = self.fitness_metric.evaluate_fitness_vector(
+                solution, self.predictor_training_data)
+        except (OverflowError, FloatingPointError, ValueError):
+            LOGGER.error("solution_residual error")
+            residual = None
+        return residual
+
+    def update_trainer_residuals(self, locations=None):
+        """
+        Updates the cached full-data fitness vectors of the trainers
+
+        :param locations: list of indices of the trainers which are updated. A
+                          None value results in all of the trainers being
+                          updated.
+        """
+        if locations is None or self.trainer_residuals is None:
+            self.trainer_residuals = [None]*len(self.trainers)
+            locations = range(len(self.trainers))
+        for i in locations:
+            self.trainer_residuals[i] = \
+                self.solution_residual(self.trainers[i])
+
+        self.cached_trainers = [i for i, res in
+                                enumerate(self.trainer_residuals)
+                                if res is not None]
+        if len(self.cached_trainers) > 0:
+            self.trainer_residual_matrix = np.vstack(
+                [self.trainer_residuals[i] for i in self.cached_trainers])
+        else:
+            self.trainer_residual_matrix = None
+
+    def predictor_index_matrix(self):
+        """
+        Stacks the indices of the predictor population into a 2d array
+
+        :return: array of predictor indices, or None if the predictors are not
+                 all the same size
+        """
+        sizes = set(len(pred.indices) for pred in self.predictor_island.pop)
+        if len(sizes) != 1:
+            return None
+        return np.array([pred.indices for pred in self.predictor_island.pop],
+                        dtype=int)
 
     def solution_fitness_true(self, solution):
         """
@@ -169,14 +428,27 @@ class CoevolutionIsland(object):
         """
         Add/replace trainer to current trainer population.  The trainer which
         maximizes discrepancy between fitness predictors is chosen
+
+        :return: index of the replaced trainer
         """
         s_best = self.solution_island.pop[0]
         max_variance = 0
+        index_matrix = None
+        if self.residual_cache:
+            index_matrix = self.predictor_index_matrix()
         for sol in self.solution_island.pop:
-            pfit_list = []
-            for pred in self.predictor_island.pop:
-                pfit_list.append(pred.fit_func(sol, self.fitness_metric,
-                                               self.solution_training_data))
+            pfit_list = None
+            if index_matrix is not None:
+                residual = self.solution_residual(sol)
+                if residual is not None:
+                    pfit_list = self.fitness_metric.fitness_from_vector(
+                        residual[index_matrix])
+            if pfit_list is None:
+                pfit_list = []
+                for pred in self.predictor_island.pop:
+                    pfit_list.append(
+                        pred.fit_func(sol, self.fitness_metric,
+                                      self.predictor_training_data))
             try:
                 variance = np.var(pfit_list)
             except (ArithmeticError, OverflowError, FloatingPointError,
@@ -190,6 +462,11 @@ class CoevolutionIsland(object):
         if self.verbose:
             LOGGER.debug("updating trainer at location " + str(location))
         self.trainers[location] = s_best
+        self.trainers_true_fitness[location] = self.solution_fitness_true(
+            s_best)
+        if self.residual_cache and self.trainer_residuals is not None:
+            self.update_trainer_residuals([location])
+        return location
 
     def generational_step(self):
         """
@@ -197,48 +474,216 @@ class CoevolutionIsland(object):
         takes the necessary steps for the other populations to maintain desired
         predictor/solution computation ratio
         """
-        # do some step(s) on predictor island if the ratio is low
-        current_ratio = (float(self.predictor_island.fitness_evals) /
-                         (self.predictor_island.fitness_evals +
-                          float(self.solution_island.fitness_evals) /
-                          self.predictor_to_solution_eval_cost))
-
-        # evolving predictors
-        while current_ratio < self.predictor_ratio:
-            # update trainers if it is time to
-            if (self.predictor_island.age+1) % self.trainer_update_freq == 0:
-                self.add_new_trainer()
-                for indv in self.predictor_island.pop:
-                    indv.fit_set = False
-            # do predictor step
-            self.predictor_island.generational_step()
-            if self.verbose:
-                best_pred = self.predictor_island.best_indv()
-                LOGGER.debug("P> " + str(self.predictor_island.age) \
-                             + " " + str(best_pred.fitness) \
-                             + " " + str(best_pred))
-            current_ratio = (float(self.predictor_island.fitness_evals) /
-                             (self.predictor_island.fitness_evals +
-                              float(self.solution_island.fitness_evals) /
-                              self.predictor_to_solution_eval_cost))
-
-        # update fitness predictor if it is time to
-        if (self.solution_island.age+1) % self.predictor_update_freq == 0:
-            if self.verbose:
-                LOGGER.debug("Updating predictor")
-            self.best_predictor = self.predictor_island.best_indv().copy()
-            for indv in self.solution_island.pop:
-                indv.fit_set = False
+        self.bind_rng()
+        if self.predictor_worker:
+            if self.worker is None:
+                self.start_predictor_worker()
+            # predictors evolve in the worker: only exchange with it
+            if (self.solution_island.age+1) % self.predictor_update_freq == 0:
+                self.sync_predictor_worker()
+        else:
+            self.evolve_predictors()
+
+            # update fitness predictor if it is time to
+            if (self.solution_island.age+1) % self.predictor_update_freq == 0:
+                if self.verbose:
+                    LOGGER.debug("Updating predictor")
+                self.set_best_predictor(self.predictor_island.best_indv())
 
         # do step on solution island
+        t_0 = time.time()
         self.solution_island.generational_step()
-        self.solution_island.update_pareto_front()
+        self.solution_island.update_pareto_front(evaluate_all=False)
+        self.solution_time += time.time() - t_0
         if self.verbose:
             best_sol = self.solution_island.pareto_front[0]
             LOGGER.debug("S> " + str(self.solution_island.age) \
                          + " " + str(best_sol.fitness) \
                          + " " + str(best_sol.latexstring()))
 
+    def evolve_predictors(self):
+        """
+        Steps the predictor island (and updates trainers) until the desired
+        predictor/solution computation ratio is reached
+        """
+        # do some step(s) on predictor island if the ratio is low
+        while self.computation_ratio() < self.predictor_ratio:
+            self.predictor_step()
+
+    def computation_ratio(self):
+        """
+        Current ratio of predictor computation and total computation.  This is
+        measured in wall-clock time if time_balance is set, otherwise in
+        (cost weighted) fitness evaluations
+
+        :return: predictor computation ratio
+        """
+        if self.time_balance:
+            total_time = self.predictor_time + self.solution_time
+            if total_time == 0:
+                return 0.0
+            return self.predictor_time / total_time
+        return (float(self.predictor_island.fitness_evals) /
+                (self.predictor_island.fitness_evals +
+                 float(self.solution_island.fitness_evals) /
+                 self.predictor_to_solution_eval_cost))
+
+    def predictor_step(self):
+        """
+        A single generational step of the predictor island, including the
+        update of trainers if it is time to
+        """
+        self.bind_rng()
+        t_0 = time.time()
+        # update trainers if it is time to
+        if (self.predictor_island.age+1) % self.trainer_update_freq == 0:
+            location = self.add_new_trainer()
+            self.update_predictor_fitness(location)
+        # do predictor step
+        self.predictor_island.generational_step()
+        self.predictor_time += time.time() - t_0
+        if self.verbose:
+            best_pred = self.predictor_island.best_indv()
+            LOGGER.debug("P> " + str(self.predictor_island.age) \
+                         + " " + str(best_pred.fitness) \
+                         + " " + str(best_pred))
+
+    def start_predictor_worker(self):
+        """
+        Starts the side process in which the predictor island evolves.  The
+        process is forked, so it starts from a copy of this island
+        """
+        context = multiprocessing.get_context('fork')
+        self.worker_conn, worker_end = context.Pipe()
+        self.worker = context.Process(target=self.run_predictor_worker,
+                                      args=(worker_end,), daemon=True)
+        self.worker.start()
+        worker_end.close()
+        self.worker_pending = False
+
+    def stop_predictor_worker(self):
+        """
+        Stops the predictor side process (if running)
+        """
+        if self.worker is None:
+            return
+        try:
+            self.worker_conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.worker.join()
+        self.worker_conn.close()
+        self.worker = None
+        self.worker_conn = None
+        self.worker_pending = False
+
+    def run_predictor_worker(self, conn):
+        """
+        Main loop of the predictor side process: evolves predictors
+        continuously and answers each solution snapshot with its predictor
+        and trainer populations
+
+        :param conn: connection to the solution island's process
+        """
+        start_time = time.time()
+        start_predictor_time = self.predictor_time
+        while True:
+            # wait (for messages) while the predictor steps are ahead of
+            # their share of the time
+            wait = self.worker_wait_time(
+                self.predictor_time - start_predictor_time,
+                time.time() - start_time)
+            if conn.poll(wait):
+                message = conn.recv()
+                if message is None:
+                    break
+                if message[1] is None:
+                    self.solution_island.load_population(message[0])
+                else:
+                    self.load_populations(message)
+                _, predictor_list, trainer_list = self.dump_populations(
+                    s_subset=[])
+                best_predictor = self.predictor_island.gene_manipulator.dump(
+                    self.predictor_island.best_indv())
+                conn.send((best_predictor, predictor_list, trainer_list,
+                           self.predictor_island.age,
+                           self.predictor_island.fitness_evals))
+                continue
+            self.predictor_step()
+        conn.close()
+
+    def worker_wait_time(self, predictor_time, elapsed_time):
+        """
+        Time for which the predictor worker waits before its next step, so
+        that predictor_time / (predictor_time + solution time) stays at
+        predictor_ratio while the solution island runs all of the time
+
+        :param predictor_time: time spent in predictor steps by the worker
+        :param elapsed_time: wall-clock time since the worker started
+        :return: time in seconds (None to wait indefinitely)
+        """
+        if self.predictor_ratio >= 1:
+            return 0.0
+        if self.predictor_ratio <= 0:
+            return None
+        budget = elapsed_time * self.predictor_ratio / \
+            (1.0 - self.predictor_ratio)
+        return max(predictor_time - budget, 0.0) * \
+            (1.0 - self.predictor_ratio) / self.predictor_ratio
+
+    def sync_predictor_worker(self):
+        """
+        Exchanges information with the predictor side process without
+        waiting on it: the most recently published predictor (if any) is
+        adopted and a new snapshot of the solution population is sent
+        """
+        try:
+            reply = None
+            while self.worker_conn.poll():
+                reply = self.worker_conn.recv()
+                self.worker_pending = False
+        except (EOFError, OSError):
+            LOGGER.error("predictor worker died, evolving predictors inline")
+            self.worker.join()
+            self.worker = None
+            self.predictor_worker = False
+            return
+
+        if reply is not None and self.worker_sync_populations:
+            # the reply predates immigration into the predictor and trainer
+            # populations, which it would overwrite
+            reply = None
+
+        if reply is not None:
+            best_predictor, predictor_list, trainer_list, age, evals = reply
+            self.predictor_island.load_population(predictor_list)
+            self.predictor_island.age = age
+            self.predictor_island.fitness_evals = evals
+            self.trainers = []
+            self.trainers_true_fitness = []
+            for indv_list, t_fit in trainer_list:
+                self.trainers.append(
+                    self.solution_island.gene_manipulator.load(indv_list))
+                self.trainers_true_fitness.append(t_fit)
+            self.trainer_residuals = None
+            if self.verbose:
+                LOGGER.debug("Updating predictor")
+            self.set_best_predictor(
+                self.predictor_island.gene_manipulator.load(best_predictor))
+
+        if not self.worker_pending:
+            solution_list = self.solution_island.dump_population()
+            if self.worker_sync_populations:
+                _, predictor_list, trainer_list = self.dump_populations(
+                    s_subset=[])
+                self.worker_sync_populations = False
+            else:
+                predictor_list = None
+                trainer_list = None
+            self.worker_conn.send((solution_list, predictor_list,
+                                   trainer_list))
+            self.worker_pending = True
+
     def dump_populations(self, s_subset=None, p_subset=None, t_subset=None,
                          with_removal=False):
         """
@@ -266,23 +711,36 @@ class CoevolutionIsland(object):
                                                                with_removal)
 
         # dump trainers
-        trainer_list = []
-        if t_subset is None:
-            t_subset = list(range(len(self.trainers)))
-        for i, (indv, tfit) in enumerate(zip(self.trainers,
-                                             self.trainers_true_fitness)):
-            if i in t_subset:
-                trainer_list.append(
-                    (self.solution_island.gene_manipulator.dump(indv), tfit))
-        if with_removal:
-            self.trainers[:] = [indv for i, indv in enumerate(self.trainers)
-                                if i not in t_subset]
-            self.trainers_true_fitness[:] = \
-                [tfit for i, tfit in enumerate(self.trainers_true_fitness) if
-                 i not in t_subset]
+        trainer_list = [(self.solution_island.gene_manipulator.dump(indv),
+                         tfit) for indv, tfit in
+                        zip(*self.select_trainers(t_subset, with_removal))]
 
         return solution_list, predictor_list, trainer_list
 
+    def select_trainers(self, t_subset=None, with_removal=False):
+        """
+        Selects a subset of the trainers using a boolean mask
+
+        :param t_subset: list of indices for the subset of the trainer
+                         population. A None value results in all of the
+                         trainers being selected.
+        :param with_removal: boolean describing whether the trainers should be
+                             removed from the trainer population
+        :return: list of the selected trainers, list of their true fitness
+        """
+        mask = subset_mask(len(self.trainers), t_subset)
+        trainers = [indv for indv, sel in zip(self.trainers, mask) if sel]
+        true_fitness = [tfit for tfit, sel in
+                        zip(self.trainers_true_fitness, mask) if sel]
+        if with_removal:
+            self.trainers[:] = [indv for indv, sel in zip(self.trainers, mask)
+                                if not sel]
+            self.trainers_true_fitness[:] = \
+                [tfit for tfit, sel in zip(self.trainers_true_fitness, mask)
+                 if not sel]
+            self.trainer_residuals = None
+        return trainers, true_fitness
+
     def load_populations(self, pop_lists, replace=True):
         """
         load 3 populations from pickleable object
@@ -293,22 +751,149 @@ class CoevolutionIsland(object):
                population in pop_list is appended to the current
                population
         """
-        # load solutions
-        self.solution_island.load_population(pop_lists[0], replace)
+        s_manip = self.solution_island.gene_manipulator
+        self.add_populations(
+            [s_manip.load(indv_list) for indv_list in pop_lists[0]],
+            [self.predictor_island.gene_manipulator.load(indv_list)
+             for indv_list in pop_lists[1]],
+            [s_manip.load(indv_list) for indv_list, _ in pop_lists[2]],
+            [t_fit for _, t_fit in pop_lists[2]], replace)
+
+    def pack_populations(self, s_subset=None, p_subset=None, t_subset=None,
+                         with_removal=False):
+        """
+        Packs the 3 populations into an integer and a float numpy buffer (see
+        MigrationBuffers).  The arguments are the same as for
+        dump_populations.
+
+        :return: integer buffer, float buffer
+        """
+        s_manip = self.solution_island.gene_manipulator
+        p_manip = self.predictor_island.gene_manipulator
+        trainers, true_fitness = self.select_trainers(t_subset, with_removal)
+        packed = [
+            s_manip.pack(self.solution_island.select_subset(s_subset,
+                                                            with_removal)),
+            p_manip.pack(self.predictor_island.select_subset(p_subset,
+                                                             with_removal)),
+            s_manip.pack(trainers)]
+        # number of integer and float arrays of each population
+        int_arrays = [np.array([(len(ints), len(floats))
+                                for ints, floats in packed])]
+        float_arrays = [np.array(true_fitness, dtype=np.float64)]
+        for ints, floats in packed:
+            int_arrays.extend(ints)
+            float_arrays.extend(floats)
+        return pack_buffers(int_arrays, float_arrays)
+
+    def unpack_populations(self, int_buffer, float_buffer, replace=True):
+        """
+        Loads the 3 populations from the buffers made by pack_populations
 
-        # load predictors
-        self.predictor_island.load_population(pop_lists[1], replace)
+        :param int_buffer: integer buffer
+        :param float_buffer: float buffer
+        :param replace: see load_populations
+        """
+        self.add_populations(*self.unpack_migrants(int_buffer, float_buffer),
+                             replace=replace)
+
+    def trim_populations(self, solution_size, predictor_size, trainer_size):
+        """
+        Removes random individuals from the 3 populations down to the given
+        sizes, which become the target population sizes (e.g., after the
+        populations of several islands are combined)
 
-        # load trainers
+        :param solution_size: size of the solution population
+        :param predictor_size: size of the predictor population
+        :param trainer_size: number of trainers
+        """
+        for island, size in ((self.solution_island, solution_size),
+                             (self.predictor_island, predictor_size)):
+            n_pop = len(island.pop)
+            if n_pop > size:
+                island.select_subset(self.rng.sample(range(n_pop),
+                                                     n_pop - size),
+                                     with_removal=True)
+            island.target_pop_size = size
+        n_trainers = len(self.trainers)
+        if n_trainers > trainer_size:
+            self.select_trainers(self.rng.sample(range(n_trainers),
+                                                 n_trainers - trainer_size),
+                                 with_removal=True)
+        self.best_predictor = self.predictor_island.best_indv().copy()
+        self.best_predictor_hash = self.best_predictor.content_hash()
+        self.worker_sync_populations = True
+
+    def merge_immigrants(self, int_buffer, float_buffer):
+        """
+        Replaces random individuals of the 3 populations with the immigrants
+        in the buffers made by pack_populations, so that the population sizes
+        are unchanged
+
+        :param int_buffer: integer buffer
+        :param float_buffer: float buffer
+        """
+        solutions, predictors, trainers, true_fitness = \
+            self.unpack_migrants(int_buffer, float_buffer)
+        for island, immigrants in ((self.solution_island, solutions),
+                                   (self.predictor_island, predictors)):
+            n_pop = len(island.pop)
+            island.select_subset(
+                self.rng.sample(range(n_pop), min(len(immigrants), n_pop)),
+                with_removal=True)
+        n_trainers = len(self.trainers)
+        self.select_trainers(
+            self.rng.sample(range(n_trainers), min(len(trainers), n_trainers)),
+            with_removal=True)
+        self.add_populations(solutions, predictors, trainers, true_fitness,
+                             replace=False)
+
+    def unpack_migrants(self, int_buffer, float_buffer):
+        """
+        Unpacks the buffers made by pack_populations
+
+        :param int_buffer: integer buffer
+        :param float_buffer: float buffer
+        :return: list of solutions, list of predictors, list of trainers,
+                 list of the true fitness of the trainers
+        """
+        int_arrays, float_arrays = unpack_buffers(int_buffer, float_buffer)
+        true_fitness = float_arrays.pop(0).tolist()
+        counts = int_arrays.pop(0).tolist()
+        s_manip = self.solution_island.gene_manipulator
+        p_manip = self.predictor_island.gene_manipulator
+        pops = []
+        for manip, (n_int, n_float) in zip([s_manip, p_manip, s_manip],
+                                           counts):
+            pops.append(manip.unpack(int_arrays[:n_int],
+                                     float_arrays[:n_float]))
+            del int_arrays[:n_int]
+            del float_arrays[:n_float]
+        return pops[0], pops[1], pops[2], true_fitness
+
+    def add_populations(self, solutions, predictors, trainers, true_fitness,
+                        replace=True):
+        """
+        adds (already loaded) individuals to the 3 populations
+
+        :param solutions: list of solution individuals
+        :param predictors: list of predictor individuals
+        :param trainers: list of trainer individuals
+        :param true_fitness: list of the true fitness of the trainers
+        :param replace: see load_populations
+        """
+        self.solution_island.add_individuals(solutions, replace)
+        self.predictor_island.add_individuals(predictors, replace)
         if replace:
             self.trainers = []
             self.trainers_true_fitness = []
-        for indv_list, t_fit in pop_lists[2]:
-            self.trainers.append(
-                self.solution_island.gene_manipulator.load(indv_list))
-            self.trainers_true_fitness.append(t_fit)
+        self.trainers.extend(trainers)
+        self.trainers_true_fitness.extend(true_fitness)
+        self.trainer_residuals = None
 
         self.best_predictor = self.predictor_island.best_indv().copy()
+        self.best_predictor_hash = self.best_predictor.content_hash()
+        self.worker_sync_populations = True
 
     def print_trainers(self):
         """
@@ -330,6 +915,15 @@ class CoevolutionIsland(object):
         for indv in self.solution_island.pop:
             indv.fit_set = False
 
+    def __getstate__(self):
+        """the predictor side process is not pickled"""
+        state = dict(self.__dict__)
+        state['worker'] = None
+        state['worker_conn'] = None
+        state['worker_pending'] = False
+        state['worker_sync_populations'] = True
+        return state
+
     def true_fitness_plus_complexity(self, solution):
         """
         Gets the true (full) fitness and complexity of a solution individual
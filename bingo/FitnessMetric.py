@@ -10,7 +10,23 @@ from scipy import optimize
 
 
 class FitnessMetric(object, metaclass=abc.ABCMeta):
-    """fitness metric superclass"""
+    """
+    fitness metric superclass
+
+    :ivar interval_prescreen: whether individuals which are guaranteed to be
+                              invalid on the training data (by interval
+                              arithmetic) are given the invalid fitness
+                              without evaluation or optimization (off by
+                              default)
+    :ivar invalid_fitness: fitness of individuals which are invalid on all of
+                           the training data
+    :ivar rng: random stream for the initial guesses of constant optimization
+               (bound by coevolution islands, see RandomStreams).  None uses
+               the global numpy random state
+    """
+    interval_prescreen = False
+    invalid_fitness = np.nan
+    rng = None
 
     def __init__(self):
         """empty init"""
@@ -23,12 +39,41 @@ class FitnessMetric(object, metaclass=abc.ABCMeta):
         :param training_data: ExplicitTrainingData
         :return fitness of the individual
         """
-        # do optimization if necessary
+        if self.guaranteed_invalid(individual, training_data):
+            return self.invalid_fitness
+
+        # do optimization (in double precision) if necessary
         if individual.needs_optimization():
-            self.optimize_constants(individual, training_data)
+            self.optimize_constants(individual,
+                                    training_data.full_precision())
 
         fvec = self.evaluate_fitness_vector(individual, training_data)
-        return np.mean(np.abs(fvec))
+        return self.fitness_from_vector(fvec)
+
+    def guaranteed_invalid(self, individual, training_data):
+        """
+        Interval arithmetic pre-screening of an individual on the bounds of
+        the training data (if both support it)
+        :param individual: an AGraph-like individual to be evaluated
+        :param training_data: the data used by the fitness metric
+        :return: True if the individual is guaranteed to be invalid
+        """
+        if not self.interval_prescreen or \
+                not hasattr(individual, "guaranteed_invalid") or \
+                not hasattr(training_data, "input_bounds"):
+            return False
+        return individual.guaranteed_invalid(training_data.input_bounds())
+
+    def fitness_from_vector(self, fvec):
+        """
+        Reduces fitness vector(s) to fitness value(s).  The reduction is done
+        along the last axis so that a stack of fitness vectors (e.g., the
+        full-data fitness vectors gathered at the indices of many fitness
+        predictors) can be reduced in a single call
+        :param fvec: fitness vector, or array of fitness vectors
+        :return: fitness (array of fitnesses for multidimensional fvec)
+        """
+        return np.mean(np.abs(fvec), axis=-1)
 
     @abc.abstractmethod
     def evaluate_fitness_vector(self, individual, training_data):
@@ -48,7 +93,8 @@ class FitnessMetric(object, metaclass=abc.ABCMeta):
         :param training_data: the data used by the fitness metric
         """
         num_constants = individual.count_constants()
-        c_0 = np.random.uniform(-100, 100, num_constants)
+        rng = np.random if self.rng is None else self.rng
+        c_0 = rng.uniform(-100, 100, num_constants)
 
         # define fitness function for optimization
         def const_opt_fitness(consts):
@@ -110,7 +156,8 @@ class StandardRegression(FitnessMetric):
         :param training_data: the data used by the fitness metric
         """
         num_constants = individual.count_constants()
-        c_0 = np.random.uniform(-100, 100, num_constants)
+        rng = np.random if self.rng is None else self.rng
+        c_0 = rng.uniform(-100, 100, num_constants)
 
         if self.const_deriv:
             # define fitness function for optimization
@@ -141,6 +188,8 @@ class StandardRegression(FitnessMetric):
 
 class ImplicitRegression(FitnessMetric):
     """ Implicit Regression, version 2"""
+    # fitness_from_vector gives inf when too few values are finite
+    invalid_fitness = np.inf
 
     def __init__(self, required_params=None, normalize_dot=False,
                  acceptable_nans=0.1):
@@ -195,19 +244,32 @@ class ImplicitRegression(FitnessMetric):
         :param training_data: ImplicitTrainingData
         :return: the mean of the fitness vector, ignoring nans
         """
-        # do optimization if necessary
+        if self.guaranteed_invalid(individual, training_data):
+            return self.invalid_fitness
+
+        # do optimization (in double precision) if necessary
         if individual.needs_optimization():
-            self.optimize_constants(individual, training_data)
+            self.optimize_constants(individual,
+                                    training_data.full_precision())
 
         fvec = self.evaluate_fitness_vector(individual, training_data)
-        finite_fraction = np.count_nonzero(np.isfinite(fvec))/fvec.shape[0]
-        if finite_fraction < self.acceptable_finite_fraction:
-            err = np.inf
-        else:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=RuntimeWarning)
-                err = np.nanmean(np.abs(fvec))
-        return err
+        return self.fitness_from_vector(fvec)
+
+    def fitness_from_vector(self, fvec):
+        """
+        Reduces fitness vector(s) to fitness value(s) along the last axis,
+        ignoring nans as long as enough of the vector is finite
+
+        :param fvec: fitness vector, or array of fitness vectors
+        :return: the mean of the fitness vector, ignoring nans
+        """
+        finite_fraction = np.count_nonzero(np.isfinite(fvec), axis=-1) / \
+                          fvec.shape[-1]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            err = np.nanmean(np.abs(fvec), axis=-1)
+        return np.where(finite_fraction < self.acceptable_finite_fraction,
+                        np.inf, err)[()]
 
 
 # I DONT THINK THIS ONE WORKS BECAUSE IT FAILS TO CONSIDER ELASTIC STRAIN
@@ -5,6 +5,8 @@ fitness predictor in the form of a subsampling list for real data
 import logging
 import numpy as np
 
+from .RandomStreams import make_rng
+
 LOGGER = logging.getLogger(__name__)
 
 class FPManipulator(object):
@@ -16,15 +18,23 @@ class FPManipulator(object):
     def __init__(self, size, max_index):
         self.size = size
         self.max_index = max_index
+        # random stream; islands bind their own stream to it (RandomStreams)
+        self.rng = make_rng()
 
     def generate(self):
         """generate random individual"""
-        indices = np.random.randint(0, self.max_index, self.size).tolist()
+        indices = self.rng.integers(0, self.max_index, self.size).tolist()
         return FitnessPredictor(indices)
 
+    def generate_batch(self, n_indv):
+        """generate many random individuals at once"""
+        indices = self.rng.integers(0, self.max_index,
+                                    (n_indv, self.size)).tolist()
+        return [FitnessPredictor(ind) for ind in indices]
+
     def crossover(self, parent1, parent2):
         """single point crossover, returns 2 new individuals"""
-        cx_point = np.random.randint(1, self.size)
+        cx_point = self.rng.integers(1, self.size)
         child1 = parent1.copy()
         child2 = parent2.copy()
         child1.indices[cx_point:] = parent2.indices[cx_point:]
@@ -33,6 +43,8 @@ class FPManipulator(object):
         child2.fitness = None
         child1.fit_set = False
         child2.fit_set = False
+        child1.trainer_errors = None
+        child2.trainer_errors = None
         child_age = max(parent1.genetic_age, parent2.genetic_age)
         child1.genetic_age = child_age
         child2.genetic_age = child_age
@@ -40,10 +52,11 @@ class FPManipulator(object):
 
     def mutation(self, indv):
         """performs 1pt mutation, does not create copy of indv"""
-        mut_point = np.random.randint(self.size)
-        indv.indices[mut_point] = np.random.randint(self.max_index)
+        mut_point = self.rng.integers(self.size)
+        indv.indices[mut_point] = self.rng.integers(self.max_index)
         indv.fitness = None
         indv.fit_set = False
+        indv.trainer_errors = None
         return indv
 
     @staticmethod
@@ -73,10 +86,39 @@ class FPManipulator(object):
         """
         return FitnessPredictor(indv_list[0], indv_list[1])
 
+    def pack(self, indvs):
+        """
+        Packs individuals into numpy arrays for migration (see
+        MigrationBuffers)
+
+        :param indvs: list of individuals
+        :return: list of integer arrays (indices, genetic ages), empty list of
+                 float arrays
+        """
+        indices = np.array([indv.indices for indv in indvs],
+                           dtype=np.int64).reshape((-1, self.size))
+        ages = np.array([indv.genetic_age for indv in indvs], dtype=np.int64)
+        return [indices, ages], []
+
+    @staticmethod
+    def unpack(int_arrays, float_arrays):
+        """
+        Unpacks individuals from the numpy arrays made by pack
+
+        :param int_arrays: list of integer arrays
+        :param float_arrays: list of float arrays
+        :return: list of individuals
+        """
+        indices, ages = int_arrays
+        return [FitnessPredictor(ind, age) for ind, age in
+                zip(indices.tolist(), ages.tolist())]
+
 
 class FitnessPredictor(object):
     """
-    class for fitness predictor, mainly just a list of indices
+    class for fitness predictor, mainly just a list of indices.  The error of
+    the predictor on each trainer is kept (trainer_errors) so that its fitness
+    can be updated incrementally when a single trainer is replaced
     """
     def __init__(self, indices=None, genetic_age=0):
         if indices is None:
@@ -85,6 +127,7 @@ class FitnessPredictor(object):
             self.indices = indices
         self.fitness = None
         self.fit_set = False
+        self.trainer_errors = None
         self.genetic_age = genetic_age
 
     def copy(self):
@@ -92,12 +135,18 @@ class FitnessPredictor(object):
         dup = FitnessPredictor(list(self.indices))
         dup.fitness = self.fitness
         dup.fit_set = self.fit_set
+        if self.trainer_errors is not None:
+            dup.trainer_errors = np.array(self.trainer_errors)
         dup.genetic_age = self.genetic_age
         return dup
 
     def __str__(self):
         return str(self.indices)
 
+    def content_hash(self):
+        """hash of the subsampling indices (identifies equivalent predictors)"""
+        return hash(tuple(self.indices))
+
     def fit_func(self, individual, fitness_metric, training_data):
         """fitness function for standard regression type"""
         try:
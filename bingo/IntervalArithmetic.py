@@ -0,0 +1,183 @@
+"""
+This module contains the interval arithmetic used to pre-screen acyclic
+graphs: the bounds of the training data are propagated through the stack to
+find individuals which are guaranteed to evaluate to nan (or infinity)
+everywhere, before any data is evaluated or constants are optimized.
+
+An interval (lower, upper) bounds all of the non-nan values a command can
+take (bounds may be infinite).  None is used for a command which is nan for
+all inputs.  The bounds are conservative: an interval may be wider than the
+actual range of values, but never narrower.
+"""
+import functools
+
+import numpy as np
+
+UNBOUNDED = (-np.inf, np.inf)
+# any finite value (e.g. a constant which is not yet optimized)
+FINITE = (-np.finfo(float).max, np.finfo(float).max)
+
+
+def make_interval(lower, upper):
+    """interval with nan bounds replaced by infinite (unknown) bounds"""
+    if np.isnan(lower):
+        lower = -np.inf
+    if np.isnan(upper):
+        upper = np.inf
+    return float(lower), float(upper)
+
+
+def is_non_finite(interval):
+    """
+    Whether an interval guarantees a non-finite value for all inputs
+
+    :param interval: interval or None
+    :return: True if the value is always nan or always the same infinity
+    """
+    if interval is None:
+        return True
+    lower, upper = interval
+    return lower == upper and np.isinf(lower)
+
+
+def nan_propagating(function):
+    """decorator: the result is nan everywhere if any argument is"""
+    @functools.wraps(function)
+    def wrapper(*intervals):
+        if any(interval is None for interval in intervals):
+            return None
+        return function(*intervals)
+    return wrapper
+
+
+@nan_propagating
+def add(int1, int2):
+    """interval of x + y"""
+    return make_interval(int1[0] + int2[0], int1[1] + int2[1])
+
+
+@nan_propagating
+def subtract(int1, int2):
+    """interval of x - y"""
+    return make_interval(int1[0] - int2[1], int1[1] - int2[0])
+
+
+@nan_propagating
+def multiply(int1, int2):
+    """interval of x * y"""
+    products = [int1[0] * int2[0], int1[0] * int2[1],
+                int1[1] * int2[0], int1[1] * int2[1]]
+    # 0 * inf is taken to be 0 (the limit of finite values)
+    products = [0.0 if np.isnan(p) else p for p in products]
+    return make_interval(min(products), max(products))
+
+
+@nan_propagating
+def divide(int1, int2):
+    """interval of x / y"""
+    if int2[0] == 0 and int2[1] == 0:
+        if int1[0] > 0:
+            return np.inf, np.inf
+        if int1[1] < 0:
+            return -np.inf, -np.inf
+        return UNBOUNDED
+    if int2[0] <= 0 <= int2[1]:
+        return UNBOUNDED
+    return multiply(int1, (1.0 / int2[1], 1.0 / int2[0]))
+
+
+@nan_propagating
+def sin(int1):
+    """interval of sin(x)"""
+    return periodic_interval(int1, np.sin, np.pi / 2)
+
+
+@nan_propagating
+def cos(int1):
+    """interval of cos(x)"""
+    return periodic_interval(int1, np.cos, 0.0)
+
+
+def periodic_interval(int1, function, max_location):
+    """
+    interval of sin or cos
+
+    :param int1: interval of the argument
+    :param function: np.sin or np.cos
+    :param max_location: location of a maximum of the function
+    """
+    lower, upper = int1
+    if np.isinf(lower) and lower == upper:
+        return None
+    if np.isinf(lower) or np.isinf(upper) or upper - lower >= 2 * np.pi:
+        return -1.0, 1.0
+    values = [function(lower), function(upper)]
+    # check for a maximum / minimum inside the interval
+    next_max = max_location + 2 * np.pi * np.ceil(
+        (lower - max_location) / (2 * np.pi))
+    if next_max <= upper:
+        values.append(1.0)
+    next_min = max_location + np.pi + 2 * np.pi * np.ceil(
+        (lower - max_location - np.pi) / (2 * np.pi))
+    if next_min <= upper:
+        values.append(-1.0)
+    return make_interval(min(values), max(values))
+
+
+@nan_propagating
+def exp(int1):
+    """interval of exp(x)"""
+    return make_interval(np.exp(int1[0]), np.exp(int1[1]))
+
+
+@nan_propagating
+def log(int1):
+    """interval of log(x)"""
+    lower, upper = int1
+    if upper < 0:
+        return None
+    return make_interval(np.log(max(lower, 0.0)), np.log(upper))
+
+
+@nan_propagating
+def log_abs(int1):
+    """interval of log(|x|)"""
+    return make_interval(*[np.log(b) for b in absolute(int1)])
+
+
+@nan_propagating
+def sqrt(int1):
+    """interval of sqrt(x)"""
+    lower, upper = int1
+    if upper < 0:
+        return None
+    return make_interval(np.sqrt(max(lower, 0.0)), np.sqrt(upper))
+
+
+@nan_propagating
+def sqrt_abs(int1):
+    """interval of sqrt(|x|)"""
+    return make_interval(*[np.sqrt(b) for b in absolute(int1)])
+
+
+@nan_propagating
+def absolute(int1):
+    """interval of |x|"""
+    lower, upper = int1
+    if lower >= 0:
+        return lower, upper
+    if upper <= 0:
+        return -upper, -lower
+    return 0.0, max(-lower, upper)
+
+
+def power(int1, int2):
+    """interval of x^y (not bounded in general)"""
+    # nan^0 and 1^nan are not nan
+    if int1 is None or int2 is None:
+        return UNBOUNDED
+    if int1[0] > 0 and int2[0] == int2[1]:
+        with np.errstate(all='ignore'):
+            values = [np.power(int1[0], int2[0]), np.power(int1[1], int2[0])]
+        return make_interval(min(values), max(values))
+    return UNBOUNDED
@@ -3,9 +3,13 @@ This module contains the code for an island in an island-based GA optimization
 it is general enough to work on any representation/fitness
 """
 import logging
-import random
+from bisect import bisect_right
+from concurrent import futures
 import numpy as np
 
+from .ParetoArchive import ParetoArchive
+from .RandomStreams import make_rng
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -16,7 +20,8 @@ class Island(object):
 
     def __init__(self, gene_manipulator, fitness_function,
                  target_pop_size=64, cx_prob=0.7, mut_prob=0.01,
-                 age_fitness=False):
+                 age_fitness=False, steady_state=False,
+                 evaluation_executor=None, rng=None):
         """
         Initialization of island
 
@@ -28,46 +33,104 @@ class Island(object):
         :param target_pop_size: targeted number of individuals in the island
         :param cx_prob: crossover probability
         :param mut_prob: mutation probability
+        :param age_fitness: use age-fitness pareto steps rather than
+                            deterministic crowding.  Deterministic crowding
+                            uses batched variation if the gene manipulator
+                            supports it (crossover_batch, mutation_batch and
+                            distance_batch)
+        :param steady_state: use steady-state (asynchronous) deterministic
+                             crowding steps; takes precedence over age_fitness
+        :param evaluation_executor: executor (e.g. from concurrent.futures)
+                                    used to evaluate children in steady-state
+                                    mode.  None evaluates them serially.
+        :param rng: random stream of the island: a seed, numpy Generator or
+                    RandomStream (see RandomStreams).  It is bound to the
+                    gene manipulator during the steps of the island
         """
         self.gene_manipulator = gene_manipulator
         self.fitness_function = fitness_function
         self.target_pop_size = target_pop_size
         self.mut_prob = mut_prob
         self.cx_prob = cx_prob
+        self.rng = make_rng(rng)
         self.pop = []
+        self.immigrants = []
         self.generate_population()
         self.age = 0
         self.fitness_evals = 0
-        self.pareto_front = []
-        if age_fitness:
+        self.pareto_archive = ParetoArchive()
+        self.pareto_front = self.pareto_archive.members
+        self.evaluation_executor = evaluation_executor
+        self.pending_children = {}
+        # callable(island, individuals) which evaluates a list of
+        # individuals, e.g. sharing them with other ranks (see WorkStealing)
+        self.batch_evaluator = None
+        if steady_state:
+            self.generational_step = self.steady_state_step
+        elif age_fitness:
             self.generational_step = self.age_fitness_pareto_step
+        elif hasattr(gene_manipulator, "crossover_batch"):
+            self.generational_step = self.batch_crowding_step
         else:
             self.generational_step = self.deterministic_crowding_step
 
     def generate_population(self):
         """
         Generates a new random population using the gene manipulator to fill
-        the island
+        the island (in a single batch if the manipulator supports it)
+        """
+        self.bind_rng()
+        self.pop = self.generate_individuals(self.target_pop_size)
+
+    def bind_rng(self):
+        """
+        Binds the random stream of the island to the gene manipulator, which
+        may be shared with other islands
+        """
+        if hasattr(self.gene_manipulator, "rng"):
+            self.gene_manipulator.rng = self.rng
+
+    def generate_individuals(self, n_indv):
+        """
+        Generates new random individuals, using the batch generation of the
+        gene manipulator (generate_batch) if it is available
+
+        :param n_indv: number of individuals
+        :return: list of new individuals
+        """
+        if hasattr(self.gene_manipulator, "generate_batch"):
+            return self.gene_manipulator.generate_batch(n_indv)
+        return [self.gene_manipulator.generate() for _ in range(n_indv)]
+
+    def random_immigrant(self):
+        """
+        Gets a newly generated individual.  Immigrants are generated in
+        batches of the target population size and used one at a time
+
+        :return: new individual
         """
-        self.pop = [self.gene_manipulator.generate()
-                    for _ in range(self.target_pop_size)]
+        if len(self.immigrants) == 0:
+            self.immigrants = self.generate_individuals(self.target_pop_size)
+        return self.immigrants.pop()
 
     def deterministic_crowding_step(self):
         """
         Performs a deterministic crowding generational step
         """
+        self.bind_rng()
         self.age += 1
         for indv in self.pop:
             indv.genetic_age += 1
         # randomly pair by shuffling
-        random.shuffle(self.pop)
+        self.rng.shuffle(self.pop)
+        families = []
         for i in range(self.target_pop_size//2):
             p_1 = self.pop[i*2]
             p_2 = self.pop[i*2+1]
             # see if any events occur
-            do_cx = random.random() <= self.cx_prob
-            do_mut1 = random.random() <= self.mut_prob
-            do_mut2 = random.random() <= self.mut_prob
+            do_cx = self.rng.random() <= self.cx_prob
+            do_mut1 = self.rng.random() <= self.mut_prob
+            do_mut2 = self.rng.random() <= self.mut_prob
             if do_cx or do_mut1 or do_mut2:
                 # do crossover
                 if do_cx:
@@ -80,63 +143,237 @@ class Island(object):
                     c_1 = self.gene_manipulator.mutation(c_1)
                 if do_mut2:
                     c_2 = self.gene_manipulator.mutation(c_2)
-                # calculate fitnesses
-                if p_1.fit_set is False:
-                    p_1.fitness = self.fitness_function(p_1)
-                    p_1.fit_set = True
-                    self.fitness_evals += 1
-                if p_2.fit_set is False:
-                    p_2.fitness = self.fitness_function(p_2)
-                    p_2.fit_set = True
-                    self.fitness_evals += 1
-                if c_1.fit_set is False:
-                    c_1.fitness = self.fitness_function(c_1)
-                    c_1.fit_set = True
-                    self.fitness_evals += 1
-                if c_2.fit_set is False:
-                    c_2.fitness = self.fitness_function(c_2)
-                    c_2.fit_set = True
-                    self.fitness_evals += 1
-                # do selection
-                dist_a = self.gene_manipulator.distance(p_1, c_1) + \
-                         self.gene_manipulator.distance(p_2, c_2)
-                dist_b = self.gene_manipulator.distance(p_1, c_2) + \
-                         self.gene_manipulator.distance(p_2, c_1)
-                if dist_a <= dist_b:
-                    if c_1.fitness < p_1.fitness or \
-                            np.any(np.isnan(p_1.fitness)):
-                        self.pop[i*2] = c_1
-                    if c_2.fitness < p_2.fitness or \
-                            np.any(np.isnan(p_2.fitness)):
-                        self.pop[i*2+1] = c_2
-                else:
-                    if c_2.fitness < p_1.fitness or \
-                            np.any(np.isnan(p_1.fitness)):
-                        self.pop[i*2] = c_2
-                    if c_1.fitness < p_2.fitness or \
-                            np.any(np.isnan(p_2.fitness)):
-                        self.pop[i*2+1] = c_1
+                families.append((i, p_1, p_2, c_1, c_2))
+
+        # calculate fitnesses (the pairs are independent, so the whole
+        # generation is evaluated at once)
+        self.evaluate_individuals([indv for family in families
+                                   for indv in family[1:]])
+
+        # do selection
+        for i, p_1, p_2, c_1, c_2 in families:
+            dist_a = self.gene_manipulator.distance(p_1, c_1) + \
+                     self.gene_manipulator.distance(p_2, c_2)
+            dist_b = self.gene_manipulator.distance(p_1, c_2) + \
+                     self.gene_manipulator.distance(p_2, c_1)
+            if dist_a <= dist_b:
+                if c_1.fitness < p_1.fitness or \
+                        np.any(np.isnan(p_1.fitness)):
+                    self.pop[i*2] = c_1
+                if c_2.fitness < p_2.fitness or \
+                        np.any(np.isnan(p_2.fitness)):
+                    self.pop[i*2+1] = c_2
+            else:
+                if c_2.fitness < p_1.fitness or \
+                        np.any(np.isnan(p_1.fitness)):
+                    self.pop[i*2] = c_2
+                if c_1.fitness < p_2.fitness or \
+                        np.any(np.isnan(p_2.fitness)):
+                    self.pop[i*2+1] = c_1
+
+    def batch_crowding_step(self):
+        """
+        Performs a deterministic crowding generational step in which the
+        crossovers, mutations and distances of the whole generation are done
+        by the batch operations of the gene manipulator
+        """
+        self.bind_rng()
+        self.age += 1
+        for indv in self.pop:
+            indv.genetic_age += 1
+        # randomly pair by shuffling
+        self.rng.shuffle(self.pop)
+        n_pairs = self.target_pop_size//2
+        do_cx = self.rng.random(n_pairs) <= self.cx_prob
+        do_mut1 = self.rng.random(n_pairs) <= self.mut_prob
+        do_mut2 = self.rng.random(n_pairs) <= self.mut_prob
+        pairs = np.flatnonzero(do_cx | do_mut1 | do_mut2)
+        if len(pairs) == 0:
+            return
+        parents1 = [self.pop[i*2] for i in pairs]
+        parents2 = [self.pop[i*2+1] for i in pairs]
+
+        # do crossovers
+        children1 = [p.copy() for p in parents1]
+        children2 = [p.copy() for p in parents2]
+        cx_pairs = np.flatnonzero(do_cx[pairs])
+        if len(cx_pairs) > 0:
+            cx_children1, cx_children2 = self.gene_manipulator.crossover_batch(
+                [parents1[k] for k in cx_pairs],
+                [parents2[k] for k in cx_pairs])
+            for k, c_1, c_2 in zip(cx_pairs, cx_children1, cx_children2):
+                children1[k] = c_1
+                children2[k] = c_2
+
+        # do mutations
+        mutants = [children1[k] for k in np.flatnonzero(do_mut1[pairs])] + \
+                  [children2[k] for k in np.flatnonzero(do_mut2[pairs])]
+        if len(mutants) > 0:
+            self.gene_manipulator.mutation_batch(mutants)
+
+        # calculate fitnesses
+        self.evaluate_individuals(parents1 + parents2 + children1 + children2)
+
+        # do selection
+        dist_a = self.gene_manipulator.distance_batch(parents1, children1) + \
+                 self.gene_manipulator.distance_batch(parents2, children2)
+        dist_b = self.gene_manipulator.distance_batch(parents1, children2) + \
+                 self.gene_manipulator.distance_batch(parents2, children1)
+        for k, i in enumerate(pairs):
+            p_1, p_2 = parents1[k], parents2[k]
+            if dist_a[k] <= dist_b[k]:
+                c_1, c_2 = children1[k], children2[k]
+            else:
+                c_1, c_2 = children2[k], children1[k]
+            if c_1.fitness < p_1.fitness or np.any(np.isnan(p_1.fitness)):
+                self.pop[i*2] = c_1
+            if c_2.fitness < p_2.fitness or np.any(np.isnan(p_2.fitness)):
+                self.pop[i*2+1] = c_2
+
+    def steady_state_step(self):
+        """
+        Performs a steady-state deterministic crowding step: random pairs of
+        parents produce children which are submitted for evaluation.  Each
+        child competes for replacement as soon as its evaluation completes
+        (against the more similar of the current occupants of its parents'
+        slots), so evaluations may continue across steps.
+        """
+        self.bind_rng()
+        self.age += 1
+        for indv in self.pop:
+            indv.genetic_age += 1
+        for indv in self.pop:
+            if indv.fit_set is False:
+                indv.fitness = self.fitness_function(indv)
+                indv.fit_set = True
+                self.fitness_evals += 1
+
+        for _ in range(self.target_pop_size//2):
+            i, j = self.rng.sample(range(len(self.pop)), 2)
+            p_1 = self.pop[i]
+            p_2 = self.pop[j]
+            # see if any events occur
+            do_cx = self.rng.random() <= self.cx_prob
+            do_mut1 = self.rng.random() <= self.mut_prob
+            do_mut2 = self.rng.random() <= self.mut_prob
+            if not (do_cx or do_mut1 or do_mut2):
+                continue
+            if do_cx:
+                c_1, c_2 = self.gene_manipulator.crossover(p_1, p_2)
+            else:
+                c_1 = p_1.copy()
+                c_2 = p_2.copy()
+            if do_mut1:
+                c_1 = self.gene_manipulator.mutation(c_1)
+            if do_mut2:
+                c_2 = self.gene_manipulator.mutation(c_2)
+            self.submit_child(c_1, (i, j))
+            self.submit_child(c_2, (i, j))
+            # limit the number of children in flight
+            self.collect_children(
+                block=len(self.pending_children) >= self.target_pop_size)
+        self.collect_children(block=False)
+
+    def evaluate_individuals(self, indvs):
+        """
+        Evaluates the individuals of a list which don't have a fitness, with
+        the batch evaluator if there is one
+
+        :param indvs: list of individuals
+        """
+        if self.batch_evaluator is not None:
+            unevaluated = {id(indv): indv for indv in indvs
+                           if indv.fit_set is False}
+            self.batch_evaluator(self, list(unevaluated.values()))
+            return
+        for indv in indvs:
+            if indv.fit_set is False:
+                indv.fitness = self.fitness_function(indv)
+                indv.fit_set = True
+                self.fitness_evals += 1
+
+    def submit_child(self, child, slots):
+        """
+        Submits a child for evaluation (or evaluates it if there is no
+        evaluation executor) and lets it compete once it is evaluated
+
+        :param child: the child individual
+        :param slots: population indices of the parents of the child
+        """
+        if child.fit_set:
+            self.replace_parent(child, slots)
+        elif self.evaluation_executor is None:
+            child.fitness = self.fitness_function(child)
+            child.fit_set = True
+            self.fitness_evals += 1
+            self.replace_parent(child, slots)
+        else:
+            future = self.evaluation_executor.submit(
+                evaluate_individual, self.fitness_function, child)
+            self.pending_children[future] = (child, slots)
+
+    def collect_children(self, block=False):
+        """
+        Lets children whose evaluation completed compete for replacement
+
+        :param block: wait until at least one evaluation completes
+        """
+        if len(self.pending_children) == 0:
+            return
+        done, _ = futures.wait(
+            list(self.pending_children), timeout=None if block else 0,
+            return_when=futures.FIRST_COMPLETED)
+        for future in done:
+            child, slots = self.pending_children.pop(future)
+            fitness, evaluated, fitness_memo = future.result()
+            if evaluated is not child:
+                # evaluated in another process: the fitness function may
+                # have changed the genome and constants of the copy
+                child.__dict__.update(evaluated.__dict__)
+                if fitness_memo is not None:
+                    child.fitness_memo = fitness_memo
+            child.fitness = fitness
+            child.fit_set = True
+            self.fitness_evals += 1
+            self.replace_parent(child, slots)
+
+    def replace_parent(self, child, slots):
+        """
+        The evaluated child replaces the more similar of the individuals in
+        the given population slots if it has a better fitness
+
+        :param child: the evaluated child individual
+        :param slots: population indices of the parents of the child
+        """
+        i, j = slots
+        if self.gene_manipulator.distance(self.pop[j], child) < \
+                self.gene_manipulator.distance(self.pop[i], child):
+            i = j
+        if child.fitness < self.pop[i].fitness or \
+                np.any(np.isnan(self.pop[i].fitness)):
+            self.pop[i] = child
 
     def age_fitness_pareto_step(self):
         """
         Performs a age-fitness pareto generational step
         """
         # increment age
+        self.bind_rng()
         self.age += 1
         for indv in self.pop:
             indv.genetic_age += 1
 
         # random mating
         # randomly pair by shuffling
-        random.shuffle(self.pop)
+        self.rng.shuffle(self.pop)
         start_pop_size = len(self.pop)
         for i in range(start_pop_size//2):
             p_1 = self.pop[i*2]
             p_2 = self.pop[i*2+1]
             # see if any events occur
-            do_cx = random.random() <= self.cx_prob
-            do_mut1 = random.random() <= self.mut_prob
-            do_mut2 = random.random() <= self.mut_prob
+            do_cx = self.rng.random() <= self.cx_prob
+            do_mut1 = self.rng.random() <= self.mut_prob
+            do_mut2 = self.rng.random() <= self.mut_prob
             # do crossover
             if do_cx:
                 c_1, c_2 = self.gene_manipulator.crossover(p_1, p_2)
@@ -159,49 +396,59 @@ class Island(object):
                     self.pop.append(c_2)
 
         # add in one newly generated
-        self.pop.append(self.gene_manipulator.generate())
+        self.pop.append(self.random_immigrant())
 
         # selection via age-fitness domination
-        selection_attempts = 0
-        while len(self.pop) > self.target_pop_size and \
-              selection_attempts < start_pop_size * 50:
-            # select random pairs
-            indv_a = np.random.randint(len(self.pop))
-            indv_b = np.random.randint(len(self.pop))
-            while indv_b == indv_a:
-                indv_b = np.random.randint(len(self.pop))
-            # get fitnesses
-            if self.pop[indv_a].fit_set is False:
-                self.pop[indv_a].fitness = self.fitness_function(
-                    self.pop[indv_a])
-                self.pop[indv_a].fit_set = True
-                self.fitness_evals += 1
-            if self.pop[indv_b].fit_set is False:
-                self.pop[indv_b].fitness = self.fitness_function(
-                    self.pop[indv_b])
-                self.pop[indv_b].fit_set = True
-                self.fitness_evals += 1
-            # check for domination in age-fitness
-            if np.any(np.isnan(self.pop[indv_a].fitness)):
-                del self.pop[indv_a]
-            elif np.any(np.isnan(self.pop[indv_b].fitness)):
-                del self.pop[indv_b]
-            elif self.pop[indv_a].genetic_age < self.pop[indv_b].genetic_age:
-                if self.pop[indv_a].fitness <= self.pop[indv_b].fitness:
-                    del self.pop[indv_b]
-            elif self.pop[indv_a].genetic_age > self.pop[indv_b].genetic_age:
-                if self.pop[indv_b].fitness <= self.pop[indv_a].fitness:
-                    del self.pop[indv_a]
-            else:  # equal ages
-                if self.pop[indv_a].fitness <= self.pop[indv_b].fitness:
-                    del self.pop[indv_b]
-                else:
-                    del self.pop[indv_a]
-            selection_attempts += 1
+        self.age_fitness_selection()
+
+    def age_fitness_selection(self):
+        """
+        Reduces the population to the target population size by removing the
+        individuals in the worst non-dominated (age, fitness) layers.  The last
+        layer kept is trimmed randomly if it doesn't fit entirely.  Individuals
+        with a nan fitness are removed before any others.
+        """
+        if len(self.pop) <= self.target_pop_size:
+            return
+
+        # fitness is needed for every comparison, so evaluate once up front
+        self.evaluate_individuals(self.pop)
 
-        # LOGGER.debug("population zise: " + str(len(self.pop)) +
-        #              "    target size: " + str(self.target_pop_size) +
-        #              "    attempts: " + str(selection_attempts))
+        valid = [i for i, indv in enumerate(self.pop)
+                 if not np.any(np.isnan(indv.fitness))]
+        invalid = [i for i, indv in enumerate(self.pop)
+                   if np.any(np.isnan(indv.fitness))]
+
+        # dense ranking of fitness (handles tuples as well as floats)
+        ranks = np.empty(len(valid), dtype=int)
+        order = sorted(range(len(valid)),
+                       key=lambda j: self.pop[valid[j]].fitness)
+        rank = 0
+        for k, j in enumerate(order):
+            if k > 0 and self.pop[valid[j]].fitness != \
+                    self.pop[valid[order[k - 1]]].fitness:
+                rank += 1
+            ranks[j] = rank
+        ages = np.array([self.pop[i].genetic_age for i in valid], dtype=int)
+
+        layers = nondominated_layers(ages, ranks)
+        valid = np.array(valid, dtype=int)
+        # nan individuals are worse than any valid individual
+        layer_list = [valid[layers == layer]
+                      for layer in range(layers.max() + 1 if valid.size else 0)]
+        layer_list.append(np.array(invalid, dtype=int))
+
+        keep = np.zeros(len(self.pop), dtype=bool)
+        n_kept = 0
+        for layer in layer_list:
+            n_left = self.target_pop_size - n_kept
+            if len(layer) <= n_left:
+                keep[layer] = True
+                n_kept += len(layer)
+            else:
+                keep[self.rng.choice(layer, n_left, replace=False)] = True
+                break
+        self.pop[:] = [indv for indv, k in zip(self.pop, keep) if k]
 
     def best_indv(self):
         """
@@ -265,9 +512,16 @@ class Island(object):
             self.fitness_evals += 1
         return indv1.fitness == indv2.fitness
 
-    def update_pareto_front(self):
+    def update_pareto_front(self, evaluate_all=True):
         """
         Updates the pareto front based on the current population
+
+        :param evaluate_all: default (True) value results in all of the
+                             population being evaluated.  False value means
+                             that individuals without a fitness are left out
+                             (they enter the front once selection evaluates
+                             them).  Members of the current front are always
+                             evaluated.
         """
         # see if fitness is a tuple or list
         if self.pop[0].fit_set is False:
@@ -281,50 +535,105 @@ class Island(object):
         if single_metric:
             self.pareto_front = [self.best_indv().copy()]
 
-        # multiple metrics
+        # two metrics: maintained in a sorted archive
+        elif len(self.pop[0].fitness) == 2:
+            self.update_pareto_archive(evaluate_all)
+
+        # more metrics
+        else:
+            self.update_pareto_front_pairwise(evaluate_all)
+
+    def update_pareto_archive(self, evaluate_all=True):
+        """
+        Updates the pareto front for 2-objective fitness using the sorted
+        pareto archive
+
+        :param evaluate_all: see update_pareto_front
+        """
+        # the front may have been replaced or its fitness may have changed
+        for indv in self.pareto_front:
+            if indv.fit_set is False:
+                indv.fitness = self.fitness_function(indv)
+                indv.fit_set = True
+                self.fitness_evals += 1
+        if self.pareto_front is not self.pareto_archive.members or \
+                not self.pareto_archive.is_current():
+            self.pareto_archive.rebuild(sorted(self.pareto_front,
+                                               key=lambda x: x.fitness))
+            self.pareto_front = self.pareto_archive.members
+
+        if not evaluate_all and len(self.pareto_front) > 0:
+            candidates = [indv for indv in self.pop if indv.fit_set]
         else:
-            # remove current pareto indv who are dominated by others
-            to_remove = []
-            for i, p_1 in enumerate(self.pareto_front):
-                for j, p_2 in enumerate(self.pareto_front):
-                    if i != j:
-                        if self.dominate(p_1, p_2):
-                            if not self.similar(p_1, p_2) or i < j:
-                                to_remove.append(p_2)
-            to_remove = list(set(to_remove))
-            while len(to_remove) > 0:
-                self.pareto_front.remove(to_remove.pop())
-
-            for indv in self.pop:
-                if indv.fit_set is False:
-                    indv.fitness = self.fitness_function(indv)
-                    indv.fit_set = True
-                    self.fitness_evals += 1
-                # see if indv is dominated by any of the current pareto front
-                # also see if it is similar to any of them
-                dominated = False
-                similar = False
-                not_a_number = np.isnan(indv.fitness[0])
+            candidates = self.pop
+        for indv in candidates:
+            if indv.fit_set is False:
+                indv.fitness = self.fitness_function(indv)
+                indv.fit_set = True
+                self.fitness_evals += 1
+            self.pareto_archive.insert(indv)
+
+    def update_pareto_front_pairwise(self, evaluate_all=True):
+        """
+        Updates the pareto front by pairwise comparisons (any number of
+        fitness metrics)
+
+        :param evaluate_all: see update_pareto_front
+        """
+        # remove current pareto indv who are dominated by others
+        to_remove = []
+        for i, p_1 in enumerate(self.pareto_front):
+            for j, p_2 in enumerate(self.pareto_front):
+                if i != j:
+                    if self.dominate(p_1, p_2):
+                        if not self.similar(p_1, p_2) or i < j:
+                            to_remove.append(p_2)
+        to_remove = list(set(to_remove))
+        while len(to_remove) > 0:
+            self.pareto_front.remove(to_remove.pop())
+
+        if not evaluate_all and len(self.pareto_front) > 0:
+            candidates = [indv for indv in self.pop if indv.fit_set]
+        else:
+            candidates = self.pop
+        for indv in candidates:
+            if indv.fit_set is False:
+                indv.fitness = self.fitness_function(indv)
+                indv.fit_set = True
+                self.fitness_evals += 1
+            # see if indv is dominated by any of the current pareto front
+            # also see if it is similar to any of them
+            dominated = False
+            similar = False
+            not_a_number = np.isnan(indv.fitness[0])
+            for pareto_indv in self.pareto_front:
+                if self.dominate(pareto_indv, indv):
+                    dominated = True
+                if self.similar(pareto_indv, indv):
+                    similar = True
+
+            if not dominated and not similar and not not_a_number:
+                # remove any pareto indv who are dominated by inv
+                to_remove = []
                 for pareto_indv in self.pareto_front:
-                    if self.dominate(pareto_indv, indv):
-                        dominated = True
-                    if self.similar(pareto_indv, indv):
-                        similar = True
-
-                if not dominated and not similar and not not_a_number:
-                    # remove any pareto indv who are dominated by inv
-                    to_remove = []
-                    for pareto_indv in self.pareto_front:
-                        if self.dominate(indv, pareto_indv):
-                            to_remove.append(pareto_indv)
-                    while len(to_remove) > 0:
-                        self.pareto_front.remove(to_remove.pop())
-
-                    # then add to pareto front
-                    self.pareto_front.append(indv)
-
-            # sort the updated front
-            self.pareto_front.sort(key=lambda x: x.fitness)
+                    if self.dominate(indv, pareto_indv):
+                        to_remove.append(pareto_indv)
+                while len(to_remove) > 0:
+                    self.pareto_front.remove(to_remove.pop())
+
+                # then add to pareto front
+                self.pareto_front.append(indv)
+
+        # sort the updated front
+        self.pareto_front.sort(key=lambda x: x.fitness)
+
+    def __getstate__(self):
+        # executors and pending evaluations don't survive pickling
+        state = self.__dict__.copy()
+        state["evaluation_executor"] = None
+        state["pending_children"] = {}
+        state["batch_evaluator"] = None
+        return state
 
     def dump_population(self, subset=None, with_removal=False):
         """
@@ -337,16 +646,27 @@ class Island(object):
                              removed from population after dumping
         :return: population in list form
         """
-        if subset is None:
-            subset = list(range(self.target_pop_size))
-        pop_list = []
-        for i, indv in enumerate(self.pop):
-            if i in subset:
-                pop_list.append(self.gene_manipulator.dump(indv))
+        selected = self.select_subset(subset, with_removal)
+        return [self.gene_manipulator.dump(indv) for indv in selected]
+
+    def select_subset(self, subset=None, with_removal=False):
+        """
+        Selects a subset of the population (in population order) using a
+        boolean mask, so that the cost is linear in the population size
+
+        :param subset: list of indices for the subset of the population. A
+                       None value results in all of the population (up to the
+                       target population size) being selected.
+        :param with_removal: boolean describing whether the elements should be
+                             removed from population
+        :return: list of the selected individuals
+        """
+        mask = subset_mask(len(self.pop), subset, self.target_pop_size)
+        selected = [indv for indv, sel in zip(self.pop, mask) if sel]
         if with_removal:
-            self.pop[:] = [indv for i, indv in enumerate(self.pop)
-                           if i not in subset]
-        return pop_list
+            self.pop[:] = [indv for indv, sel in zip(self.pop, mask)
+                           if not sel]
+        return selected
 
     def dump_pareto(self):
         """
@@ -369,8 +689,81 @@ class Island(object):
                         population in pop_list is appended to the current
                         population
         """
+        self.add_individuals([self.gene_manipulator.load(indv_list)
+                              for indv_list in pop_list], replace)
+
+    def add_individuals(self, indvs, replace=True):
+        """
+        adds (already loaded) individuals to the population
+
+        :param indvs: list of individuals
+        :param replace: default (True) value results in all of the population
+                        being replaced. False value means that the individuals
+                        are appended to the current population
+        """
         if replace:
             self.pop = []
-        for indv_list in pop_list:
-            self.pop.append(self.gene_manipulator.load(indv_list))
+        self.pop.extend(indvs)
         self.target_pop_size = len(self.pop)
+
+
+def subset_mask(size, subset=None, default_size=None):
+    """
+    Boolean mask of a subset of indices
+
+    :param size: length of the mask
+    :param subset: list of indices in the subset. None selects the first
+                   default_size indices (or all of them)
+    :param default_size: number of selected indices for a None subset
+    :return: list of booleans
+    """
+    if subset is None:
+        n_selected = size if default_size is None else default_size
+        return [i < n_selected for i in range(size)]
+    mask = [False]*size
+    for i in subset:
+        mask[i] = True
+    return mask
+
+
+def nondominated_layers(ages, ranks):
+    """
+    Sort-based (O(n log n)) assignment of non-dominated layers in the
+    two objectives age and fitness rank (both minimized).  An individual is
+    dominated by another which is no older and no worse; of two identical
+    individuals, the one appearing later is dominated.
+
+    :param ages: numpy array of ages
+    :param ranks: numpy array of fitness ranks (lower is better)
+    :return: numpy array of the layer index of each individual (0 is the
+             non-dominated front)
+    """
+    layers = np.empty(len(ages), dtype=int)
+    # minimum rank of all individuals in each layer; nondecreasing with layer
+    layer_min_ranks = []
+    for i in np.lexsort((ranks, ages)):
+        layer = bisect_right(layer_min_ranks, ranks[i])
+        if layer == len(layer_min_ranks):
+            layer_min_ranks.append(ranks[i])
+        else:
+            layer_min_ranks[layer] = ranks[i]
+        layers[i] = layer
+    return layers
+
+
+def evaluate_individual(fitness_function, indv):
+    """
+    Evaluates the fitness of an individual; module level so that it can be
+    submitted to process based executors.  With those, the individual is a
+    copy, so the evaluated individual is returned as well: its constants may
+    have been optimized and its fitness memo filled by the fitness function
+    (the memo is returned separately since it is not pickled with the
+    individual)
+
+    :param fitness_function: the fitness function of the island
+    :param indv: individual to evaluate
+    :return: fitness of the individual, the evaluated individual and its
+             fitness memo (None if it has none)
+    """
+    fitness = fitness_function(indv)
+    return fitness, indv, getattr(indv, "fitness_memo", None)
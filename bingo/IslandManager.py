@@ -7,7 +7,6 @@ after one on a single processor
 """
 
 import time
-import random
 import abc
 import pickle
 import logging
@@ -17,6 +16,14 @@ import numpy as np
 
 from .CoevolutionIsland import CoevolutionIsland as ci
 from .Island import Island
+from .RandomStreams import make_rng, spawn_seeds
+from .MigrationBuffers import exchange_buffers
+from .AsyncMigration import TOPOLOGIES, AsyncMigrator
+from .ParetoReduction import make_front_op, reduce_fronts
+from .WorkStealing import WorkStealer
+from .Checkpoint import BackgroundWriter, CompactCheckpoint, \
+    assigned_shards, data_hash, front_sections, is_compact, \
+    island_sections, npz_bytes, shard_name, write_atomic, write_training_data
 from .Plotting import print_latex, print_pareto, print_1d_best_soln
 
 LOGGER = logging.getLogger(__name__)
@@ -66,9 +73,18 @@ class IslandManager(object):
             if checkpoint_file is not None:
                 self.save_state(checkpoint_file + "_%d.p" % self.age)
 
+        self.stop_predictor_workers()
         self.do_final_plots(make_plots)
         return converged
 
+    @abc.abstractmethod
+    def stop_predictor_workers(self):
+        """
+        Stops the predictor side processes of the islands (see
+        CoevolutionIsland predictor_worker)
+        """
+        pass
+
     @abc.abstractmethod
     def do_steps(self, n_steps, **kwargs):
         """
@@ -126,17 +142,21 @@ class IslandManager(object):
         pass
 
     @staticmethod
-    def assign_send_receive(pop_size1, pop_size2):
+    def assign_send_receive(pop_size1, pop_size2, rng=None):
         """
         Assign indices for exchange through random shuffling
 
         :param pop_size: number of individuals in the populations which will be
                          exchanged (must be equal in population size)
+        :param rng: random stream used for the shuffling (None uses the global
+                    numpy random state)
         :return: the indices that each island will be swapping
         """
+        if rng is None:
+            rng = np.random
         tot_pop = pop_size1 + pop_size2
         pop_shuffle = list(range(tot_pop))
-        random.shuffle(pop_shuffle)
+        rng.shuffle(pop_shuffle)
         indvs_to_send = []
         indvs_to_receive = []
         for i, indv in enumerate(pop_shuffle):
@@ -160,20 +180,39 @@ class ParallelIslandManager(IslandManager):
     =======  ============================================================ 
     MPI_Tag  Function   
     =======  ============================================================  
-    0        average age sent from rank 0 (i.e., avg step limit exceeded)
-    2        age uptate sent to rank 0
     4        migration communications
-    6        saving state
-    7        loading state
+    5        asynchronous migration (see AsyncMigration)
     =======  ============================================================  
     """
 
-    def __init__(self, restart_file=None, *args, **kwargs):
+    def __init__(self, restart_file=None, seed=None, migration_topology=None,
+                 migration_interval=10, migration_rate=0.1,
+                 work_stealing=False, *args, **kwargs):
         """
         Initialization of island manager.  The number of islands is set by the
         number of processors in the mpi call.
 
         :param restart_file: file name from which to load the island manager
+                             (the islands are made from args and kwargs
+                             before their populations are loaded)
+        :param seed: seed (None, int or SeedSequence, see RandomStreams) from
+                     which each rank spawns independent random streams for
+                     its island and for migration
+        :param migration_topology: None (default) for synchronous migration
+                                   between random pairs of ranks in
+                                   do_migration, or the name of a topology in
+                                   AsyncMigration.TOPOLOGIES ("ring", "torus"
+                                   or "random_regular") for asynchronous
+                                   migration to the neighbors in the topology
+        :param migration_interval: number of generations between asynchronous
+                                   emigrations
+        :param migration_rate: fraction of each population sent to each
+                               neighbor at an asynchronous emigration
+        :param work_stealing: if True, ranks which finish a (blocking) block
+                              of steps early evaluate solutions for the ranks
+                              which are still working (see WorkStealing).
+                              The training data must be the same on all
+                              ranks.
         :param args: arguments to be passed to initialization of coevolution
                      islands
         :param kwargs: keyword arguments to be passed to initialization of
@@ -182,24 +221,71 @@ class ParallelIslandManager(IslandManager):
         super(ParallelIslandManager, self).__init__(*args, **kwargs)
 
         self.comm = MPI.COMM_WORLD
+        # separate communicators for the non-blocking age and convergence
+        # reductions
+        self.age_comm = self.comm.Dup()
+        self.convergence_comm = self.comm.Dup()
+        self.convergence_request = None
+        self.convergence_age = 0
+        self.best_fitness = np.full(1, np.inf)
+        self.global_best_fitness = np.full(1, np.inf)
+        self.front_true_fitness = {}
+        self.front_fitness_data = None
         self.comm_rank = self.comm.Get_rank()
         self.comm_size = self.comm.Get_size()
 
+        seeds = spawn_seeds(seed, 2*self.comm_size)
+        self.rng = make_rng(seeds[self.comm_size + self.comm_rank])
+        self.checkpoint_writer = BackgroundWriter()
+        # checkpoint whose manifest is written once all shards are written:
+        # [filename, manifest bytes (rank 0 only), barrier request]
+        self.checkpoint_comm = self.comm.Dup()
+        self.pending_checkpoint = None
+        self.isle_args = args
+        self.isle_kwargs = kwargs
+        self.isle_seed = seeds[self.comm_rank]
+
         if restart_file is None:
             # make coevolution islands
-            self.isle = ci(*args, **kwargs)
+            self.isle = ci(*args, seed=self.isle_seed, **kwargs)
 
             # make dummy island for joint pareto front calculations
             if self.comm_rank == 0:
                 self.pareto_isle = Island(
                     self.isle.solution_island.gene_manipulator,
                     self.isle.true_fitness_plus_complexity,
-                    0, 0, 0)
+                    0, 0, 0, rng=self.rng)
             else:
                 self.pareto_isle = None
         else:
             self.load_state(restart_file)
 
+        self.front_op = None
+        self.migration_interval = migration_interval
+        if migration_topology is None:
+            self.migrator = None
+        else:
+            if self.comm_rank == 0:
+                graph = TOPOLOGIES[migration_topology](self.comm_size,
+                                                       self.rng)
+            else:
+                graph = None
+            graph = self.comm.bcast(graph, root=0)
+            self.migrator = AsyncMigrator(self.comm, graph[self.comm_rank],
+                                          migration_rate)
+
+        if work_stealing:
+            self.stealer = WorkStealer(self.comm.Dup(), self.isle, self.rng)
+            self.isle.solution_island.batch_evaluator = self.stealer.evaluate
+        else:
+            self.stealer = None
+
+    def stop_predictor_workers(self):
+        """
+        Stops the predictor side process of the island of this rank
+        """
+        self.isle.stop_predictor_worker()
+
     def do_steps(self, n_steps, non_block=True, when_update=10):
         """
         Steps through generations
@@ -210,46 +296,33 @@ class ParallelIslandManager(IslandManager):
         """
         t_0 = time.time()
         if non_block:
-            # totalAge to hold rank:age, averageAge and target_age to
-            # hold when to stop, when_update for when to send/receive data
-            total_age = {}
-            average_age = self.age
+            # the average age is found with non-blocking allreduces which are
+            # started every when_update generations; all ranks see the same
+            # sums, so they stop after the same reduction
             target_age = self.age + n_steps
+            average_age = self.age
+            age_sum = np.zeros(1, dtype=np.int64)
+            my_age = np.zeros(1, dtype=np.int64)
+            reduction = None
             while average_age < target_age:
-                if self.isle.solution_island.age % when_update == 0:
-                    if self.comm_rank == 0:
-                        # update the age in totalAge for self
-                        total_age.update({0:self.isle.solution_island.age})
-                        # while there is data from any rank, receive until
-                        # last, and add the data to totalAge
-                        # TODO (gbomarito) could get flooded and never exit loop
-                        status = MPI.Status()
-                        while self.comm.iprobe(source=MPI.ANY_SOURCE, tag=2,
-                                               status=status):
-                            data = self.comm.recv(source=status.Get_source(),
-                                                  tag=2)
-                            total_age.update(data)
-                        average_age = (sum(total_age.values())) / self.comm.size
-                        # send average to all other ranks if time to stop
-                        if average_age >= n_steps:
-                            scount = 1
-                            while scount < self.comm_size:
-                                self.comm.send(average_age, dest=scount, tag=0)
-                                scount += 1
-                    # for every other rank, store rank:age, and send it off to 0
-                    else:
-                        data = {self.comm_rank:self.isle.solution_island.age}
-                        req = self.comm.isend(data, dest=0, tag=2)
-                        req.Wait()
-                # if there is a message from 0 to stop, update averageAge
-                if self.comm_rank != 0:
-                    if self.comm.iprobe(source=0, tag=0):
-                        average_age = self.comm.recv(source=0, tag=0)
+                if reduction is not None and reduction.Test():
+                    average_age = float(age_sum[0]) / self.comm_size
+                    reduction = None
+                    continue
+                if reduction is None and \
+                        self.isle.solution_island.age % when_update == 0:
+                    my_age[0] = self.isle.solution_island.age
+                    reduction = self.age_comm.Iallreduce(my_age, age_sum,
+                                                         op=MPI.SUM)
                 self.isle.generational_step()
+                self.between_generations()
                 # print_pareto(isle.solution_island.pareto_front, "front.png")
         else:
             for _ in range(n_steps):
                 self.isle.generational_step()
+                self.between_generations()
+            if self.stealer is not None:
+                self.stealer.steal_until_all_done()
         t_1 = time.time()
         LOGGER.info("%2d >\tage: %d\ttime: %.1fs\tbest fitness: %s",
                     self.comm_rank,
@@ -257,15 +330,6 @@ class ParallelIslandManager(IslandManager):
                     t_1 - t_0,
                     self.isle.solution_island.pareto_front[0].fitness)
 
-        if non_block:
-            # perform message cleanup before moving on
-            self.comm.Barrier()
-            if self.comm_rank == 0:
-                status = MPI.Status()
-                while self.comm.iprobe(source=MPI.ANY_SOURCE, tag=2,
-                                       status=status):
-                    data = self.comm.recv(source=status.Get_source(), tag=2)
-
         if np.isnan(self.isle.solution_island.pareto_front[0].fitness[0]):
             for i in self.isle.solution_island.pop:
                 LOGGER.error(str(i.fitness))
@@ -274,14 +338,37 @@ class ParallelIslandManager(IslandManager):
                              str(indv.fitness), indv.latexstring())
         self.age += n_steps
 
+    def between_generations(self):
+        """
+        Progresses the non-blocking communication between generations: merges
+        arrived immigrants and, every migration_interval generations, posts
+        emigrants to the neighbors in the migration topology (if any); tests
+        the pending convergence reduction and progresses the pending
+        checkpoint (if any)
+        """
+        if self.convergence_request is not None:
+            self.convergence_request.Test()
+        self.progress_checkpoint()
+        if self.migrator is None:
+            return
+        self.migrator.poll(self.isle)
+        if self.isle.solution_island.age % self.migration_interval == 0:
+            self.migrator.emigrate(self.isle, self.rng)
+
     def do_migration(self):
         """
-        Coordinates migration between islands
+        Coordinates migration between islands.  With a migration topology
+        this only merges the immigrants which have arrived; emigrants are
+        posted during do_steps.
         """
+        if self.migrator is not None:
+            self.migrator.poll(self.isle)
+            return
+
         # assign partners
         if self.comm_rank == 0:
             partners = list(range(self.comm_size))
-            random.shuffle(partners)
+            self.rng.shuffle(partners)
         else:
             partners = None
         partners = self.comm.bcast(partners, root=0)
@@ -303,13 +390,13 @@ class ParallelIslandManager(IslandManager):
                 s_send, partner_s_send = \
                     IslandManager.assign_send_receive(
                         len(self.isle.solution_island.pop),
-                        partner_s_pop_size)
+                        partner_s_pop_size, self.rng)
                 p_send, partner_p_send = \
                     IslandManager.assign_send_receive(
                         len(self.isle.predictor_island.pop),
-                        partner_p_pop_size)
+                        partner_p_pop_size, self.rng)
                 t_send, partner_t_send = IslandManager.assign_send_receive(
-                    len(self.isle.trainers), partner_t_pop_size)
+                    len(self.isle.trainers), partner_t_pop_size, self.rng)
                 LOGGER.debug("Migration: %2d <-> %2d  mixing = %s",
                              self.comm_rank,
                              my_partner,
@@ -335,13 +422,130 @@ class ParallelIslandManager(IslandManager):
 
         # exchange populations
         if my_partner is not None:
-            send_package = self.isle.dump_populations(s_send, p_send, t_send,
+            send_buffers = self.isle.pack_populations(s_send, p_send, t_send,
                                                       with_removal=True)
-            recv_package = self.comm.sendrecv(send_package, my_partner,
-                                              sendtag=4,
-                                              source=my_partner, recvtag=4)
-            self.isle.load_populations(recv_package, replace=False)
+            recv_buffers = exchange_buffers(self.comm, send_buffers,
+                                            my_partner, tag=4)
+            self.isle.unpack_populations(*recv_buffers, replace=False)
+
+
+    def run_islands(self, max_steps, epsilon, min_steps=0,
+                    step_increment=1000, make_plots=True,
+                    checkpoint_file=None, overlap_convergence=False,
+                    **do_steps_kwargs):
+        """
+        Runs co-evolution islands until convergence of best solution.  See
+        IslandManager.run_islands for the parameters.
+
+        :param overlap_convergence: default (False) value results in a
+                                    blocking test_convergence after every
+                                    block of steps.  True value results in
+                                    the convergence test of a block of steps
+                                    running (as a non-blocking reduction of
+                                    the best true fitness of each rank)
+                                    during the next block of steps, so that
+                                    convergence is detected one block later
+                                    but the islands are not stalled (the
+                                    fronts of the ranks are only merged, in
+                                    a blocking reduction, for checkpoints).
+        :return converged: whether a converged solution has been found
+        """
+        if not overlap_convergence:
+            return super(ParallelIslandManager, self).run_islands(
+                max_steps, epsilon, min_steps, step_increment, make_plots,
+                checkpoint_file, **do_steps_kwargs)
+
+        self.start_time = time.time()
+        converged = False
+        while True:
+            self.do_steps(n_steps=step_increment, **do_steps_kwargs)
+            if self.convergence_request is not None:
+                converged = self.finish_convergence_test(epsilon)
+            self.start_convergence_test()
+            if checkpoint_file is not None:
+                # the checkpoint holds the joint front, which is otherwise
+                # only merged by the final test_convergence
+                self.merge_pareto_fronts()
+                self.save_state(checkpoint_file + "_%d.p" % self.age)
+            if not (self.age < min_steps or
+                    (self.age < max_steps and not converged)):
+                break
+            self.do_migration()
+        converged = self.finish_convergence_test(epsilon) or converged
+        self.stop_predictor_workers()
+
+        converged = self.test_convergence(epsilon, make_plots) or converged
+        self.do_final_plots(make_plots)
+        return converged
+
+    def start_convergence_test(self):
+        """
+        Evaluates the true fitness of the pareto front of this rank and starts
+        a non-blocking reduction of the best true fitness of all ranks.  Only
+        the members of the front which were not in the front at the previous
+        test are evaluated; the true fitness of the others is kept (with the
+        individuals, so that their ids stay unique) as long as the training
+        data is the same
+        """
+        if self.front_fitness_data is not self.isle.solution_training_data:
+            self.front_fitness_data = self.isle.solution_training_data
+            self.front_true_fitness = {}
+        front_true_fitness = {}
+        best = np.inf
+        for indv in self.isle.solution_island.pareto_front:
+            cached_indv, fitness = self.front_true_fitness.get(id(indv),
+                                                               (None, None))
+            if cached_indv is not indv:
+                fitness = self.isle.solution_fitness_true(indv.copy())
+            front_true_fitness[id(indv)] = (indv, fitness)
+            if fitness < best:
+                best = fitness
+        self.front_true_fitness = front_true_fitness
+        self.best_fitness[0] = best
+        self.convergence_age = self.age
+        self.convergence_request = self.convergence_comm.Iallreduce(
+            self.best_fitness, self.global_best_fitness, op=MPI.MIN)
+
+    def finish_convergence_test(self, epsilon):
+        """
+        Completes the pending convergence reduction (if any)
+
+        :param epsilon: error which defines convergence
+        :return: boolean for whether convergence has been reached
+        """
+        if self.convergence_request is None:
+            return False
+        self.convergence_request.Wait()
+        self.convergence_request = None
+        best = self.global_best_fitness[0]
+        if self.comm_rank == 0:
+            LOGGER.info("best true fitness at age %d: %s",
+                        self.convergence_age, str(best))
+            with open("log.txt", "a") as o_file:
+                o_file.write("%d\t" % self.convergence_age)
+                o_file.write("%le\t" % (time.time() - self.start_time))
+                o_file.write("%e\n" % best)
+        return best < epsilon
 
+    def merge_pareto_fronts(self):
+        """
+        Merges the pareto fronts of all ranks into the joint pareto front
+        (the front of the pareto island of rank 0)
+        """
+        # true fitness of the front is evaluated on each rank and the fronts
+        # are merged (with their fitness) in a reduction tree
+        front = [indv.copy() for indv in self.isle.solution_island.pareto_front]
+        fitness = [self.isle.true_fitness_plus_complexity(indv)
+                   for indv in front]
+        manipulator = self.isle.solution_island.gene_manipulator
+        if self.front_op is None:
+            self.front_op = make_front_op(manipulator)
+        merged = reduce_fronts(self.comm, manipulator, front, fitness,
+                               self.front_op)
+        if self.comm_rank == 0:
+            self.pareto_isle.add_individuals(
+                list(self.pareto_isle.pareto_front) + merged)
+            self.pareto_isle.update_pareto_front()
 
     def test_convergence(self, epsilon, make_plots):
         """
@@ -351,18 +555,10 @@ class ParallelIslandManager(IslandManager):
         :param make_plots: boolean for whether to produce plots
         :return: boolean for whether convergence has been reached
         """
-        # gather all pareto fronts
-        par_list = self.isle.solution_island.dump_pareto()
-        par_list = self.comm.gather(par_list, root=0)
+        self.merge_pareto_fronts()
 
         # test combined pareto front for convergence
         if self.comm_rank == 0:
-            tmp_par_list = self.pareto_isle.dump_pareto()
-            for par in par_list:
-                tmp_par_list += par
-            par_list = tmp_par_list
-            self.pareto_isle.load_population(par_list)
-            self.pareto_isle.update_pareto_front()
             converged = (self.pareto_isle.pareto_front[0].fitness[0] < epsilon)
 
             # output
@@ -401,6 +597,10 @@ class ParallelIslandManager(IslandManager):
 
         :param make_plots: boolean for whether to produce plots
         """
+        if self.migrator is not None:
+            self.migrator.finish(self.isle)
+        self.wait_for_checkpoint()
+
         # gather all populations to a single island
         s_pop, p_pop, t_pop = self.isle.dump_populations()
         s_pop = self.comm.gather(s_pop, root=0)
@@ -408,14 +608,14 @@ class ParallelIslandManager(IslandManager):
         t_pop = self.comm.gather(t_pop, root=0)
         if self.comm_rank == 0:
             s_pop[0] = s_pop[0] + self.pareto_isle.dump_pareto()
-            # temp_isle = copy.deepcopy(self.isle)
-            # ^ deep copy has problem with non serializable AGraph
-            # ^ shallow copy adds all the temp populations to the real islands
+            # a new island rather than a deep copy, which would also copy the
+            # training data (a shallow copy adds all the temp populations to
+            # the real islands)
             temp_isle = ci(self.isle.solution_training_data,
                            self.isle.solution_island.gene_manipulator,
                            self.isle.predictor_island.gene_manipulator,
                            self.isle.fitness_metric,
-                           trainer_pop_size=1)
+                           trainer_pop_size=1, seed=self.rng)
             temp_isle.load_populations((s_pop[0], p_pop[0], t_pop[0]))
 
             # find true pareto front
@@ -447,46 +647,131 @@ class ParallelIslandManager(IslandManager):
 
     def save_state(self, filename):
         """
-        Currently this relies on everything being serializable and small
-        enough to fit in memory on 1 proc
+        Saves a sharded compact checkpoint: each rank writes its island to
+        its own shard file in a background thread and rank 0 writes the
+        manifest once the shards of all ranks are written (see
+        progress_checkpoint and Checkpoint).  The ranks share the training
+        data, which is written by rank 0 only.
 
-        :param filename: full name of file to save pickle
+        :param filename: full name of the checkpoint (manifest) file
         """
-
+        self.progress_checkpoint(block=True)
         if self.comm_rank == 0:
-            isles = [self.isle, ]
-            for i in range(1, self.comm_size):
-                isles.append(self.comm.recv(source=i, tag=6))
-
-            with open(filename, "wb") as out_file:
-                pickle.dump((isles, self.pareto_isle, self.age), out_file)
+            content_hash = write_training_data(
+                filename, self.isle.solution_training_data)
         else:
-            self.comm.send(self.isle, dest=0, tag=6)
+            content_hash = data_hash(self.isle.solution_training_data)
+        self.checkpoint_writer.write(
+            shard_name(filename, self.comm_rank),
+            npz_bytes(island_sections(self.isle, 0, content_hash)))
+        manifest = None
+        if self.comm_rank == 0:
+            sections = front_sections(
+                self.isle.solution_island.gene_manipulator,
+                self.pareto_isle.pareto_front)
+            manifest = npz_bytes(dict(sections, age=self.age,
+                                      n_shards=self.comm_size))
+        self.pending_checkpoint = [filename, manifest, None]
+
+    def progress_checkpoint(self, block=False):
+        """
+        Progresses the pending checkpoint (if any): once the shard of this
+        rank is written, a non-blocking barrier is entered; once all ranks
+        have entered it, rank 0 writes the manifest (in the background)
+
+        :param block: wait until the manifest write is started
+        """
+        if self.pending_checkpoint is None:
+            return
+        filename, manifest, barrier = self.pending_checkpoint
+        if barrier is None:
+            if not block and self.checkpoint_writer.busy():
+                return
+            self.checkpoint_writer.wait()
+            barrier = self.checkpoint_comm.Ibarrier()
+            self.pending_checkpoint[2] = barrier
+        if block:
+            barrier.Wait()
+        elif not barrier.Test():
+            return
+        if manifest is not None:
+            self.checkpoint_writer.write(filename, manifest)
+        self.pending_checkpoint = None
+
+    def wait_for_checkpoint(self):
+        """
+        Waits for the pending checkpoint to be written completely (all ranks
+        must call it)
+        """
+        self.progress_checkpoint(block=True)
+        self.checkpoint_writer.wait()
 
     def load_state(self, filename):
         """
-        Currently this relies on everything being serializable and small
-        enough to fit in memory on 1 proc
+        Loads a checkpoint; all ranks read the manifest and their shards in
+        parallel.  The number of ranks may differ from the number of shards
+        (see Checkpoint.assigned_shards).  The island of this rank is made
+        from the arguments of the island manager before the shards are
+        loaded into it.  Combined shards are cut back to the population sizes
+        of the island manager, and an island copied from another rank's
+        shard is mixed with new solutions.  Checkpoints pickled to a single
+        file by earlier versions are loaded as well.
+
+        :param filename: full name of the checkpoint (manifest) file
+        """
+        if not is_compact(filename):
+            self.load_pickled_state(filename)
+            return
+
+        with CompactCheckpoint(filename) as manifest:
+            shards, copy = assigned_shards(int(manifest["n_shards"]),
+                                           self.comm_rank, self.comm_size)
+            self.age = int(manifest["age"])
+            self.isle = ci(*self.isle_args, seed=self.isle_seed,
+                           **self.isle_kwargs)
+            sizes = (self.isle.solution_island.target_pop_size,
+                     self.isle.predictor_island.target_pop_size,
+                     len(self.isle.trainers))
+            new_solutions = list(self.isle.solution_island.pop)
+            for i, shard in enumerate(shards):
+                with CompactCheckpoint(shard_name(filename, shard)) as \
+                        shard_file:
+                    shard_file.restore_island(self.isle, 0, replace=i == 0)
+            if copy:
+                # a copied island is diversified with the new solutions of
+                # this rank, so that it doesn't repeat the original
+                self.isle.solution_island.add_individuals(new_solutions,
+                                                          replace=False)
+            if copy or len(shards) > 1:
+                self.isle.trim_populations(*sizes)
 
-        :param filename: full name of file to load pickle
+            if self.comm_rank == 0:
+                self.pareto_isle = Island(
+                    self.isle.solution_island.gene_manipulator,
+                    self.isle.true_fitness_plus_complexity,
+                    0, 0, 0, rng=self.rng)
+                self.pareto_isle.add_individuals(manifest.pareto_front(
+                    self.isle.solution_island.gene_manipulator))
+                # restored as the front (not only as the population)
+                if self.pareto_isle.pop:
+                    self.pareto_isle.update_pareto_front()
+            else:
+                self.pareto_isle = None
+
+    def load_pickled_state(self, filename):
         """
+        Loads a checkpoint pickled by earlier versions: a tuple of the
+        islands of all ranks, the pareto island and the age
 
-        if self.comm_rank == 0:
-            with open(filename, "rb") as in_file:
-                isles, pareto, age = pickle.load(in_file)
-
-            self.isle = isles[0]
-            self.age = age
-            self.pareto_isle = pareto
-            for i in range(1, self.comm_size):
-                if i < len(isles):
-                    isle_to_send = isles[i]
-                else:
-                    isle_to_send = random.choice(isles)
-                self.comm.send((isle_to_send, age), dest=i, tag=7)
-        else:
-            self.pareto_isle = None
-            self.isle, self.age = self.comm.recv(source=0, tag=7)
+        :param filename: full name of the checkpoint file
+        """
+        with open(filename, "rb") as in_file:
+            isles, pareto_isle, self.age = pickle.load(in_file)
+        self.isle = isles[self.comm_rank % len(isles)]
+        if self.comm_rank >= len(isles):
+            # a copied island must not repeat the evolution of the original
+            self.isle.reseed(self.rng)
+        self.pareto_isle = pareto_isle if self.comm_rank == 0 else None
 
 
 class SerialIslandManager(IslandManager):
@@ -496,13 +781,19 @@ class SerialIslandManager(IslandManager):
     operations in serial
     """
 
-    def __init__(self, n_islands=2, restart_file=None,
+    def __init__(self, n_islands=2, restart_file=None, seed=None,
                  *args, **kwargs):
         """
         Initialization of serial island manager.
 
         :param n_islands: number of coevolution islands to be managed
         :param restart_file: file name from which to load the island manager
+                             (the islands are made from args and kwargs
+                             before their populations are loaded)
+        :param seed: seed (None, int or SeedSequence, see RandomStreams) from
+                     which independent random streams are spawned for each
+                     island and for migration.  A seeded run is
+                     bit-reproducible
         :param args: arguments to be passed to initialization of coevolution
                      islands
         :param kwargs: keyword arguments to be passed to initialization of
@@ -510,22 +801,34 @@ class SerialIslandManager(IslandManager):
         """
         super(SerialIslandManager, self).__init__(*args, **kwargs)
 
+        seeds = spawn_seeds(seed, n_islands + 1)
+        self.rng = make_rng(seeds[-1])
+        self.isle_args = args
+        self.isle_kwargs = kwargs
+
         if restart_file is None:
             self.n_isles = n_islands
 
             # make coevolution islands
             self.isles = []
-            for _ in range(self.n_isles):
-                self.isles.append(ci(*args, **kwargs))
+            for isle_seed in seeds[:-1]:
+                self.isles.append(ci(*args, seed=isle_seed, **kwargs))
 
             # make dummy island for joint pareto front calculations
             self.pareto_isle = Island(
                 self.isles[0].solution_island.gene_manipulator,
                 self.isles[0].true_fitness_plus_complexity,
-                0, 0, 0)
+                0, 0, 0, rng=self.rng)
         else:
             self.load_state(restart_file)
 
+    def stop_predictor_workers(self):
+        """
+        Stops the predictor side processes of the islands
+        """
+        for isle in self.isles:
+            isle.stop_predictor_worker()
+
     def do_steps(self, n_steps):
         """
         Steps through generations
@@ -553,7 +856,7 @@ class SerialIslandManager(IslandManager):
         """
         # assign partners
         partners = list(range(self.n_isles))
-        random.shuffle(partners)
+        self.rng.shuffle(partners)
 
         # loop over partner pairs
         for i in range(self.n_isles//2):
@@ -563,13 +866,13 @@ class SerialIslandManager(IslandManager):
             # figure out which individuals will be sent/received from partner 1
             s_to_2, s_to_1 = IslandManager.assign_send_receive(
                 len(partner_1.solution_island.pop),
-                len(partner_2.solution_island.pop))
+                len(partner_2.solution_island.pop), self.rng)
             p_to_2, p_to_1 = IslandManager.assign_send_receive(
                 len(partner_1.predictor_island.pop),
-                len(partner_2.predictor_island.pop))
+                len(partner_2.predictor_island.pop), self.rng)
             t_to_2, t_to_1 = IslandManager.assign_send_receive(
                 len(partner_1.trainers),
-                len(partner_2.trainers))
+                len(partner_2.trainers), self.rng)
             LOGGER.debug("Migration: %2d <-> %2d  mixing = %s",
                          partners[i*2],
                          partners[i*2+1],
@@ -652,14 +955,14 @@ class SerialIslandManager(IslandManager):
         s_pop = s_pop + self.pareto_isle.dump_population()
 
         # load them all into a temporary island
-        # temp_isle = copy.deepcopy(self.isles[0])
-        # ^ deep copy has problem with non serializable AGraph
-        # ^ shallow copy adds all the temp populations to the real islands
+        # (a new island rather than a deep copy, which would also copy the
+        # training data; a shallow copy adds all the temp populations to the
+        # real islands)
         temp_isle = ci(self.isles[0].solution_training_data,
                        self.isles[0].solution_island.gene_manipulator,
                        self.isles[0].predictor_island.gene_manipulator,
                        self.isles[0].fitness_metric,
-                       trainer_pop_size=1)
+                       trainer_pop_size=1, seed=self.rng)
         temp_isle.load_populations((s_pop, p_pop, t_pop))
         temp_isle.use_true_fitness()
         temp_isle.solution_island.update_pareto_front()
@@ -685,20 +988,51 @@ class SerialIslandManager(IslandManager):
 
     def save_state(self, filename):
         """
-        currently this relies on everything being serializable
+        Saves a compact checkpoint of all of the islands (see Checkpoint).
+        Training data which is shared by the islands is stored once.
 
-        :param filename: full name of file to save pickle
+        :param filename: full name of the checkpoint file
         """
-
-        with open(filename, "wb") as out_file:
-            pickle.dump((self.isles, self.pareto_isle, self.age), out_file)
+        sections = front_sections(
+            self.isles[0].solution_island.gene_manipulator,
+            self.pareto_isle.pareto_front)
+        for i, isle in enumerate(self.isles):
+            content_hash = write_training_data(filename,
+                                               isle.solution_training_data)
+            sections.update(island_sections(isle, i, content_hash))
+        write_atomic(filename, npz_bytes(dict(sections, age=self.age)))
 
     def load_state(self, filename):
         """
-        currently this relies on everything being serializable
+        Loads a checkpoint.  The islands are made from the arguments of the
+        island manager before the checkpoint is loaded into them.
+        Checkpoints pickled by earlier versions are loaded as well.
 
-        :param filename: full name of file to load pickle
+        :param filename: full name of the checkpoint file
         """
+        if not is_compact(filename):
+            with open(filename, "rb") as in_file:
+                self.isles, self.pareto_isle, self.age = pickle.load(in_file)
+            self.n_isles = len(self.isles)
+            return
 
-        with open(filename, "rb") as in_file:
-            self.isles, self.pareto_isle, self.age = pickle.load(in_file)
+        with CompactCheckpoint(filename) as checkpoint:
+            self.age = int(checkpoint["age"])
+            self.n_isles = checkpoint.n_islands
+            self.isles = []
+            for i, isle_seed in enumerate(spawn_seeds(self.rng,
+                                                      self.n_isles)):
+                isle = ci(*self.isle_args, seed=isle_seed,
+                          **self.isle_kwargs)
+                checkpoint.restore_island(isle, i)
+                self.isles.append(isle)
+
+            self.pareto_isle = Island(
+                self.isles[0].solution_island.gene_manipulator,
+                self.isles[0].true_fitness_plus_complexity,
+                0, 0, 0, rng=self.rng)
+            self.pareto_isle.add_individuals(checkpoint.pareto_front(
+                self.isles[0].solution_island.gene_manipulator))
+            # restored as the front (not only as the population)
+            if self.pareto_isle.pop:
+                self.pareto_isle.update_pareto_front()
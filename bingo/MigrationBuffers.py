@@ -0,0 +1,140 @@
+"""
+This module contains the compact wire format used for migration between mpi
+ranks.  Rather than pickling lists of individuals, gene manipulators pack
+individuals into a few numpy arrays (e.g., opcodes and parameters, constants
+with offsets, and ages), which are concatenated into one contiguous integer
+buffer and one contiguous float buffer.  The buffers are exchanged with the
+buffer-based (uppercase) mpi calls.
+"""
+import numpy as np
+
+
+def pack_arrays(arrays, dtype):
+    """
+    Concatenates arrays into a single 1d buffer with a header describing their
+    shapes
+
+    :param arrays: list of numpy arrays
+    :param dtype: dtype of the buffer (np.int64 or np.float64)
+    :return: 1d numpy array: [n_arrays, ndim_0, shape_0..., ndim_1, ...,
+             data_0..., data_1...]
+    """
+    header = [len(arrays)]
+    for array in arrays:
+        header.append(np.ndim(array))
+        header.extend(np.shape(array))
+    header = np.array(header, dtype=np.int64)
+    if dtype != np.int64:
+        header = header.astype(dtype)
+    return np.concatenate([header] +
+                          [np.ravel(array).astype(dtype) for array in arrays])
+
+
+def unpack_arrays(buffer):
+    """
+    Splits a buffer made by pack_arrays into its arrays
+
+    :param buffer: 1d numpy array
+    :return: list of numpy arrays (views of the buffer)
+    """
+    n_arrays = int(buffer[0])
+    loc = 1
+    shapes = []
+    for _ in range(n_arrays):
+        ndim = int(buffer[loc])
+        shapes.append(tuple(int(dim) for dim in buffer[loc + 1:loc + 1 + ndim]))
+        loc += 1 + ndim
+    arrays = []
+    for shape in shapes:
+        size = int(np.prod(shape, dtype=np.int64))
+        arrays.append(buffer[loc:loc + size].reshape(shape))
+        loc += size
+    return arrays
+
+
+def pack_buffers(int_arrays, float_arrays):
+    """
+    Packs lists of integer and float arrays
+
+    :param int_arrays: list of integer numpy arrays
+    :param float_arrays: list of float numpy arrays
+    :return: integer buffer, float buffer
+    """
+    return pack_arrays(int_arrays, np.int64), \
+        pack_arrays(float_arrays, np.float64)
+
+
+def unpack_buffers(int_buffer, float_buffer):
+    """
+    Unpacks the buffers made by pack_buffers
+
+    :return: list of integer arrays, list of float arrays
+    """
+    return unpack_arrays(int_buffer), unpack_arrays(float_buffer)
+
+
+def pack_individuals(indvs, commands, command_lengths):
+    """
+    Packs the parts of acyclic graph individuals which are common to AGraph
+    and AGraphCpp
+
+    :param indvs: list of individuals
+    :param commands: (n_commands, 3) integer array of the commands of all of
+                     the individuals
+    :param command_lengths: number of commands of each individual
+    :return: list of integer arrays (commands, command offsets, constant
+             offsets, genetic ages), list of float arrays (constants)
+    """
+    constants = [np.asarray(indv.constants, dtype=np.float64).ravel()
+                 for indv in indvs]
+    constant_offsets = np.cumsum([0] + [len(c) for c in constants])
+    command_offsets = np.cumsum([0] + list(command_lengths))
+    ages = np.array([indv.genetic_age for indv in indvs], dtype=np.int64)
+    if len(constants) > 0:
+        constants = np.concatenate(constants)
+    else:
+        constants = np.empty(0)
+    return [commands.reshape((-1, 3)), command_offsets, constant_offsets,
+            ages], [constants]
+
+
+def unpack_individuals(int_arrays, float_arrays):
+    """
+    Unpacks the arrays made by pack_individuals
+
+    :param int_arrays: list of integer arrays
+    :param float_arrays: list of float arrays
+    :return: generator of (commands, constants, genetic age) for each
+             individual; commands is an integer array, constants a list
+    """
+    commands, command_offsets, constant_offsets, ages = int_arrays
+    constants = float_arrays[0]
+    for i, age in enumerate(ages.tolist()):
+        yield (commands[command_offsets[i]:command_offsets[i + 1]],
+               constants[constant_offsets[i]:constant_offsets[i + 1]].tolist(),
+               age)
+
+
+def exchange_buffers(comm, buffers, partner, tag):
+    """
+    Exchanges numpy buffers with a partner rank using Sendrecv.  The sizes of
+    the buffers are exchanged first so that the receive buffers can be
+    allocated
+
+    :param comm: mpi communicator
+    :param buffers: list of 1d numpy arrays which are sent
+    :param partner: rank of the partner
+    :param tag: mpi tag of the messages
+    :return: list of the received 1d numpy arrays (same dtypes as buffers)
+    """
+    sizes = np.array([len(buffer) for buffer in buffers], dtype=np.int64)
+    recv_sizes = np.empty_like(sizes)
+    comm.Sendrecv(sizes, dest=partner, sendtag=tag,
+                  recvbuf=recv_sizes, source=partner, recvtag=tag)
+    received = []
+    for buffer, size in zip(buffers, recv_sizes):
+        recv_buffer = np.empty(size, dtype=buffer.dtype)
+        comm.Sendrecv(buffer, dest=partner, sendtag=tag,
+                      recvbuf=recv_buffer, source=partner, recvtag=tag)
+        received.append(recv_buffer)
+    return received
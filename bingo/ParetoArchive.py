@@ -0,0 +1,83 @@
+"""
+This module contains a sorted archive of non-dominated individuals for
+2-objective (e.g. fitness, complexity) pareto fronts.  Candidates are inserted
+by binary search so that maintaining the front costs O(log F) comparisons per
+candidate instead of comparisons with every member of the front.
+"""
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+
+class ParetoArchive(object):
+    """
+    Archive of the non-dominated individuals in 2 minimized objectives.  The
+    members are kept sorted by increasing first objective (and therefore
+    strictly decreasing second objective).  An individual which is no worse
+    than another in both objectives dominates it; of two individuals with equal
+    objectives only the one inserted first is kept.
+    """
+
+    def __init__(self):
+        self.members = []
+        self.first = []
+        self.second = []
+
+    def __len__(self):
+        return len(self.members)
+
+    def clear(self):
+        """removes all members of the archive (in place)"""
+        del self.members[:]
+        del self.first[:]
+        del self.second[:]
+
+    def insert(self, indv):
+        """
+        Inserts an individual into the archive if it is not dominated by (or
+        similar to) any member, removing the members which it dominates.
+
+        :param indv: individual with a 2-objective fitness
+        :return: whether the individual was added to the archive
+        """
+        f_1, f_2 = indv.fitness
+        if np.isnan(f_1) or np.isnan(f_2):
+            return False
+
+        # the member with the lowest second objective among those with first
+        # objective <= f_1 is the only one which can dominate indv
+        loc = bisect_right(self.first, f_1)
+        if loc > 0 and self.second[loc - 1] <= f_2:
+            return False
+
+        # members dominated by indv are a contiguous run starting at loc
+        start = bisect_left(self.first, f_1)
+        end = start
+        while end < len(self.second) and self.second[end] >= f_2:
+            end += 1
+        self.members[start:end] = [indv]
+        self.first[start:end] = [f_1]
+        self.second[start:end] = [f_2]
+        return True
+
+    def is_current(self):
+        """
+        Checks whether the objectives stored for the members still match their
+        fitness (it may change e.g. with a new fitness predictor)
+
+        :return: True if all members are evaluated and unchanged
+        """
+        for indv, f_1, f_2 in zip(self.members, self.first, self.second):
+            if indv.fit_set is False or tuple(indv.fitness) != (f_1, f_2):
+                return False
+        return True
+
+    def rebuild(self, indvs):
+        """
+        Rebuilds the archive from a list of (evaluated) individuals
+
+        :param indvs: list of individuals
+        """
+        indvs = list(indvs)
+        self.clear()
+        for indv in indvs:
+            self.insert(indv)
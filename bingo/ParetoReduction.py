@@ -0,0 +1,109 @@
+"""
+This module contains the distributed reduction of the 2-objective (fitness,
+complexity) pareto fronts of the islands of a ParallelIslandManager.  Each
+rank evaluates the true fitness of its own front and encodes the front,
+together with its fitness, into a compact float buffer (see
+MigrationBuffers).  The fronts are merged pairwise by a custom mpi reduction
+operator, so that the merge is done in a tree rather than all on the root.
+
+Since mpi reductions work on buffers of equal size on all ranks, the buffers
+are padded to the total size of the encoded fronts of all ranks, which bounds
+the size of any merged front.
+"""
+from mpi4py import MPI
+import numpy as np
+
+from .MigrationBuffers import pack_buffers, unpack_buffers
+from .ParetoArchive import ParetoArchive
+
+
+def encode_front(manipulator, indvs, fitness):
+    """
+    Encodes individuals and their fitness into a float buffer
+
+    :param manipulator: gene manipulator of the individuals
+    :param indvs: list of individuals
+    :param fitness: (len(indvs), 2) array of the fitness of the individuals
+    :return: 1d float64 array: [used length, int buffer length, int buffer,
+             float buffer]
+    """
+    int_arrays, float_arrays = manipulator.pack(indvs)
+    int_buffer, float_buffer = pack_buffers(
+        int_arrays,
+        float_arrays + [np.asarray(fitness, dtype=np.float64).reshape(-1, 2)])
+    return np.concatenate([[2 + len(int_buffer) + len(float_buffer),
+                            len(int_buffer)], int_buffer, float_buffer])
+
+
+def decode_front(manipulator, buffer):
+    """
+    Decodes a buffer made by encode_front (trailing padding is ignored)
+
+    :param manipulator: gene manipulator of the individuals
+    :param buffer: 1d float64 array
+    :return: list of individuals, with their fitness set
+    """
+    used, n_ints = int(buffer[0]), int(buffer[1])
+    int_arrays, float_arrays = unpack_buffers(
+        buffer[2:2 + n_ints].astype(np.int64), buffer[2 + n_ints:used])
+    fitness = float_arrays.pop()
+    indvs = manipulator.unpack(int_arrays, float_arrays)
+    for indv, fit in zip(indvs, fitness.tolist()):
+        indv.fitness = tuple(fit)
+        indv.fit_set = True
+    return indvs
+
+
+def merge_fronts(indvs):
+    """
+    Non-dominated individuals (individuals earlier in the list win ties)
+
+    :param indvs: list of individuals with 2-objective fitness
+    :return: list of the non-dominated individuals, sorted by fitness
+    """
+    archive = ParetoArchive()
+    archive.rebuild(indvs)
+    return archive.members
+
+
+def make_front_op(manipulator):
+    """
+    Makes the mpi reduction operator which merges two encoded fronts
+
+    :param manipulator: gene manipulator of the individuals
+    :return: MPI.Op (non-commutative: fronts of lower ranks win ties)
+    """
+    def merge_encoded(in_buffer, inout_buffer, datatype):
+        """inout = merge(in, inout) of encoded fronts"""
+        front_in = np.frombuffer(in_buffer, dtype=np.float64)
+        front_inout = np.frombuffer(inout_buffer, dtype=np.float64)
+        merged = merge_fronts(decode_front(manipulator, front_in) +
+                              decode_front(manipulator, front_inout))
+        encoded = encode_front(manipulator, merged,
+                               [indv.fitness for indv in merged])
+        front_inout[:len(encoded)] = encoded
+    return MPI.Op.Create(merge_encoded, commute=False)
+
+
+def reduce_fronts(comm, manipulator, indvs, fitness, op, root=0):
+    """
+    Merges the pareto fronts of all ranks on the root rank
+
+    :param comm: mpi communicator
+    :param manipulator: gene manipulator of the individuals
+    :param indvs: list of the individuals of the front of this rank
+    :param fitness: (len(indvs), 2) array of their fitness
+    :param op: operator made by make_front_op
+    :param root: rank which receives the merged front
+    :return: list of the individuals of the merged front (with fitness) on
+             the root, None on other ranks
+    """
+    encoded = encode_front(manipulator, indvs, fitness)
+    capacity = comm.allreduce(len(encoded), op=MPI.SUM)
+    send_buffer = np.zeros(capacity)
+    send_buffer[:len(encoded)] = encoded
+    recv_buffer = np.zeros(capacity) if comm.Get_rank() == root else None
+    comm.Reduce(send_buffer, recv_buffer, op=op, root=root)
+    if comm.Get_rank() != root:
+        return None
+    return decode_front(manipulator, recv_buffer)
@@ -0,0 +1,121 @@
+"""
+This module contains the random number streams used by islands, gene
+manipulators, fitness metrics and island managers.  Each island owns a stream
+(a numpy Generator) seeded from its own branch of a SeedSequence, so that
+islands (and mpi ranks) draw independent numbers.  Scalar draws, which are
+common in the hot loops of evolution, are served from buffers which are
+refilled in bulk.
+
+Reproducibility: a serial run (e.g., SerialIslandManager or islands which are
+stepped in a fixed order) which is given a seed is bit-reproducible for the
+same versions of numpy and scipy.  Evaluation in an executor, predictor
+worker processes and the order of messages in parallel runs are not covered.
+With no seed, streams are seeded from the global numpy random state, so that
+np.random.seed still makes runs repeatable.
+"""
+import numpy as np
+
+BUFFER_SIZE = 1024
+
+
+def seed_sequence(seed=None):
+    """
+    Makes a SeedSequence from a seed
+
+    :param seed: None (seeded from the global numpy random state), int,
+                 SeedSequence or numpy Generator
+    :return: SeedSequence
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, RandomStream):
+        seed = seed.generator
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2**63, size=4))
+    if seed is None:
+        return np.random.SeedSequence(
+            np.random.randint(2**63, size=4, dtype=np.int64).tolist())
+    return np.random.SeedSequence(seed)
+
+
+def spawn_seeds(seed, n_seeds):
+    """
+    Independent child seeds (e.g., one per island or per mpi rank)
+
+    :param seed: see seed_sequence
+    :param n_seeds: number of child seeds
+    :return: list of SeedSequence
+    """
+    return seed_sequence(seed).spawn(n_seeds)
+
+
+def make_rng(rng=None):
+    """
+    Makes a random stream
+
+    :param rng: RandomStream (returned as is), numpy Generator (wrapped) or
+                a seed (see seed_sequence)
+    :return: RandomStream
+    """
+    if isinstance(rng, RandomStream):
+        return rng
+    if isinstance(rng, np.random.Generator):
+        return RandomStream(rng)
+    return RandomStream(np.random.default_rng(seed_sequence(rng)))
+
+
+class RandomStream(object):
+    """
+    Random number stream with the interface of a numpy Generator (random,
+    integers, choice, uniform, shuffle).  Array draws come from the generator
+    directly; scalar draws of random, integers and choice are taken from a
+    buffer of uniform numbers drawn BUFFER_SIZE at a time.
+
+    :param generator: numpy Generator
+    :param buffer_size: number of uniform numbers drawn per refill
+    """
+    def __init__(self, generator, buffer_size=BUFFER_SIZE):
+        self.generator = generator
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def random(self, size=None):
+        """uniform number(s) in [0, 1)"""
+        if size is not None:
+            return self.generator.random(size)
+        if not self.buffer:
+            self.buffer = self.generator.random(self.buffer_size).tolist()
+        return self.buffer.pop()
+
+    def integers(self, low, high=None, size=None):
+        """
+        random integer(s) in [low, high), or [0, low) if high is None
+        """
+        if size is not None:
+            return self.generator.integers(low, high, size)
+        if high is None:
+            low, high = 0, low
+        return min(low + int(self.random() * (high - low)), high - 1)
+
+    def choice(self, a, size=None, replace=True):
+        """
+        random element(s) of a sequence (or of range(a) for an int a)
+        """
+        if size is not None:
+            return self.generator.choice(a, size, replace)
+        if isinstance(a, int):
+            return self.integers(a)
+        return a[self.integers(len(a))]
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        """uniform number(s) in [low, high)"""
+        return self.generator.uniform(low, high, size)
+
+    def shuffle(self, x):
+        """shuffles a list or array in place"""
+        self.generator.shuffle(x)
+
+    def sample(self, population, k):
+        """k distinct random elements of a sequence"""
+        return [population[i] for i in
+                self.generator.choice(len(population), k, replace=False)]
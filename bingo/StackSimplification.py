@@ -0,0 +1,95 @@
+"""
+This module contains the algebraic simplification of acyclic graph stacks
+which is shared by the AGraph and AGraphCpp representations.  Stacks are
+described by a neutral list of commands (name, param1, param2) using the names
+in AGraphCpp.COMMAND_PRINT_MAP ("X" loads a column of x, "C" loads a
+constant).
+
+The simplification finds
+  - common subexpressions (the same operation on the same arguments)
+  - constant-only sub-stacks, which can be replaced by a single constant
+without modifying the stack itself.  Algebraic identities (e.g. x - x = 0,
+x * 0 = 0) are not applied since they do not hold for nan or infinite x, and
+the stacks have no literal terminals whose values could be folded.
+"""
+
+COMMUTATIVE_COMMANDS = {"+", "*"}
+UNARY_COMMANDS = {"sin", "cos", "exp", "log", "abs", "sqrt"}
+
+
+def is_binary(name):
+    """whether a command has two arguments (unknown operators are assumed to)"""
+    return name not in UNARY_COMMANDS
+
+
+class SimplifiedStack(object):
+    """
+    Simplification of a stack of commands
+
+    :param commands: list of (name, param1, param2) for each command of the
+                     stack (param2 is ignored for unary operators)
+
+    :ivar alias: for each command the index of the (earlier) command which
+                 computes the same value
+    :ivar constant_nodes: set of operator commands whose value depends on the
+                          constants only
+    :ivar constant_roots: sorted list of the roots of the largest
+                          constant-only sub-stacks; each of them can be
+                          replaced by a single constant
+    :ivar util: list of whether each command is needed to evaluate the
+                simplified stack
+    """
+    def __init__(self, commands):
+        n_commands = len(commands)
+        self.alias = list(range(n_commands))
+        self.constant_nodes = set()
+        depends_on_x = [False]*n_commands
+        depends_on_c = [False]*n_commands
+        known = {}
+
+        for i, (name, param1, param2) in enumerate(commands):
+            if name == "C":
+                depends_on_c[i] = True
+                continue
+            if name == "X":
+                key = ("X", param1)
+                depends_on_x[i] = True
+            else:
+                arg1 = self.alias[param1]
+                arg2 = self.alias[param2] if is_binary(name) else None
+                if name in COMMUTATIVE_COMMANDS and arg2 < arg1:
+                    arg1, arg2 = arg2, arg1
+                key = (name, arg1, arg2)
+                args = (arg1,) if arg2 is None else (arg1, arg2)
+                depends_on_x[i] = any(depends_on_x[j] for j in args)
+                depends_on_c[i] = any(depends_on_c[j] for j in args)
+                if depends_on_c[i] and not depends_on_x[i]:
+                    self.constant_nodes.add(i)
+            if key in known:
+                self.alias[i] = known[key]
+            else:
+                known[key] = i
+
+        # utilization of the simplified stack, and the constant-only
+        # operators which are used outside of constant-only sub-stacks
+        self.util = [False]*n_commands
+        self.constant_roots = []
+        if n_commands == 0:
+            return
+        self.util[self.alias[-1]] = True
+        used_by_variable = [False]*n_commands
+        used_by_variable[self.alias[-1]] = True
+        for i in range(n_commands - 1, -1, -1):
+            name, param1, param2 = commands[i]
+            if not self.util[i] or name in ("X", "C"):
+                continue
+            if i in self.constant_nodes and used_by_variable[i]:
+                self.constant_roots.append(i)
+            args = [self.alias[param1]]
+            if is_binary(name):
+                args.append(self.alias[param2])
+            for arg in args:
+                self.util[arg] = True
+                if i not in self.constant_nodes:
+                    used_by_variable[arg] = True
+        self.constant_roots.sort()
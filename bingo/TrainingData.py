@@ -37,6 +37,46 @@ class TrainingData(object, metaclass=abc.ABCMeta):
         """
         pass
 
+    def input_bounds(self):
+        """
+        gets the bounds of each column of the input data (the data which
+        individuals are evaluated on).  They are computed once; subsets share
+        the bounds of the full data (which are conservative for them)
+        :return: list of (min, max) for each column
+        """
+        if self.bounds is None:
+            self.bounds = column_bounds(self.input_data())
+        return self.bounds
+
+    @abc.abstractmethod
+    def input_data(self):
+        """
+        gets the input data of the training data
+        :return: 2d numpy array
+        """
+        pass
+
+    @abc.abstractmethod
+    def astype(self, dtype):
+        """
+        copy of the training data with its floating point data converted to
+        another precision (e.g. np.float32 for cheaper evaluation)
+        :param dtype: numpy floating point type
+        :return: must return a TrainingData object
+        """
+        pass
+
+    def full_precision(self):
+        """
+        gets the training data in double precision (e.g. for optimization of
+        constants)
+        :return: self if its input data is already double precision,
+                 otherwise a converted copy
+        """
+        if self.input_data().dtype == np.float64:
+            return self
+        return self.astype(np.float64)
+
 
 class ExplicitTrainingData(TrainingData):
     """
@@ -67,6 +107,7 @@ class ExplicitTrainingData(TrainingData):
 
         self.x = x
         self.y = y
+        self.bounds = None
 
     def __getitem__(self, items):
         """
@@ -75,8 +116,27 @@ class ExplicitTrainingData(TrainingData):
         :return: an ExplicitTrainingData
         """
         temp = ExplicitTrainingData(self.x[items, :], self.y[items, :])
+        temp.bounds = self.input_bounds()
+        return temp
+
+    def astype(self, dtype):
+        """
+        copy of the ExplicitTrainingData with x and y converted to dtype
+        :param dtype: numpy floating point type
+        :return: an ExplicitTrainingData
+        """
+        temp = ExplicitTrainingData(self.x.astype(dtype),
+                                    self.y.astype(dtype))
+        temp.bounds = self.input_bounds()
         return temp
 
+    def input_data(self):
+        """
+        gets the input data (x)
+        :return: x
+        """
+        return self.x
+
     def size(self):
         """
         gets the length of the first dimension of the data
@@ -116,6 +176,7 @@ class ImplicitTrainingData(TrainingData):
 
         self.x = x
         self.dx_dt = dx_dt
+        self.bounds = None
 
     def __getitem__(self, items):
         """
@@ -124,8 +185,27 @@ class ImplicitTrainingData(TrainingData):
         :return: an ExplicitTrainingData
         """
         temp = ImplicitTrainingData(self.x[items, :], self.dx_dt[items, :])
+        temp.bounds = self.input_bounds()
         return temp
 
+    def astype(self, dtype):
+        """
+        copy of the ImplicitTrainingData with x and dx_dt converted to dtype
+        :param dtype: numpy floating point type
+        :return: an ImplicitTrainingData
+        """
+        temp = ImplicitTrainingData(self.x.astype(dtype),
+                                    self.dx_dt.astype(dtype))
+        temp.bounds = self.input_bounds()
+        return temp
+
+    def input_data(self):
+        """
+        gets the input data (x)
+        :return: x
+        """
+        return self.x
+
     def size(self):
         """
         gets the length of the first dimension of the data
@@ -210,6 +290,7 @@ class PairwiseAtomicTrainingData(TrainingData):
         self.r = r_list
         self.config_lims_r = config_lims_r
         self.potential_energy = potential_energy
+        self.bounds = None
 
     def __getitem__(self, items):
         """
@@ -230,11 +311,46 @@ class PairwiseAtomicTrainingData(TrainingData):
             potential_energy=new_potential_energy,
             r_list=self.r[r_inds, :],
             config_lims_r=new_config_lims_r)
+        temp.bounds = self.input_bounds()
+        return temp
+
+    def astype(self, dtype):
+        """
+        copy of the PairwiseAtomicTrainingData with r and the potential
+        energy converted to dtype
+        :param dtype: numpy floating point type
+        :return: a PairwiseAtomicTrainingData
+        """
+        temp = PairwiseAtomicTrainingData(
+            potential_energy=self.potential_energy.astype(dtype),
+            r_list=self.r.astype(dtype),
+            config_lims_r=self.config_lims_r)
+        temp.bounds = self.input_bounds()
         return temp
 
+    def input_data(self):
+        """
+        gets the input data (r)
+        :return: r
+        """
+        return self.r
+
     def size(self):
         """
         gets the number of configurations
         :return: indexable size
         """
         return self.potential_energy.shape[0]
+
+
+def column_bounds(data):
+    """
+    Bounds of each column of a 2d array, ignoring nans
+    :param data: 2d numpy array
+    :return: list of (min, max) for each column
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        lower = np.nanmin(data, axis=0)
+        upper = np.nanmax(data, axis=0)
+    return list(zip(lower.tolist(), upper.tolist()))
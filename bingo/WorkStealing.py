@@ -0,0 +1,218 @@
+"""
+This module contains the work stealing used by the ParallelIslandManager to
+keep ranks busy when the cost of a generation differs between islands.  A
+rank which has finished its block of generations (a thief) asks random other
+ranks for work.  A rank which is evaluating the fitness of a batch of solutions
+(a victim) hands chunks of its pending evaluations to the thieves which ask,
+together with its best predictor, and evaluates the rest itself.  The thief
+evaluates the chunk with the victim's predictor on its own (identical)
+training data and returns the individuals (whose constants may have been
+optimized) along with their estimated fitness.
+
+The messages use the compact migration buffers (see MigrationBuffers): a
+header with the buffer sizes followed by the integer and the float buffer.
+
+Termination: when a thief has finished its own work it enters a non-blocking
+barrier and steals until the barrier completes (i.e., all ranks have finished
+their own work).  A second non-blocking barrier, during which requests are
+still answered, makes sure that no request is left unanswered.
+"""
+import logging
+
+from mpi4py import MPI
+import numpy as np
+
+from .MigrationBuffers import pack_buffers, unpack_buffers
+
+LOGGER = logging.getLogger(__name__)
+
+REQUEST_TAG = 1
+WORK_TAG = 2
+RESULT_TAG = 3
+
+
+class WorkStealer(object):
+    """
+    Work stealing between the coevolution islands of the ranks of a
+    communicator
+
+    :param comm: mpi communicator (used only for work stealing)
+    :param isle: coevolution island of this rank
+    :param rng: random stream for choosing victims
+    :param chunk_size: number of evaluations handed to a thief at once
+    """
+    def __init__(self, comm, isle, rng, chunk_size=4):
+        self.comm = comm
+        self.isle = isle
+        self.rng = rng
+        self.chunk_size = chunk_size
+        self.stolen_evals = 0
+        self.lent_evals = 0
+
+    def send_buffers(self, buffers, dest, tag):
+        """sends a header with the sizes of the buffers, then the buffers"""
+        header = np.array([len(buffer) for buffer in buffers], dtype=np.int64)
+        self.comm.Send(header, dest=dest, tag=tag)
+        for buffer in buffers:
+            if len(buffer) > 0:
+                self.comm.Send(buffer, dest=dest, tag=tag)
+
+    def recv_buffers(self, source, tag):
+        """
+        receives the buffers sent by send_buffers
+
+        :return: integer buffer, float buffer (None if the sizes are zero)
+        """
+        header = np.empty(2, dtype=np.int64)
+        self.comm.Recv(header, source=source, tag=tag)
+        if not header.any():
+            return None
+        buffers = []
+        for size, dtype in zip(header, (np.int64, np.float64)):
+            buffer = np.empty(size, dtype=dtype)
+            if size > 0:
+                self.comm.Recv(buffer, source=source, tag=tag)
+            buffers.append(buffer)
+        return buffers
+
+    def evaluate(self, island, indvs):
+        """
+        Batch evaluator of the solution island (see Island.batch_evaluator):
+        evaluates the individuals, lending chunks of them to thieves which
+        ask for work
+
+        :param island: solution island
+        :param indvs: list of individuals to be evaluated
+        """
+        # only the estimated fitness can be evaluated by other ranks
+        shareable = island.fitness_function == self.isle.solution_fitness_est
+        queue = list(indvs)
+        lent = {}
+        while queue or lent:
+            if shareable:
+                self.answer_requests(queue, lent)
+            if queue:
+                indv = queue.pop()
+                indv.fitness = island.fitness_function(indv)
+                indv.fit_set = True
+                island.fitness_evals += 1
+            else:
+                status = MPI.Status()
+                self.comm.Probe(source=MPI.ANY_SOURCE, tag=RESULT_TAG,
+                                status=status)
+                thief = status.Get_source()
+                self.receive_results(island, lent.pop(thief), thief)
+
+    def answer_requests(self, queue=None, lent=None):
+        """
+        Answers the pending work requests: a chunk of the queue is lent if the
+        queue is long enough, otherwise the answer is that there is no work
+
+        :param queue: list of individuals waiting for evaluation (None if
+                      there is no work)
+        :param lent: dictionary of the lists of individuals lent to each thief
+        """
+        status = MPI.Status()
+        while self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=REQUEST_TAG,
+                               status=status):
+            thief = status.Get_source()
+            self.comm.Recv(np.empty(1, dtype=np.int64), source=thief,
+                           tag=REQUEST_TAG)
+            if queue is None or len(queue) < 2*self.chunk_size or \
+                    thief in lent:
+                self.send_buffers([np.empty(0, dtype=np.int64),
+                                   np.empty(0)], thief, WORK_TAG)
+                continue
+            chunk = queue[:self.chunk_size]
+            del queue[:self.chunk_size]
+            lent[thief] = chunk
+            self.lent_evals += len(chunk)
+            s_ints, s_floats = \
+                self.isle.solution_island.gene_manipulator.pack(chunk)
+            p_ints, p_floats = \
+                self.isle.predictor_island.gene_manipulator.pack(
+                    [self.isle.best_predictor])
+            self.send_buffers(
+                pack_buffers([np.array([len(p_ints), len(p_floats)])] +
+                             p_ints + s_ints, p_floats + s_floats),
+                thief, WORK_TAG)
+
+    def receive_results(self, island, chunk, thief):
+        """
+        Receives the evaluated chunk from a thief: the genome, the constants
+        and the fitness of the lent individuals are updated (the thief may
+        have rewritten the genome, e.g. count_constants numbers the constants
+        and merges constant sub-stacks)
+
+        :param island: solution island
+        :param chunk: list of the individuals lent to the thief
+        :param thief: rank of the thief
+        """
+        int_arrays, float_arrays = unpack_buffers(
+            *self.recv_buffers(thief, RESULT_TAG))
+        fits = float_arrays.pop(0).tolist()
+        evaluated = self.isle.solution_island.gene_manipulator.unpack(
+            int_arrays, float_arrays)
+        for indv, result, fit in zip(chunk, evaluated, fits):
+            for genome in ("command_list", "command_array"):
+                if hasattr(result, genome):
+                    setattr(indv, genome, getattr(result, genome))
+            indv.constants = result.constants
+            # the new genome is compiled when it is next evaluated
+            for flag in ("compiled", "compiled_deriv"):
+                if hasattr(indv, flag):
+                    setattr(indv, flag, False)
+            indv.fitness = self.isle.record_solution_fitness(indv, fit)
+            indv.fit_set = True
+            island.fitness_evals += 1
+
+    def steal(self, victim):
+        """
+        Asks a victim for work and evaluates it (requests from other thieves
+        are answered while waiting)
+
+        :param victim: rank of the victim
+        :return: whether work was received
+        """
+        request = self.comm.Isend(np.zeros(1, dtype=np.int64), dest=victim,
+                                  tag=REQUEST_TAG)
+        while not self.comm.Iprobe(source=victim, tag=WORK_TAG):
+            self.answer_requests()
+        request.Wait()
+        buffers = self.recv_buffers(victim, WORK_TAG)
+        if buffers is None:
+            return False
+
+        int_arrays, float_arrays = unpack_buffers(*buffers)
+        n_p_ints, n_p_floats = int_arrays.pop(0).tolist()
+        predictor, = self.isle.predictor_island.gene_manipulator.unpack(
+            int_arrays[:n_p_ints], float_arrays[:n_p_floats])
+        chunk = self.isle.solution_island.gene_manipulator.unpack(
+            int_arrays[n_p_ints:], float_arrays[n_p_floats:])
+        fits = [predictor.fit_func(indv, self.isle.fitness_metric,
+                                   self.isle.predictor_training_data)
+                for indv in chunk]
+        s_ints, s_floats = \
+            self.isle.solution_island.gene_manipulator.pack(chunk)
+        self.send_buffers(
+            pack_buffers(s_ints, [np.array(fits, dtype=np.float64)] +
+                         s_floats),
+            victim, RESULT_TAG)
+        self.stolen_evals += len(chunk)
+        return True
+
+    def steal_until_all_done(self):
+        """
+        Steals work from random ranks until all ranks have finished their own
+        work
+        """
+        others = [rank for rank in range(self.comm.Get_size())
+                  if rank != self.comm.Get_rank()]
+        all_done = self.comm.Ibarrier()
+        while not all_done.Test():
+            if others:
+                self.steal(self.rng.choice(others))
+            self.answer_requests()
+        all_answered = self.comm.Ibarrier()
+        while not all_answered.Test():
+            self.answer_requests()
@@ -0,0 +1,76 @@
+"""
+benchmark of the serialized size and round-trip time of AGraph individuals:
+pickled AGraphs (genome only, recompiled lazily) versus the manipulator's
+dump/load lists and the packed migration buffers (pack/unpack)
+"""
+import pickle
+import time
+
+import numpy as np
+
+from bingo.AGraph import AGraphManipulator, AGNodes
+from bingo.MigrationBuffers import pack_buffers, unpack_buffers
+
+
+def round_trip(individuals, serialize, deserialize, x):
+    """
+    time the serialization and deserialization of the individuals, and of
+    their first evaluation afterwards
+
+    :return: size in bytes, round-trip time, time including evaluation
+    """
+    start = time.time()
+    data = serialize(individuals)
+    loaded = deserialize(data)
+    t_trip = time.time() - start
+    for indv in loaded:
+        indv.evaluate(x)
+    return len(data), t_trip, time.time() - start
+
+
+def main(n_indv=2000, ag_size=32, data_size=100):
+    """main function which runs the benchmark"""
+    np.random.seed(0)
+    x = np.random.uniform(-5, 5, (data_size, 3))
+
+    manip = AGraphManipulator(3, ag_size, nloads=2)
+    for node in (AGNodes.Add, AGNodes.Subtract, AGNodes.Multiply,
+                 AGNodes.Sin, AGNodes.Cos):
+        manip.add_node_type(node)
+
+    individuals = []
+    for _ in range(n_indv):
+        indv = manip.generate()
+        n_consts = indv.count_constants()
+        indv.set_constants(list(np.random.uniform(-10, 10, n_consts)))
+        indv.fitness = (np.float64(np.random.rand()), indv.complexity())
+        indv.fit_set = True
+        indv.evaluate(x)
+        individuals.append(indv)
+
+    protocol = pickle.HIGHEST_PROTOCOL
+    methods = [
+        ("pickled AGraph",
+         lambda indvs: pickle.dumps(indvs, protocol),
+         pickle.loads),
+        ("dump/load",
+         lambda indvs: pickle.dumps([manip.dump(indv) for indv in indvs],
+                                    protocol),
+         lambda data: [manip.load(indv) for indv in pickle.loads(data)]),
+        ("pack/unpack",
+         lambda indvs: pickle.dumps(pack_buffers(*manip.pack(indvs)),
+                                    protocol),
+         lambda data: manip.unpack(*unpack_buffers(*pickle.loads(data))))]
+
+    print("%d individuals of stack size %d" % (n_indv, ag_size))
+    print("%-16s %12s %12s %18s" % ("method", "bytes/indv", "round trip",
+                                    "with evaluation"))
+    for name, serialize, deserialize in methods:
+        size, t_trip, t_eval = round_trip(individuals, serialize,
+                                          deserialize, x)
+        print("%-16s %12.1f %11.4fs %17.4fs" % (name, size / n_indv, t_trip,
+                                                t_eval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+benchmark of the generation of a random AGraph population: individuals
+generated one at a time (generate) versus in a vectorized batch
+(generate_batch)
+"""
+import time
+
+import numpy as np
+
+from bingo.AGraph import AGraphManipulator, AGNodes
+
+
+def main(n_indv=10000, ag_size=64, n_vars=3):
+    """main function which runs the benchmark"""
+    manip = AGraphManipulator(n_vars, ag_size, nloads=2)
+    for node in (AGNodes.Add, AGNodes.Subtract, AGNodes.Multiply,
+                 AGNodes.Sin, AGNodes.Cos):
+        manip.add_node_type(node)
+
+    start = time.time()
+    single = [manip.generate() for _ in range(n_indv)]
+    t_single = time.time() - start
+
+    start = time.time()
+    batch = manip.generate_batch(n_indv)
+    t_batch = time.time() - start
+
+    n_commands = len(batch) * ag_size
+    n_distinct = len({id(command) for indv in batch
+                      for command in indv.command_list})
+    print("%d individuals of stack size %d" % (n_indv, ag_size))
+    print("generate:       %8.3fs" % t_single)
+    print("generate_batch: %8.3fs  (speedup %.1f)" % (t_batch,
+                                                     t_single / t_batch))
+    print("distinct command objects in the batch: %d of %d" %
+          (n_distinct, n_commands))
+    assert len(single) == len(batch) == n_indv
+    assert np.all([len(indv.command_list) == ag_size for indv in batch])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+benchmark of the evaluation of random equations: exec-compiled AGraph versus
+AGraphCpp command arrays evaluated by the NumPy engine (AGraphCppNumpy)
+"""
+import time
+
+import numpy as np
+
+from bingo.AGraph import AGraphManipulator, AGNodes
+from bingo.AGraphCpp import AGraphCpp
+from bingo import AGraphCppNumpy
+
+NODE_TO_COMMAND = {AGNodes.LoadData: 0,
+                   AGNodes.LoadConst: 1,
+                   AGNodes.Add: 2,
+                   AGNodes.Subtract: 3,
+                   AGNodes.Multiply: 4,
+                   AGNodes.Sin: 6,
+                   AGNodes.Cos: 7}
+
+
+def to_agraphcpp(indv):
+    """converts an AGraph individual to an equivalent AGraphCpp individual"""
+    commands = []
+    for node, params in indv.command_list:
+        if node.terminal:
+            # unused constants are not numbered
+            param = -1 if params[0] is None else params[0]
+            commands.append((NODE_TO_COMMAND[node], param, param))
+        elif node.arity == 1:
+            commands.append((NODE_TO_COMMAND[node], params[0], params[0]))
+        else:
+            commands.append((NODE_TO_COMMAND[node], params[0], params[1]))
+    cpp_indv = AGraphCpp()
+    cpp_indv.command_array = np.array(commands, dtype=int)
+    cpp_indv.constants = list(indv.constants)
+    return cpp_indv
+
+
+def time_evaluations(individuals, x, method):
+    """time the evaluation of all individuals using method"""
+    start = time.time()
+    results = [method(indv, x) for indv in individuals]
+    return time.time() - start, results
+
+
+def main(n_indv=500, ag_size=64, data_size=1000):
+    """main function which runs the benchmark"""
+    np.random.seed(0)
+    x = np.random.uniform(-5, 5, (data_size, 3))
+
+    manip = AGraphManipulator(3, ag_size, nloads=2)
+    for node in (AGNodes.Add, AGNodes.Subtract, AGNodes.Multiply,
+                 AGNodes.Sin, AGNodes.Cos):
+        manip.add_node_type(node)
+
+    individuals = []
+    for _ in range(n_indv):
+        indv = manip.generate()
+        n_consts = indv.count_constants()
+        indv.set_constants(list(np.random.uniform(-10, 10, n_consts)))
+        individuals.append(indv)
+    cpp_individuals = [to_agraphcpp(indv) for indv in individuals]
+
+    t_py, f_py = time_evaluations(
+        individuals, x, lambda indv, x: indv.evaluate(x))
+    t_np, f_np = time_evaluations(
+        cpp_individuals, x,
+        lambda indv, x: AGraphCppNumpy.simplify_and_evaluate(
+            indv.command_array, x, indv.constants))
+    print("evaluation        AGraph: %.3fs   NumPy engine: %.3fs" %
+          (t_py, t_np))
+
+    t_py_d, d_py = time_evaluations(
+        individuals, x, lambda indv, x: indv.evaluate_deriv(x)[1])
+    t_np_d, d_np = time_evaluations(
+        cpp_individuals, x,
+        lambda indv, x: AGraphCppNumpy.simplify_and_evaluate_with_derivative(
+            indv.command_array, x, indv.constants, True)[1])
+    print("x derivative      AGraph: %.3fs   NumPy engine: %.3fs" %
+          (t_py_d, t_np_d))
+
+    for f_1, f_2, d_1, d_2 in zip(f_py, f_np, d_py, d_np):
+        np.testing.assert_allclose(f_1 * np.ones_like(f_2), f_2)
+        np.testing.assert_allclose(d_1 * np.ones_like(d_2), d_2, atol=1e-8)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@
 test_sym_reg tests the standard symbolic regression nodes
 """
 
+import pickle
+
 import numpy as np
 
 
@@ -201,3 +203,136 @@ def compare_ag_explicit(X, Y, operator, params):
 
     assert islmngr.run_islands(MAX_STEPS, epsilon, step_increment=N_STEPS, 
                                make_plots=False)
+
+
+def test_ag_simplification():
+    """simplified compilation and constant merging keep the same values"""
+    x_true = snake_walk()
+    sol_manip = agm(x_true.shape[1], 8, nloads=2)
+    sol_manip.add_node_type(AGNodes.Add)
+    sol_manip.add_node_type(AGNodes.Subtract)
+    sol_manip.add_node_type(AGNodes.Multiply)
+    indv = sol_manip.generate()
+    indv.command_list = [(AGNodes.LoadData, (0,)),
+                         (AGNodes.LoadConst, (None,)),
+                         (AGNodes.LoadConst, (None,)),
+                         (AGNodes.Multiply, (1, 2)),
+                         (AGNodes.LoadData, (0,)),
+                         (AGNodes.Subtract, (0, 4)),
+                         (AGNodes.Add, (3, 0)),
+                         (AGNodes.Add, (6, 5))]
+    # c_0*c_1 is merged into a single constant, x_0 - x_0 is kept since it
+    # is not 0 for nan or infinite x_0
+    assert indv.count_constants() == 1
+    assert indv.command_list[3] == (AGNodes.LoadConst, (0,))
+    assert indv.command_list[7] == (AGNodes.Add, (6, 5))
+    simple = indv.simplified_stack()
+    assert simple.alias[4] == 0
+    assert simple.util[5]
+    indv.set_constants([2.0])
+    f_of_x, df_dx = indv.evaluate_deriv(x_true)
+    np.testing.assert_allclose(f_of_x[:, 0], x_true[:, 0] + 2.0)
+    np.testing.assert_allclose(df_dx, [[1.0, 0.0]] * x_true.shape[0])
+    x_inf = np.array([[np.inf, 0.0], [np.nan, 0.0]])
+    assert np.all(np.isnan(indv.evaluate(x_inf)))
+
+
+def test_ag_interval_prescreen():
+    """log of negative data is rejected before constant optimization"""
+    x_true = snake_walk()
+    training_data = ExplicitTrainingData(-1.0 - np.abs(x_true),
+                                         x_true[:, 0])
+    bounds = training_data.input_bounds()
+    assert bounds[0][1] <= -1.0
+    sol_manip = agm(x_true.shape[1], 4, nloads=2)
+    sol_manip.add_node_type(AGNodes.Add)
+    sol_manip.add_node_type(AGNodes.Log)
+    indv = sol_manip.generate()
+    indv.command_list = [(AGNodes.LoadData, (0,)),
+                         (AGNodes.LoadConst, (None,)),
+                         (AGNodes.Log, (0,)),
+                         (AGNodes.Add, (2, 1))]
+    assert indv.guaranteed_invalid(bounds)
+    # the pre-screen is opt-in
+    metric = StandardRegression()
+    assert not metric.guaranteed_invalid(indv, training_data)
+    metric.interval_prescreen = True
+    assert np.isnan(metric.evaluate_fitness(indv, training_data))
+    assert indv.needs_optimization()
+
+    # the subset of training data keeps the bounds of the full data
+    assert training_data[[0, 1]].input_bounds() == bounds
+
+    indv.command_list[2] = (AGNodes.Sin, (0,))
+    assert not indv.guaranteed_invalid(bounds)
+
+
+def test_ag_generate_batch():
+    """batch generated individuals are valid stacks"""
+    x_true = snake_walk()
+    sol_manip = agm(x_true.shape[1], 16, nloads=2)
+    sol_manip.add_node_type(AGNodes.Add)
+    sol_manip.add_node_type(AGNodes.Multiply)
+    sol_manip.add_node_type(AGNodes.Sin)
+    indvs = sol_manip.generate_batch(50)
+    assert len(indvs) == 50
+    # each distinct command is made once, but the lists are not shared
+    n_distinct = len({id(command) for indv in indvs
+                      for command in indv.command_list})
+    assert n_distinct < 50 * 16 / 2
+    assert len({id(indv.command_list) for indv in indvs}) == 50
+    for indv in indvs:
+        assert len(indv.command_list) == 16
+        for stack_loc, (node, params) in enumerate(indv.command_list):
+            if stack_loc < 2:
+                assert node.terminal
+            if node is AGNodes.LoadData:
+                assert params[0] < x_true.shape[1]
+            elif node is AGNodes.LoadConst:
+                assert params == (None,)
+            else:
+                assert len(params) == node.arity
+                assert all(p < max(stack_loc, 1) for p in params)
+        indv.set_constants([1.0] * indv.count_constants())
+        assert indv.evaluate(x_true).shape[1] == 1
+
+
+def test_ag_pickle_round_trip():
+    """pickled individuals keep their genome and fitness and recompile"""
+    x_true = snake_walk()
+    sol_manip = agm(x_true.shape[1], 16, nloads=2)
+    for node in (AGNodes.Add, AGNodes.Multiply, AGNodes.Sin, AGNodes.Cos):
+        sol_manip.add_node_type(node)
+    sol_manip = pickle.loads(pickle.dumps(sol_manip))
+    for indv in sol_manip.generate_batch(20):
+        indv.set_constants([2.0] * indv.count_constants())
+        indv.fitness = (np.float64(0.5), indv.complexity())
+        indv.fit_set = True
+        f_of_x, df_dx = indv.evaluate_deriv(x_true)
+
+        loaded = pickle.loads(pickle.dumps(indv))
+        assert not loaded.compiled
+        assert loaded.command_list == indv.command_list
+        assert loaded.fitness == indv.fitness and loaded.fit_set
+        np.testing.assert_array_equal(loaded.evaluate(x_true),
+                                      indv.evaluate(x_true))
+        loaded_f, loaded_df = loaded.evaluate_deriv(x_true)
+        np.testing.assert_array_equal(loaded_f, f_of_x)
+        np.testing.assert_array_equal(loaded_df, df_dx)
+
+        # offspring of an unpickled individual may use other node types
+        children = [loaded.copy(), indv.copy()]
+        for child in children:
+            child.command_list[-1] = (AGNodes.Cos, (14,))
+            child.compiled = False
+            child.set_constants([2.0] * child.count_constants())
+        np.testing.assert_array_equal(children[0].evaluate(x_true),
+                                      children[1].evaluate(x_true))
+
+    # indices beyond the range of int16 survive pickling
+    indv = sol_manip.generate()
+    indv.command_list = [(AGNodes.LoadData, (40000,)),
+                         (AGNodes.LoadConst, (None,)),
+                         (AGNodes.Add, (0, 1))] + \
+        [(AGNodes.Sin, (i,)) for i in range(2, 40002)]
+    assert pickle.loads(pickle.dumps(indv)).command_list == indv.command_list
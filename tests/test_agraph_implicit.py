@@ -201,3 +201,28 @@ def compare_ag_implicit(X, Y, operator, params):
     epsilon = 1.05 * islmngr.isles[0].solution_fitness_true(equ) + 1.0e-10
     assert islmngr.run_islands(MAX_STEPS, epsilon, step_increment=N_STEPS, 
                                make_plots=False)
+
+
+def test_ag_sparse_derivative():
+    """derivatives of wide data only propagate the referenced columns"""
+    x = np.random.uniform(0.5, 3, (30, 20))
+    sol_manip = agm(x.shape[1], 6, nloads=2)
+    sol_manip.add_node_type(AGNodes.Add)
+    sol_manip.add_node_type(AGNodes.Multiply)
+    sol_manip.add_node_type(AGNodes.Sin)
+    indv = sol_manip.generate()
+    indv.command_list = [(AGNodes.LoadData, (17,)),
+                         (AGNodes.LoadData, (3,)),
+                         (AGNodes.LoadConst, (0,)),
+                         (AGNodes.Sin, (0,)),
+                         (AGNodes.Multiply, (3, 1)),
+                         (AGNodes.Multiply, (4, 2))]
+    indv.set_constants([2.0])
+    assert indv.referenced_columns(indv.simplified_stack()) == [3, 17]
+    f_of_x, df_dx = indv.evaluate_deriv(x)
+    np.testing.assert_allclose(f_of_x[:, 0],
+                               2.0 * np.sin(x[:, 17]) * x[:, 3])
+    expected = np.zeros(x.shape)
+    expected[:, 3] = 2.0 * np.sin(x[:, 17])
+    expected[:, 17] = 2.0 * np.cos(x[:, 17]) * x[:, 3]
+    np.testing.assert_allclose(df_dx, expected)
@@ -5,6 +5,8 @@ test_sym_const tests the standard symbolic nodes in const regression
 import numpy as np
 
 from bingo.AGraphCpp import AGraphCppManipulator as agm
+from bingo.AGraphCpp import AGraphCpp, utilized_commands_batch
+from bingo import AGraphCppNumpy
 from bingo.FitnessPredictor import FPManipulator as fpm
 from bingo.IslandManager import SerialIslandManager
 from bingo.Utils import snake_walk
@@ -204,3 +206,163 @@ def compare_agcpp_explicit(X, Y, operator, params):
     epsilon = 1.05 * islmngr.isles[0].solution_fitness_true(equ) + 1.0e-10
     assert islmngr.run_islands(MAX_STEPS, epsilon, step_increment=N_STEPS, 
                                make_plots=False)
+
+
+def make_batch_population(pop_size=50):
+    """random AGraphCpp population for the batch operation tests"""
+    np.random.seed(0)
+    sol_manip = agm(3, 16, nloads=2)
+    for node_type in (2, 3, 4, 5, 6):
+        sol_manip.add_node_type(node_type)
+    return sol_manip, [sol_manip.generate() for _ in range(pop_size)]
+
+
+def test_agcpp_utilized_commands_batch():
+    """batch utilization matches individual utilization"""
+    _, pop = make_batch_population()
+    util = utilized_commands_batch(np.stack([p.command_array for p in pop]))
+    for indv, indv_util in zip(pop, util):
+        assert indv.utilized_commands() == indv_util.tolist()
+
+
+def test_agcpp_crossover_and_distance_batch():
+    """batch crossover produces complementary children"""
+    sol_manip, pop = make_batch_population()
+    children1, children2 = sol_manip.crossover_batch(pop[:25], pop[25:])
+    for p_1, p_2, c_1, c_2 in zip(pop[:25], pop[25:], children1, children2):
+        assert c_1.fit_set is False
+        swapped = np.any(c_1.command_array != p_1.command_array, axis=1)
+        np.testing.assert_array_equal(c_1.command_array[swapped],
+                                      p_2.command_array[swapped])
+        np.testing.assert_array_equal(c_2.command_array[~swapped],
+                                      p_2.command_array[~swapped])
+    dists = sol_manip.distance_batch(pop[:25], children1)
+    assert dists[3] == sol_manip.distance(pop[3], children1[3])
+    dist_mat = sol_manip.distance_matrix(pop[:5], pop[5:10])
+    assert dist_mat[1, 2] == sol_manip.distance(pop[1], pop[7])
+
+
+def test_agcpp_mutation_batch_valid():
+    """batch mutation produces valid command arrays"""
+    sol_manip, pop = make_batch_population()
+    mutants = sol_manip.mutation_batch([indv.copy() for indv in pop])
+    for indv in mutants:
+        assert indv.fit_set is False
+        for i, (node, param1, param2) in enumerate(indv.command_array):
+            assert node in sol_manip.node_type_list
+            if node > 1:
+                assert param1 < max(i, 1) and param2 < max(i, 1)
+            elif node == 0:
+                assert 0 <= param1 < 3
+
+
+def test_numpy_engine_derivatives():
+    """numpy engine derivatives match finite differences"""
+    np.random.seed(0)
+    x = np.random.uniform(0.5, 3, (50, 2))
+    command_array = np.array([(0, 0, 0), (0, 1, 1), (1, 0, 0), (1, 1, 1),
+                              (4, 0, 2), (6, 4, 4), (5, 5, 1), (10, 0, 3),
+                              (2, 6, 7), (9, 8, 8), (12, 9, 9), (8, 10, 10),
+                              (3, 11, 3)])
+    constants = [1.3, 0.7]
+    f_of_x = AGraphCppNumpy.simplify_and_evaluate(command_array, x, constants)
+    _, df_dx = AGraphCppNumpy.simplify_and_evaluate_with_derivative(
+        command_array, x, constants, True)
+    _, df_dc = AGraphCppNumpy.simplify_and_evaluate_with_derivative(
+        command_array, x, constants, False)
+    delta = 1e-6
+    for i in range(2):
+        x_delta = np.copy(x)
+        x_delta[:, i] += delta
+        f_delta = AGraphCppNumpy.simplify_and_evaluate(command_array, x_delta,
+                                                       constants)
+        np.testing.assert_allclose(df_dx[:, i],
+                                   (f_delta - f_of_x)[:, 0] / delta,
+                                   rtol=1e-4, atol=1e-4)
+        c_delta = list(constants)
+        c_delta[i] += delta
+        f_delta = AGraphCppNumpy.simplify_and_evaluate(command_array, x,
+                                                       c_delta)
+        np.testing.assert_allclose(df_dc[:, i],
+                                   (f_delta - f_of_x)[:, 0] / delta,
+                                   rtol=1e-4, atol=1e-4)
+
+
+def test_agcpp_simplification():
+    """constant merging and cse for command arrays"""
+    x = np.random.uniform(0.5, 3, (20, 2))
+    indv = AGraphCpp()
+    indv.command_array = np.array([(0, 0, 0), (1, -1, -1), (1, -1, -1),
+                                   (4, 1, 2), (0, 0, 0), (3, 0, 4),
+                                   (2, 3, 0), (2, 6, 5), (6, 0, 0),
+                                   (6, 4, 4), (4, 8, 9), (2, 10, 7)])
+    assert indv.count_constants() == 1
+    assert indv.command_array[3].tolist() == [1, 0, 0]
+    assert indv.command_array[10].tolist() == [4, 8, 8]
+    # x_0 - x_0 is kept (it is nan for nan x_0), with x_0 loaded once
+    assert indv.command_array[5].tolist() == [3, 0, 0]
+    assert indv.command_array[11].tolist() == [2, 10, 7]
+    indv.set_constants([2.0])
+    np.testing.assert_allclose(indv.evaluate(x)[:, 0],
+                               np.sin(x[:, 0])**2 + 2.0 + x[:, 0])
+
+
+def test_agcpp_interval_prescreen():
+    """stacks which are nan or infinite for all data are rejected"""
+    x = np.random.uniform(0.5, 3, (20, 2))
+    training_data = ExplicitTrainingData(x, x[:, 0])
+    bounds = training_data.input_bounds()
+    indv = AGraphCpp()
+    # c_0 + exp(exp(exp(exp(exp(x_0)))))
+    indv.command_array = np.array([(0, 0, 0), (8, 0, 0), (8, 1, 1),
+                                   (8, 2, 2), (8, 3, 3), (8, 4, 4),
+                                   (1, -1, -1), (2, 5, 6)])
+    assert indv.guaranteed_invalid(bounds)
+    metric = StandardRegression()
+    metric.interval_prescreen = True
+    assert np.isnan(metric.evaluate_fitness(indv, training_data))
+    # implicit regression gives its own invalid fitness
+    metric = ImplicitRegression()
+    metric.interval_prescreen = True
+    assert metric.evaluate_fitness(indv, ImplicitTrainingData(x)) == np.inf
+
+    # log acts on |x| so log(-x_0) is valid
+    indv.command_array = np.array([(0, 0, 0), (0, 0, 0), (3, 0, 1),
+                                   (3, 2, 0), (9, 3, 3)])
+    assert not indv.guaranteed_invalid(bounds)
+
+
+def test_agcpp_generate_batch():
+    """batch generated individuals are valid stacks"""
+    sol_manip = agm(3, 16, nloads=2)
+    for node in (2, 3, 4, 6):
+        sol_manip.add_node_type(node)
+    x = np.random.uniform(0.5, 3, (10, 3))
+    indvs = sol_manip.generate_batch(50)
+    assert len(indvs) == 50
+    for indv in indvs:
+        commands = indv.command_array
+        assert commands.shape == (16, 3)
+        assert np.all(commands[:2, 0] <= 1)
+        operators = commands[:, 0] > 1
+        assert np.all(commands[operators, 1:] < np.maximum(
+            np.arange(16), 1)[operators, None])
+        loads = commands[:, 0] == 0
+        assert np.all(commands[loads, 1] < 3)
+        indv.set_constants([1.0] * indv.count_constants())
+        assert indv.evaluate(x).shape == (10, 1)
+
+
+def test_agcpp_pack_unpack():
+    """individuals survive the migration buffers unchanged"""
+    sol_manip, pop = make_batch_population(10)
+    for i, indv in enumerate(pop):
+        indv.set_constants(np.arange(indv.count_constants()) + 0.5)
+        indv.genetic_age = i
+    int_arrays, float_arrays = sol_manip.pack(pop)
+    unpacked = sol_manip.unpack(int_arrays, float_arrays)
+    for indv, original in zip(unpacked, pop):
+        np.testing.assert_array_equal(indv.command_array,
+                                      original.command_array)
+        assert list(indv.constants) == list(original.constants)
+        assert indv.genetic_age == original.genetic_age
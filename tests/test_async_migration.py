@@ -0,0 +1,300 @@
+"""
+test_async_migration tests the migration topologies and the non-blocking
+migration of coevolution islands
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+from mpi4py import MPI
+import numpy as np
+import pytest
+
+from bingo.AsyncMigration import ring, torus, random_regular, AsyncMigrator
+from bingo.Checkpoint import assigned_shards, shard_name
+from bingo.IslandManager import ParallelIslandManager
+from tests.test_coevolution_island import make_coevolution_island
+
+
+def in_degrees(graph):
+    """number of ranks sending to each rank"""
+    degrees = [0]*len(graph)
+    for neighbors in graph:
+        for neighbor in neighbors:
+            degrees[neighbor] += 1
+    return degrees
+
+
+def test_topologies():
+    """topologies connect distinct ranks with the expected degrees"""
+    assert ring(5)[0] == [4, 1]
+    assert ring(2) == [[1], [0]]
+    graph = torus(12)
+    assert all(len(neighbors) == 4 for neighbors in graph)
+    assert all(rank in graph[neighbor] for rank, neighbors in
+               enumerate(graph) for neighbor in neighbors)
+    np.random.seed(0)
+    graph = random_regular(10, degree=3)
+    assert all(len(set(neighbors)) == 3 and rank not in neighbors
+               for rank, neighbors in enumerate(graph))
+    assert in_degrees(graph) == [3]*10
+
+
+def test_async_migration_to_self():
+    """immigrants replace individuals without changing population sizes"""
+    isle = make_coevolution_island()
+    sizes = (len(isle.solution_island.pop), len(isle.predictor_island.pop),
+             len(isle.trainers))
+    migrator = AsyncMigrator(MPI.COMM_SELF, [0], migration_rate=0.25)
+    # synchronous-mode sends stay in flight until they are received
+    assert migrator.emigrate(isle, isle.rng)
+    assert migrator.emigrate(isle, isle.rng)
+    assert not migrator.emigrate(isle, isle.rng)
+    migrator.finish(isle)
+    assert not migrator.pending_sends and not migrator.pending_recvs
+    assert (len(isle.solution_island.pop), len(isle.predictor_island.pop),
+            len(isle.trainers)) == sizes
+
+
+def make_parallel_manager(**kwargs):
+    """parallel island manager of small islands (one per rank of the run)"""
+    isle = make_coevolution_island()
+    return ParallelIslandManager(
+        seed=0, **kwargs, solution_training_data=isle.solution_training_data,
+        solution_manipulator=isle.solution_island.gene_manipulator,
+        predictor_manipulator=isle.predictor_island.gene_manipulator,
+        fitness_metric=isle.fitness_metric, solution_pop_size=16,
+        predictor_pop_size=4, trainer_pop_size=4)
+
+
+def test_non_blocking_steps_reach_target_age():
+    """the reduced average age stops non-blocking steps at the target age"""
+    manager = make_parallel_manager()
+    for target in (7, 14):
+        manager.do_steps(7, non_block=True, when_update=3)
+        assert manager.age == target
+        assert target <= manager.isle.solution_island.age < target + 4
+
+
+def test_overlapped_convergence_test():
+    """convergence is picked up one block of steps after it happens"""
+    manager = make_parallel_manager()
+    assert manager.run_islands(40, epsilon=np.inf, step_increment=5,
+                               make_plots=False, overlap_convergence=True)
+    assert manager.age == 10
+    assert manager.convergence_request is None
+
+    manager = make_parallel_manager()
+    assert not manager.run_islands(15, epsilon=-1.0, step_increment=5,
+                                   make_plots=False, overlap_convergence=True)
+    assert manager.age == 15
+
+
+def test_overlapped_convergence_checkpoint_has_front(tmp_path):
+    """checkpoints of overlapped runs hold the joint front of the ranks"""
+    manager = make_parallel_manager()
+    base_name = str(tmp_path / "checkpoint")
+    manager.run_islands(10, epsilon=-1.0, step_increment=5, make_plots=False,
+                        checkpoint_file=base_name, overlap_convergence=True)
+    restarted = make_parallel_manager(restart_file=base_name + "_5.p")
+    assert restarted.age == 5
+    if restarted.comm_rank == 0:
+        assert len(restarted.pareto_isle.pareto_front) > 0
+
+
+def test_convergence_test_evaluates_new_front_members():
+    """true fitness is only evaluated for members new to the front"""
+    manager = make_parallel_manager()
+    manager.do_steps(3)
+    evaluated = []
+    true_fitness = manager.isle.solution_fitness_true
+
+    def counting_true_fitness(indv):
+        evaluated.append(indv)
+        return true_fitness(indv)
+    manager.isle.solution_fitness_true = counting_true_fitness
+
+    manager.start_convergence_test()
+    manager.finish_convergence_test(-1.0)
+    assert len(evaluated) == len(manager.isle.solution_island.pareto_front)
+    assert evaluated
+    best = manager.global_best_fitness[0]
+    manager.start_convergence_test()
+    manager.finish_convergence_test(-1.0)
+    assert len(evaluated) == len(manager.isle.solution_island.pareto_front)
+    assert manager.global_best_fitness[0] == best
+
+
+def test_work_stealing_evaluation():
+    """the stealing batch evaluator gives the same fitness as the island"""
+    manager = make_parallel_manager(work_stealing=True)
+    manager.do_steps(3, non_block=False)
+    isle = manager.isle
+    for indv in isle.solution_island.pop:
+        expected = isle.solution_fitness_est(indv.copy())
+        assert indv.fitness == pytest.approx(expected, nan_ok=True)
+    assert manager.stealer.stolen_evals == manager.stealer.lent_evals == 0
+
+
+def steal_between_ranks():
+    """
+    Run on 2 ranks by test_work_stealing_between_ranks: rank 0 evaluates a
+    large batch of new individuals while rank 1, which has no work, steals
+    chunks of it
+    """
+    manager = make_parallel_manager(work_stealing=True)
+    isle = manager.isle
+    stealer = manager.stealer
+    if manager.comm_rank == 0:
+        manipulator = isle.solution_island.gene_manipulator
+        indvs = [manipulator.generate() for _ in range(400)]
+        isle.solution_island.evaluate_individuals(indvs)
+    stealer.steal_until_all_done()
+    counts = manager.comm.gather((stealer.lent_evals, stealer.stolen_evals))
+    if manager.comm_rank == 0:
+        assert counts[0][0] > 0
+        assert counts[0][0] == counts[1][1]
+        for indv in indvs:
+            # the genome rewritten by the thief is copied back with the
+            # optimized constants
+            assert not indv.needs_optimization()
+            copy = indv.copy()
+            copy.fitness_memo = {}
+            assert indv.fitness == pytest.approx(
+                isle.solution_fitness_est(copy), nan_ok=True)
+
+
+def run_on_ranks(n_ranks, function, *args):
+    """
+    Runs a function of this module on several ranks (with mpirun)
+
+    :param n_ranks: number of ranks
+    :param function: name of the function
+    :param args: string arguments of the function
+    :return: return code and output of the run
+    """
+    # a fresh mpi environment (not the one of this singleton process)
+    env = {key: value for key, value in os.environ.items()
+           if not key.startswith(("OMPI_", "PMIX_"))}
+    env.update(OMPI_ALLOW_RUN_AS_ROOT="1", OMPI_ALLOW_RUN_AS_ROOT_CONFIRM="1",
+               OMPI_MCA_rmaps_base_oversubscribe="1")
+    result = subprocess.run(
+        ["mpirun", "-n", str(n_ranks), sys.executable, "-m",
+         "tests.test_async_migration", function] + list(args),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        timeout=300)
+    return result.returncode, result.stdout.decode()
+
+
+@pytest.mark.skipif(shutil.which("mpirun") is None, reason="needs mpirun")
+def test_work_stealing_between_ranks():
+    """lent evaluations come back with the thief's genome and constants"""
+    returncode, output = run_on_ranks(2, "steal_between_ranks")
+    assert returncode == 0, output
+
+
+def test_assigned_shards():
+    """shards are dealt round robin; extra ranks get copies"""
+    assert [assigned_shards(4, rank, 2) for rank in range(2)] == \
+        [([0, 2], False), ([1, 3], False)]
+    assert [assigned_shards(2, rank, 3) for rank in range(3)] == \
+        [([0], False), ([1], False), ([0], True)]
+
+
+def test_sharded_checkpoint_round_trip(tmp_path):
+    """a checkpoint is written as a manifest and shards and loads back"""
+    manager = make_parallel_manager()
+    manager.do_steps(3)
+    manager.test_convergence(1e-12, make_plots=False)
+    filename = str(tmp_path / "checkpoint.p")
+    manager.save_state(filename)
+    # the manifest is written once the shards of all ranks are written
+    assert not os.path.exists(filename)
+    manager.wait_for_checkpoint()
+    n_ranks = MPI.COMM_WORLD.Get_size()
+    assert os.path.exists(filename)
+    assert all(os.path.exists(shard_name(filename, rank))
+               for rank in range(n_ranks))
+
+    restarted = make_parallel_manager(restart_file=filename)
+    assert restarted.age == manager.age
+    np.testing.assert_equal(restarted.isle.dump_populations(),
+                            manager.isle.dump_populations())
+    # the joint front is restored as the front of the pareto island
+    if restarted.comm_rank == 0:
+        assert len(manager.pareto_isle.pareto_front) > 0
+        assert len(restarted.pareto_isle.pareto_front) == \
+            len(manager.pareto_isle.pareto_front)
+
+
+def checkpoint_on_ranks(dirname):
+    """
+    Run on 2 ranks by test_sharded_checkpoint_on_ranks: the ranks checkpoint
+    while they step and load the last checkpoint back
+    """
+    manager = make_parallel_manager()
+    filename = os.path.join(dirname, "checkpoint.p")
+    for _ in range(2):
+        manager.do_steps(3)
+        manager.save_state(filename)
+    manager.do_steps(3)
+    manager.wait_for_checkpoint()
+    assert sorted(os.listdir(dirname))[:3] == [
+        "checkpoint.p", "checkpoint.p.shard0", "checkpoint.p.shard1"]
+    assert len(os.listdir(dirname)) == 4
+    restarted = make_parallel_manager(restart_file=filename)
+    assert restarted.age == 6
+
+
+@pytest.mark.skipif(shutil.which("mpirun") is None, reason="needs mpirun")
+def test_sharded_checkpoint_on_ranks(tmp_path):
+    """the ranks write their shards and rank 0 the manifest and data"""
+    returncode, output = run_on_ranks(2, "checkpoint_on_ranks", str(tmp_path))
+    assert returncode == 0, output
+
+    # fewer ranks than shards: the shards are combined to the configured size
+    restarted = make_parallel_manager(
+        restart_file=str(tmp_path / "checkpoint.p"))
+    assert_population_sizes(restarted.isle)
+    # more ranks than shards: copied islands are mixed with new solutions
+    returncode, output = run_on_ranks(3, "load_on_ranks", str(tmp_path))
+    assert returncode == 0, output
+
+
+def assert_population_sizes(isle):
+    """populations have the sizes of make_parallel_manager"""
+    assert len(isle.solution_island.pop) == \
+        isle.solution_island.target_pop_size == 16
+    assert len(isle.predictor_island.pop) == \
+        isle.predictor_island.target_pop_size == 4
+    assert len(isle.trainers) == 4
+
+
+def load_on_ranks(dirname):
+    """
+    Run on 3 ranks by test_sharded_checkpoint_on_ranks: loads a checkpoint of
+    2 shards, so that rank 2 gets a copy of the island of rank 0
+    """
+    manager = make_parallel_manager(
+        restart_file=os.path.join(dirname, "checkpoint.p"))
+    assert_population_sizes(manager.isle)
+    solutions = manager.comm.gather(
+        [str(indv.command_list) for indv in manager.isle.solution_island.pop])
+    if manager.comm_rank == 0:
+        assert solutions[2] != solutions[0]
+        assert set(solutions[2]) & set(solutions[0])
+
+
+def test_run_islands_stops_predictor_worker():
+    """the predictor side process doesn't outlive run_islands"""
+    manager = make_parallel_manager(predictor_worker=True,
+                                    predictor_update_freq=5)
+    manager.run_islands(10, 1e-12, step_increment=5, make_plots=False)
+    assert manager.isle.worker is None
+
+
+if __name__ == "__main__":
+    globals()[sys.argv[1]](*sys.argv[2:])
@@ -0,0 +1,110 @@
+"""
+test_checkpoint tests the compact checkpoints of the island managers
+"""
+
+import glob
+import os
+
+import numpy as np
+
+from bingo.Checkpoint import CompactCheckpoint, data_hash, \
+    read_training_data, write_training_data
+from bingo.IslandManager import SerialIslandManager
+from bingo.TrainingData import ExplicitTrainingData, ImplicitTrainingData
+from tests.test_coevolution_island import make_coevolution_island
+
+
+def make_serial_manager(**kwargs):
+    """serial island manager of 3 small islands"""
+    isle = make_coevolution_island()
+    return SerialIslandManager(
+        n_islands=3, seed=0, **kwargs,
+        solution_training_data=isle.solution_training_data,
+        solution_manipulator=isle.solution_island.gene_manipulator,
+        predictor_manipulator=isle.predictor_island.gene_manipulator,
+        fitness_metric=isle.fitness_metric, solution_pop_size=16,
+        predictor_pop_size=4, trainer_pop_size=4)
+
+
+def test_training_data_round_trip(tmp_path):
+    """training data is written once per content hash and read back"""
+    x = np.linspace(0, 1, 20).reshape([-1, 2])
+    filename = str(tmp_path / "checkpoint.p")
+    for data in (ExplicitTrainingData(x, x[:, :1]), ImplicitTrainingData(x)):
+        content_hash = write_training_data(filename, data)
+        assert write_training_data(filename, data) == content_hash
+        loaded = read_training_data(
+            str(tmp_path / ("training_data_%s.npz" % content_hash)))
+        assert type(loaded) is type(data)
+        assert data_hash(loaded) == content_hash
+    assert len(glob.glob(str(tmp_path / "training_data_*.npz"))) == 2
+
+
+def test_serial_checkpoint_round_trip(tmp_path):
+    """islands, ages and the pareto front survive a compact checkpoint"""
+    manager = make_serial_manager()
+    manager.do_steps(3)
+    manager.test_convergence(1e-12, make_plots=False)
+    filename = str(tmp_path / "checkpoint.p")
+    manager.save_state(filename)
+    # the islands share their training data, which is stored once
+    assert len(os.listdir(str(tmp_path))) == 2
+
+    with CompactCheckpoint(filename) as checkpoint:
+        assert checkpoint.n_islands == 3
+        assert int(checkpoint["age"]) == manager.age
+
+    restarted = make_serial_manager(restart_file=filename)
+    assert restarted.age == manager.age
+    for isle, restored in zip(manager.isles, restarted.isles):
+        assert restored.solution_island.age == isle.solution_island.age
+        assert restored.predictor_island.fitness_evals == \
+            isle.predictor_island.fitness_evals
+        np.testing.assert_equal(restored.dump_populations(),
+                                isle.dump_populations())
+        assert len(isle.solution_island.pareto_front) > 0
+        np.testing.assert_equal(
+            [indv.command_list for indv in
+             restored.solution_island.pareto_front],
+            [indv.command_list for indv in isle.solution_island.pareto_front])
+    np.testing.assert_equal(
+        [indv.command_list for indv in restarted.pareto_isle.pop],
+        [indv.command_list for indv in manager.pareto_isle.pareto_front])
+    restarted.do_steps(2)
+
+
+def test_checkpoint_restores_training_data(tmp_path):
+    """islands made with other training data get that of the checkpoint"""
+    manager = make_serial_manager()
+    filename = str(tmp_path / "checkpoint.p")
+    manager.save_state(filename)
+
+    restarted = make_serial_manager()
+    other_data = ExplicitTrainingData(np.zeros((10, 2)), np.zeros((10, 1)))
+    for isle in restarted.isles:
+        isle.set_training_data(other_data)
+    with CompactCheckpoint(filename) as checkpoint:
+        checkpoint.restore_island(restarted.isles[0], 0)
+    np.testing.assert_array_equal(
+        restarted.isles[0].solution_training_data.x,
+        manager.isles[0].solution_training_data.x)
+
+
+def test_restored_front_survives_convergence_test(tmp_path):
+    """the joint front of a checkpoint is kept by the next convergence test"""
+    manager = make_serial_manager()
+    manager.do_steps(3)
+    manager.test_convergence(1e-12, make_plots=False)
+    filename = str(tmp_path / "checkpoint.p")
+    manager.save_state(filename)
+    saved = [str(indv.command_list) for indv in
+             manager.pareto_isle.pareto_front]
+    assert saved
+
+    restarted = make_serial_manager(restart_file=filename)
+    assert [str(indv.command_list) for indv in
+            restarted.pareto_isle.pareto_front] == saved
+    restarted.test_convergence(1e-12, make_plots=False)
+    front = [str(indv.command_list) for indv in
+             restarted.pareto_isle.pareto_front]
+    assert all(commands in front for commands in saved)
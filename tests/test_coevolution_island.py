@@ -0,0 +1,231 @@
+"""
+test_coevolution_island tests the bookkeeping of the coevolution island
+"""
+
+import numpy as np
+import pytest
+from mpi4py import MPI
+
+from bingo.AGraph import AGraphManipulator as agm
+from bingo.AGraph import AGNodes
+from bingo.FitnessPredictor import FPManipulator as fpm
+from bingo.CoevolutionIsland import CoevolutionIsland
+from bingo.Utils import snake_walk
+from bingo.FitnessMetric import StandardRegression
+from bingo.TrainingData import ExplicitTrainingData
+from bingo.MigrationBuffers import exchange_buffers
+
+
+def make_coevolution_island(**kwargs):
+    """makes a small coevolution island on an explicit problem"""
+    x_true = snake_walk()
+    y = (x_true[:, 0] * x_true[:, 1]).reshape([-1, 1])
+    training_data = ExplicitTrainingData(x_true, y)
+
+    sol_manip = agm(x_true.shape[1], 16, nloads=2)
+    sol_manip.add_node_type(AGNodes.Add)
+    sol_manip.add_node_type(AGNodes.Subtract)
+    sol_manip.add_node_type(AGNodes.Multiply)
+    pred_manip = fpm(32, x_true.shape[0])
+
+    return CoevolutionIsland(training_data, sol_manip, pred_manip,
+                             StandardRegression(), solution_pop_size=32,
+                             predictor_pop_size=8, trainer_pop_size=8,
+                             **kwargs)
+
+
+def test_residual_cache_predictor_fitness():
+    """cached residuals give the same predictor fitness as re-evaluation"""
+    isle = make_coevolution_island(residual_cache=True)
+    for pred in isle.predictor_island.pop:
+        cached = isle.predictor_fitness(pred)
+        isle.residual_cache = False
+        uncached = isle.predictor_fitness(pred)
+        isle.residual_cache = True
+        assert cached == pytest.approx(uncached, nan_ok=True)
+
+
+def test_residual_cache_trainer_update():
+    """replacing a trainer only refreshes its cached residual"""
+    isle = make_coevolution_island(residual_cache=True)
+    isle.update_trainer_residuals()
+    isle.add_new_trainer()
+    refreshed = list(isle.trainer_residuals)
+    isle.update_trainer_residuals()
+    for res_1, res_2 in zip(refreshed, isle.trainer_residuals):
+        if res_1 is None:
+            assert res_2 is None
+        else:
+            np.testing.assert_array_equal(res_1, res_2)
+
+
+def test_incremental_predictor_fitness():
+    """replacing a trainer updates predictor fitness incrementally"""
+    isle = make_coevolution_island(residual_cache=True)
+    for pred in isle.predictor_island.pop:
+        pred.fitness = isle.predictor_fitness(pred)
+        pred.fit_set = True
+    location = isle.add_new_trainer()
+    isle.update_predictor_fitness(location)
+    for pred in isle.predictor_island.pop:
+        assert pred.fit_set
+        assert pred.fitness == pytest.approx(isle.predictor_fitness(pred),
+                                             nan_ok=True)
+
+
+def test_predictor_keyed_fitness_memo():
+    """solution fitness is only re-evaluated for unseen predictors"""
+    isle = make_coevolution_island()
+    isle.solution_island.update_pareto_front()
+    original_predictor = isle.best_predictor.copy()
+    fitnesses = [indv.fitness for indv in isle.solution_island.pop]
+
+    # same content: nothing is invalidated
+    isle.set_best_predictor(original_predictor.copy())
+    assert all(indv.fit_set for indv in isle.solution_island.pop)
+
+    # new content: everything is invalidated
+    new_predictor = original_predictor.copy()
+    new_predictor.indices = [i + 1 for i in new_predictor.indices]
+    isle.set_best_predictor(new_predictor)
+    assert not any(indv.fit_set for indv in isle.solution_island.pop)
+
+    # back to a previous predictor: fitness is restored from the memo
+    isle.set_best_predictor(original_predictor)
+    for indv, fitness in zip(isle.solution_island.pop, fitnesses):
+        assert indv.fit_set
+        assert indv.fitness == fitness
+
+
+def test_predictor_worker():
+    """predictors evolved in a side process are adopted by the island"""
+    isle = make_coevolution_island(predictor_worker=True,
+                                   predictor_update_freq=5)
+    try:
+        for _ in range(50):
+            isle.generational_step()
+        assert isle.worker is not None
+        assert isle.predictor_island.age > 0
+        assert len(isle.trainers) == len(isle.trainers_true_fitness)
+        assert len(isle.best_predictor.indices) == 32
+    finally:
+        isle.stop_predictor_worker()
+    assert isle.worker is None
+
+
+def test_predictor_worker_keeps_immigrants():
+    """a worker reply which predates immigration is not adopted"""
+    isle = make_coevolution_island(predictor_worker=True,
+                                   predictor_update_freq=5)
+    try:
+        for _ in range(5):
+            isle.generational_step()
+        assert isle.worker_pending
+        assert isle.worker_conn.poll(30)
+        immigrant = isle.predictor_island.gene_manipulator.generate()
+        isle.add_populations([], [immigrant], [], [], replace=False)
+        isle.sync_predictor_worker()
+        assert any(pred is immigrant for pred in isle.predictor_island.pop)
+        assert not isle.worker_sync_populations and isle.worker_pending
+    finally:
+        isle.stop_predictor_worker()
+
+
+def test_predictor_worker_wait_time():
+    """the worker waits while it is ahead of the predictor ratio"""
+    isle = make_coevolution_island(predictor_ratio=0.2)
+    assert isle.worker is None
+    assert isle.worker_wait_time(1.0, 10.0) == 0.0
+    assert isle.worker_wait_time(1.0, 2.0) == pytest.approx(2.0)
+    isle.predictor_ratio = 0.0
+    assert isle.worker_wait_time(0.0, 1.0) is None
+
+
+def test_time_balance():
+    """wall-clock balancing steers toward the predictor ratio"""
+    isle = make_coevolution_island(time_balance=True, predictor_ratio=0.3)
+    for _ in range(30):
+        isle.generational_step()
+    assert isle.predictor_time > 0
+    assert isle.solution_time > 0
+    assert isle.computation_ratio() >= 0.3 * 0.5
+
+
+def test_float32_predictor_data():
+    """predictor estimates use float32 data, true fitness stays float64"""
+    isle = make_coevolution_island(predictor_dtype=np.float32)
+    assert isle.predictor_training_data.x.dtype == np.float32
+    assert isle.solution_training_data.x.dtype == np.float64
+    assert isle.predictor_training_data.full_precision().x.dtype == \
+        np.float64
+
+    for _ in range(5):
+        isle.generational_step()
+    for sol in isle.solution_island.pop:
+        isle.solution_fitness_true(sol)
+        assert sol.evaluate(isle.predictor_training_data.x).dtype == \
+            np.float32
+        assert sol.evaluate(isle.solution_training_data.x).dtype == \
+            np.float64
+        _, df_dx = sol.evaluate_deriv(isle.predictor_training_data.x)
+        assert df_dx.dtype == np.float32
+
+    sol = isle.solution_island.pop[0].copy()
+    sol.command_list = [(AGNodes.LoadData, (0,)),
+                        (AGNodes.LoadData, (1,)),
+                        (AGNodes.Multiply, (0, 1)),
+                        (AGNodes.LoadConst, (0,)),
+                        (AGNodes.Add, (2, 3))]
+    sol.set_constants([2.5])
+    sol.compiled = False
+    np.testing.assert_allclose(sol.evaluate(isle.predictor_training_data.x),
+                               sol.evaluate(isle.solution_training_data.x),
+                               rtol=1e-5)
+    est_32 = isle.best_predictor.fit_func(sol, isle.fitness_metric,
+                                          isle.predictor_training_data)
+    est_64 = isle.best_predictor.fit_func(sol, isle.fitness_metric,
+                                          isle.solution_training_data)
+    assert est_32 == pytest.approx(est_64, rel=1e-4)
+
+
+def test_seeded_island_is_reproducible():
+    """islands with the same seed evolve identically"""
+    populations = []
+    for seed in (5, 5, 6):
+        isle = make_coevolution_island(seed=seed)
+        np.random.seed(None)
+        for _ in range(10):
+            isle.generational_step()
+        populations.append([(str(indv.fitness), indv.latexstring())
+                            for indv in isle.solution_island.pop])
+    assert populations[0] == populations[1]
+    assert populations[0] != populations[2]
+
+
+def test_pack_unpack_populations():
+    """populations survive the migration buffers unchanged"""
+    isle = make_coevolution_island()
+    isle.solution_island.pop[0].genetic_age = 7
+    dumped = isle.dump_populations()
+    buffers = isle.pack_populations(with_removal=True)
+    assert len(isle.solution_island.pop) == 0
+    received = exchange_buffers(MPI.COMM_SELF, buffers, partner=0, tag=4)
+    for buffer, recv_buffer in zip(buffers, received):
+        np.testing.assert_array_equal(buffer, recv_buffer)
+    isle.unpack_populations(*received, replace=False)
+    np.testing.assert_equal(isle.dump_populations(), dumped)
+
+
+def test_trim_populations():
+    """combined populations are cut back to the given sizes"""
+    isle = make_coevolution_island()
+    isle.unpack_populations(*make_coevolution_island().pack_populations(),
+                            replace=False)
+    assert len(isle.solution_island.pop) == 64
+    isle.trim_populations(32, 8, 8)
+    assert len(isle.solution_island.pop) == \
+        isle.solution_island.target_pop_size == 32
+    assert len(isle.predictor_island.pop) == \
+        isle.predictor_island.target_pop_size == 8
+    assert len(isle.trainers) == len(isle.trainers_true_fitness) == 8
+    isle.generational_step()
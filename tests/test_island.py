@@ -0,0 +1,103 @@
+# Island tests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from bingo.Island import Island, nondominated_layers
+from bingo.FitnessPredictor import FPManipulator
+
+
+def sum_fitness(indv):
+    """simple fitness function: sum of the predictor indices"""
+    return float(np.sum(indv.indices))
+
+
+def sorting_fitness(indv):
+    """fitness function which also changes the genome: sorts the indices"""
+    indv.indices = np.sort(indv.indices)
+    return float(np.sum(indv.indices))
+
+
+def test_nondominated_layers():
+    ages = np.array([0, 1, 1, 2, 2, 3])
+    ranks = np.array([3, 2, 2, 0, 4, 1])
+    layers = nondominated_layers(ages, ranks)
+    # identical individuals are split into consecutive layers
+    np.testing.assert_array_equal(layers, [0, 0, 1, 0, 2, 1])
+
+
+def test_age_fitness_selection_reaches_target():
+    np.random.seed(0)
+    isle = Island(FPManipulator(4, 100), sum_fitness, target_pop_size=16,
+                  age_fitness=True)
+    for _ in range(10):
+        isle.generational_step()
+        assert len(isle.pop) == 16
+
+    # nondominated individuals are never removed when they fit
+    isle.pop += [isle.gene_manipulator.generate() for _ in range(8)]
+    fit = np.array([sum_fitness(indv) for indv in isle.pop])
+    best = isle.pop[int(np.argmin(fit))]
+    isle.age_fitness_selection()
+    assert len(isle.pop) == 16
+    assert best in isle.pop
+
+
+class PointIndv(object):
+    """minimal individual with a preset 2-objective fitness"""
+    def __init__(self, fitness):
+        self.fitness = fitness
+        self.fit_set = True
+
+
+def test_pareto_archive_matches_pairwise_front():
+    np.random.seed(1)
+    isle = Island(FPManipulator(4, 100), sum_fitness, target_pop_size=4)
+    for _ in range(5):
+        isle.pop = [PointIndv((float(f), float(c))) for f, c in
+                    np.random.randint(0, 10, (40, 2))]
+        isle.pop[0].fitness = (np.nan, 1.0)
+        pairwise_front = list(isle.pareto_front)
+        isle.update_pareto_front()
+        isle.pareto_front, archive_front = pairwise_front, isle.pareto_front
+        isle.update_pareto_front_pairwise()
+        assert [p.fitness for p in archive_front] == \
+               [p.fitness for p in isle.pareto_front]
+        isle.pareto_front = archive_front
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_steady_state_step(use_executor):
+    np.random.seed(2)
+    executor = ThreadPoolExecutor(2) if use_executor else None
+    isle = Island(FPManipulator(4, 100), sum_fitness, target_pop_size=16,
+                  cx_prob=0.5, mut_prob=0.3, steady_state=True,
+                  evaluation_executor=executor)
+    isle.generational_step()
+    best = isle.best_indv().fitness
+    for _ in range(20):
+        isle.generational_step()
+        assert len(isle.pop) == 16
+        # children only replace worse individuals
+        assert isle.best_indv().fitness <= best
+        best = isle.best_indv().fitness
+    isle.collect_children(block=True)
+    assert isle.fitness_evals > 16
+    if executor is not None:
+        executor.shutdown()
+
+
+def test_process_executor_returns_evaluated_children():
+    np.random.seed(3)
+    executor = ProcessPoolExecutor(2)
+    isle = Island(FPManipulator(4, 100), sorting_fitness, target_pop_size=8,
+                  cx_prob=0.5, mut_prob=0.3, steady_state=True,
+                  evaluation_executor=executor)
+    for _ in range(5):
+        isle.generational_step()
+    isle.collect_children(block=True)
+    executor.shutdown()
+    # children were evaluated as copies; the changes to them are copied back
+    for indv in isle.pop:
+        np.testing.assert_array_equal(indv.indices, np.sort(indv.indices))
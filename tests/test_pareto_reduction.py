@@ -0,0 +1,36 @@
+"""
+test_pareto_reduction tests the encoding and merging of pareto fronts
+"""
+
+from mpi4py import MPI
+import numpy as np
+
+from bingo.ParetoReduction import encode_front, decode_front, \
+    make_front_op, reduce_fronts
+from tests.test_agraphcpp import make_batch_population
+
+
+def test_merge_encoded_fronts():
+    """merged fronts keep the non-dominated individuals and their fitness"""
+    sol_manip, pop = make_batch_population(6)
+    front_1 = encode_front(sol_manip, pop[:3], [(1.0, 5), (2.0, 3), (4.0, 1)])
+    front_2 = encode_front(sol_manip, pop[3:],
+                           [(1.5, 4), (3.0, 3), (np.nan, 1)])
+    decoded = decode_front(sol_manip, np.concatenate([front_2, np.zeros(7)]))
+    assert [indv.fitness[1] for indv in decoded] == [4, 3, 1]
+    np.testing.assert_array_equal(decoded[0].command_array,
+                                  pop[3].command_array)
+
+    # a reduction on a single rank merges nothing; apply the operator directly
+    op = make_front_op(sol_manip)
+    inout = np.zeros(len(front_1) + len(front_2))
+    inout[:len(front_2)] = front_2
+    op.Reduce_local(np.concatenate([front_1, np.zeros(len(front_2))]), inout)
+    merged = decode_front(sol_manip, inout)
+    assert [indv.fitness for indv in merged] == \
+        [(1.0, 5), (1.5, 4), (2.0, 3), (4.0, 1)]
+
+    single = reduce_fronts(MPI.COMM_SELF, sol_manip, pop[:3],
+                           [(1.0, 5), (2.0, 3), (4.0, 1)], op)
+    assert [indv.fitness for indv in single] == [(1.0, 5), (2.0, 3), (4.0, 1)]
+    op.Free()